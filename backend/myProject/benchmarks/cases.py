@@ -0,0 +1,276 @@
+import io
+import itertools
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from solarApp.forecast_cache import forecast_cache
+from solarApp.geocoding import geocode_cache
+from solarApp.irradiance import follow_solar_position, irradiance_cache, profile_series
+from solarApp.modelling import get_solar_position, model_chain_pool, solar_position_cache
+from solarApp.models import Appliance, ApplianceConsumption, GeocodedPostCode, IrradianceProfile, Submission
+from solarApp.profiles import appliance_profiles
+from solarApp.serializers import ChartDataSerializer, SubmissionSerializer
+from solarApp.views import SolarDataView
+from solarApp.weather import weather_cache
+from .stub import load_fixture
+
+# Benchmark cases. Each registered setup function is called once per parameter combination and
+# returns a Timed: run() is what gets timed, reset() (untimed) runs before every call when the
+# case needs a cold start, teardown() runs once afterwards.
+
+POST_CODE = 'DD1 4HN'
+DATE = '2024-05-10T12:00'
+PANEL_TILT = 35.0
+PANEL_ORIENTATION = 180.0
+NUMBER_OF_SOLAR_PANELS = 10
+
+BENCHMARKS = []
+
+
+@dataclass
+class Timed:
+    run: object
+    reset: object = None
+    teardown: object = None
+
+
+@dataclass
+class Case:
+    name: str
+    params: dict = field(default_factory=dict)
+    setup: object = None
+
+    @property
+    def id(self):
+        if not self.params:
+            return self.name
+        return f"{self.name}[{','.join(f'{key}={value}' for key, value in self.params.items())}]"
+
+
+def benchmark(name, **params):
+    # One case per combination of the parameter values
+    def register(setup):
+        for values in itertools.product(*params.values()):
+            BENCHMARKS.append(Case(name, dict(zip(params, values)), setup))
+        return setup
+    return register
+
+
+@lru_cache(maxsize=None)
+def client():
+    user, _ = User.objects.get_or_create(username='benchmark')
+    api_client = APIClient()
+    api_client.force_authenticate(user)
+    return api_client
+
+
+def clear_caches():
+    # Everything SolarDataView could reuse from an earlier request, in memory and in the database
+    for memory_cache in (geocode_cache, irradiance_cache, solar_position_cache, weather_cache, forecast_cache, model_chain_pool):
+        memory_cache.clear()
+    cache.clear()
+    GeocodedPostCode.objects.all().delete()
+    IrradianceProfile.objects.all().delete()
+
+
+@lru_cache(maxsize=None)
+def catalogue(count):
+    # Ids of the first `count` appliances: the washing machine and tumble dryer from load_appliance_data,
+    # then synthetic appliances with seeded random profiles of one to three hours
+    call_command('load_appliance_data', stdout=io.StringIO())
+    slugs = ['washing_machine', 'tumble_dryer'] + [f'benchmark_{index}' for index in range(max(0, count - 2))]
+    for index, slug in enumerate(slugs[2:]):
+        appliance, created = Appliance.objects.get_or_create(slug=slug, defaults={'name': f'Benchmark appliance {index}'})
+        if created:
+            rng = np.random.default_rng(index)
+            steps = int(rng.integers(6, 19))
+            power = rng.uniform(200, 2000) * np.clip(rng.normal(1.0, 0.25, steps), 0.1, None)
+            ApplianceConsumption.objects.bulk_create([ApplianceConsumption(appliance=appliance, sequence=sequence, consumption=round(float(watts), 2))
+                                                      for sequence, watts in enumerate(power, start=1)])
+    appliance_profiles.invalidate()
+    ids = dict(Appliance.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+    return [ids[slug] for slug in slugs[:count]]
+
+
+def selected_profiles(count):
+    return appliance_profiles.select(catalogue(count))
+
+
+@lru_cache(maxsize=None)
+def production_frame(resolution, horizon_days=1):
+    # Modelled production for the fixture location, as SolarDataView builds it before scheduling
+    location = load_fixture('geocode.json')[POST_CODE]
+    drcalc = load_fixture('pvgis_drcalc.json')[POST_CODE]['months']
+    start = datetime.strptime(DATE, '%Y-%m-%dT%H:%M').replace(hour=0, minute=0)
+    times = pd.date_range(start=start, periods=24 * 60 // resolution * horizon_days, freq=f'{resolution}min', tz='UTC')
+    profiles = {}
+    for month in sorted(set(times.month)):
+        daily_profile = drcalc[str(month)]['outputs']['daily_profile']
+        profiles[month] = tuple([hour[name] for hour in daily_profile] for name in ('G(i)', 'Gb(i)', 'Gd(i)'))
+    solar_position = get_solar_position(location['lat'], location['lon'], times)
+    weather = profile_series(profiles, times)
+    if resolution < 60:
+        weather = follow_solar_position(weather, solar_position)
+    ac_power = model_chain_pool.run(PANEL_TILT, PANEL_ORIENTATION, location['lat'], location['lon'], weather, solar_position)
+    ac_power_df = pd.DataFrame({'production': ac_power.values * NUMBER_OF_SOLAR_PANELS}, index=times)
+    ac_power_df['hour'] = ac_power_df.index.hour
+    return ac_power_df
+
+
+def solar_request(resolution, appliances, horizon_days=1):
+    return {
+        'post_code': POST_CODE,
+        'date': DATE,
+        'panel_orientation': PANEL_ORIENTATION,
+        'panel_tilt': PANEL_TILT,
+        'number_of_solar_panels': NUMBER_OF_SOLAR_PANELS,
+        'appliances': catalogue(appliances),
+        'resolution_minutes': resolution,
+        'horizon_days': horizon_days,
+        'include_weather': True,
+    }
+
+
+def post_solar_data(payload):
+    response = client().post('/api/solardata/', payload, format='json')
+    if response.status_code != 200:
+        raise RuntimeError(f'/api/solardata/ returned {response.status_code}: {response.content[:200]!r}')
+    return response
+
+
+@benchmark('solardata.cold', resolution=[60, 15], appliances=[2])
+def solardata_cold(resolution, appliances):
+    # Nothing cached: geocoding, weather and PVGIS round trips to the stub, then the full pipeline
+    payload = solar_request(resolution, appliances)
+    return Timed(run=lambda: post_solar_data(payload), reset=clear_caches)
+
+
+def without_forecast_cache(payload):
+    # Upstream data cached, forecast result cache off: modelling, scheduling and serialization
+    post_solar_data(payload)
+    ttl = forecast_cache.ttl
+    forecast_cache.ttl = 0
+
+    def teardown():
+        forecast_cache.ttl = ttl
+    return Timed(run=lambda: post_solar_data(payload), teardown=teardown)
+
+
+@benchmark('solardata.warm', resolution=[60, 15, 5], appliances=[0, 2, 8])
+def solardata_warm(resolution, appliances):
+    return without_forecast_cache(solar_request(resolution, appliances))
+
+
+@benchmark('solardata.week', resolution=[60, 15], appliances=[2])
+def solardata_week(resolution, appliances):
+    return without_forecast_cache(solar_request(resolution, appliances, horizon_days=7))
+
+
+@benchmark('solardata.cached', resolution=[60, 5], appliances=[2])
+def solardata_cached(resolution, appliances):
+    # Forecast result cache hit
+    payload = solar_request(resolution, appliances)
+    post_solar_data(payload)
+    return Timed(run=lambda: post_solar_data(payload))
+
+
+@benchmark('find_optimal_start_time', resolution=[60, 15, 5, 1])
+def find_optimal_start_time(resolution):
+    ac_power_df = production_frame(resolution)
+    appliance_data = selected_profiles(1)[0].rows()
+    return Timed(run=lambda: SolarDataView().find_optimal_start_time(ac_power_df, appliance_data))
+
+
+@benchmark('calculate_optimal_periods', resolution=[60, 15, 5], appliances=[1, 2, 4, 8])
+def calculate_optimal_periods(resolution, appliances):
+    ac_power_df = production_frame(resolution)
+    profiles = selected_profiles(appliances)
+    return Timed(run=lambda: SolarDataView().calculate_optimal_periods(ac_power_df, profiles))
+
+
+@benchmark('adjust_power_for_appliance', resolution=[60, 15, 5, 1])
+def adjust_power_for_appliance(resolution):
+    ac_power_df = production_frame(resolution)
+    appliance_data = selected_profiles(1)[0].rows()
+    return Timed(run=lambda: SolarDataView().adjust_power_for_appliance(ac_power_df, appliance_data, '10:00'))
+
+
+def submission_payload(resolution, appliances):
+    # What the frontend posts to /api/submission/ after a forecast
+    ac_power_df = production_frame(resolution)
+    time_format = '%H:%M'
+    weather = load_fixture('onecall.json')[POST_CODE]['current']
+    return {
+        'post_code': POST_CODE,
+        'number_of_solar_panels': NUMBER_OF_SOLAR_PANELS,
+        'panel_orientation': PANEL_ORIENTATION,
+        'panel_tilt': PANEL_TILT,
+        'washing_machine_selected': appliances >= 1,
+        'tumble_dryer_selected': appliances >= 2,
+        'temperature': weather['temp'] - 273.15,
+        'cloud_cover': str(weather['clouds']),
+        'wind_speed': weather['wind_speed'],
+        'wind_direction': str(weather['wind_deg']),
+        'humidity': weather['humidity'],
+        'precipitation': '0.0',
+        'solar': {
+            'solar_altitude': 52.1,
+            'solar_azimuth': 180.4,
+            'daily_solar_output': float(ac_power_df['production'].sum() * resolution / 60),
+            'optimal_time': f"{DATE[:10]}T{ac_power_df['production'].idxmax().strftime('%H:%M')}Z",
+            'optimal_power': float(ac_power_df['production'].max()),
+            'wm_optimal_usage': '10:00',
+            'td_optimal_usage': '13:00',
+            'hourly_solar_production': [{'hour': hour.strftime(time_format), 'production': float(production)}
+                                        for hour, production in ac_power_df['production'].items()],
+            'appliance_consumption': sorted((row for profile in selected_profiles(appliances) for row in profile.rows()),
+                                            key=lambda row: row['sequence']),
+        },
+    }
+
+
+@lru_cache(maxsize=None)
+def stored_submission(resolution, appliances):
+    payload = submission_payload(resolution, appliances)
+    submission = Submission(post_code=POST_CODE, number_of_solar_panels=NUMBER_OF_SOLAR_PANELS,
+                            **{name: value for name, value in payload['solar'].items() if name != 'optimal_time'})
+    submission.save()
+    return Submission.objects.get(pk=submission.pk)
+
+
+@benchmark('serializer.submission_roundtrip', resolution=[60, 15, 5], appliances=[2])
+def submission_roundtrip(resolution, appliances):
+    # Instance to JSON and back through validation, as a client editing a stored run would
+    submission = stored_submission(resolution, appliances)
+
+    def run():
+        content = JSONRenderer().render(SubmissionSerializer(submission).data)
+        serializer = SubmissionSerializer(data=json.loads(content))
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+    return Timed(run=run)
+
+
+@benchmark('serializer.chart_data', resolution=[60, 15, 5], appliances=[2])
+def chart_data(resolution, appliances):
+    submission = stored_submission(resolution, appliances)
+    return Timed(run=lambda: JSONRenderer().render(ChartDataSerializer(submission).data))
+
+
+@benchmark('submission.create', resolution=[60, 15], appliances=[2])
+def submission_create(resolution, appliances):
+    payload = submission_payload(resolution, appliances)
+
+    def run():
+        response = client().post('/api/submission/', payload, format='json')
+        if response.status_code != 201:
+            raise RuntimeError(f'/api/submission/ returned {response.status_code}: {response.content[:200]!r}')
+    return Timed(run=run)
@@ -0,0 +1,71 @@
+import argparse
+import json
+import sys
+
+# Compare two benchmark result files by the median time per call of each case:
+#   python -m benchmarks.compare baseline.json results.json
+
+
+def format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.3g} {unit}'
+    return f'{seconds / 1e-9:.3g} ns'
+
+
+def compare(baseline, results, threshold=0.1):
+    # Rows of (case id, baseline median, new median, ratio, status); a case counts as slower or
+    # faster when its median moved by more than threshold
+    baseline_stats = {result['id']: result['stats'] for result in baseline['results']}
+    rows = []
+    for result in results['results']:
+        before = baseline_stats.get(result['id'])
+        after = result['stats']['median']
+        if before is None:
+            rows.append((result['id'], None, after, None, 'new'))
+            continue
+        ratio = after / before['median'] if before['median'] else float('inf')
+        status = 'slower' if ratio > 1 + threshold else 'faster' if ratio < 1 / (1 + threshold) else 'same'
+        rows.append((result['id'], before['median'], after, ratio, status))
+    return rows
+
+
+def environment_differences(baseline, results):
+    before, after = baseline.get('environment', {}), results.get('environment', {})
+    names = ('python', 'machine', 'cpu_count', 'packages')
+    return [name for name in names if before.get(name) != after.get(name)]
+
+
+def report(baseline, results, threshold=0.1, out=sys.stdout):
+    rows = compare(baseline, results, threshold)
+    width = max([len(row[0]) for row in rows] + [4])
+    out.write(f"{'case':<{width}}  {'baseline':>10}  {'current':>10}  {'change':>8}\n")
+    for case_id, before, after, ratio, status in rows:
+        change = f'{ratio:.2f}x' if ratio is not None else ''
+        flag = '' if status == 'same' else f'  {status}'
+        out.write(f"{case_id:<{width}}  {format_seconds(before) if before is not None else '-':>10}  {format_seconds(after):>10}  {change:>8}{flag}\n")
+    differences = environment_differences(baseline, results)
+    if differences:
+        out.write(f"Warning: the runs differ in {', '.join(differences)}, so timings are not directly comparable\n")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.compare', description='Compare two benchmark result files')
+    parser.add_argument('baseline')
+    parser.add_argument('results')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change in the median reported as slower/faster')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 if any case got slower')
+    args = parser.parse_args(argv)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.results) as f:
+        results = json.load(f)
+    rows = report(baseline, results, args.threshold)
+    if args.fail_on_regression and any(row[4] == 'slower' for row in rows):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,378 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+import httpx
+from .compare import format_seconds
+from .run import environment, setup_django
+
+# Load test: serves the app with gunicorn under each worker class, against the upstream stub
+# running in its own process, and drives a weighted mix of requests from concurrent clients.
+#   python -m benchmarks.load --worker-class sync gthread uvicorn --concurrency 4 16 --duration 30
+
+PROJECT = Path(__file__).resolve().parent.parent
+WORKER_CLASSES = {
+    'sync': ('sync', 'myProject.wsgi:application'),
+    'gthread': ('gthread', 'myProject.wsgi:application'),
+    'uvicorn': ('uvicorn_worker.UvicornWorker', 'myProject.asgi:application'),
+}
+MIXES = {
+    # Roughly what the frontend sends: a weather lookup and a forecast per visit, the odd saved
+    # run, and charts of earlier runs
+    'default': {'weatherdata': 3, 'solardata': 3, 'submission': 1, 'chart': 3},
+    'forecast': {'solardata': 1},
+    'browse': {'weatherdata': 1, 'chart': 4},
+}
+PERCENTILES = (50, 90, 95, 99)
+SERVER_TOTAL = re.compile(r'total;dur=([0-9.]+)')
+
+
+def parse_mix(value):
+    # A named mix, or weights such as solardata=3,chart=1
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for part in value.split(','):
+        kind, _, weight = part.partition('=')
+        if kind not in REQUESTS:
+            raise argparse.ArgumentTypeError(f"unknown request kind '{kind}' (expected one of {', '.join(REQUESTS)})")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{" ".join(process.args)} exited with status {process.returncode}')
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} did not answer within {timeout} seconds')
+
+
+def stop(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def start_stub(args):
+    port = free_port()
+    command = [sys.executable, '-m', 'benchmarks.stub', '--port', str(port), '--latency', str(args.latency),
+               '--jitter', str(args.jitter), '--error-rate', str(args.error_rate), '--seed', str(args.seed)]
+    process = subprocess.Popen(command, cwd=PROJECT, stdout=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    wait_ready(f'{url}/_stub/stats', process)
+    return process, url
+
+
+def stub_stats(url):
+    return httpx.get(f'{url}/_stub/stats').json()
+
+
+def start_server(worker_class, args, env, directory):
+    # Started in a scratch directory so the django.log that wsgi.py writes stays out of the tree
+    name, app = WORKER_CLASSES[worker_class]
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+               '--worker-class', name, '--pythonpath', str(PROJECT), '--timeout', '120', '--log-level', 'warning']
+    if worker_class == 'gthread':
+        command += ['--threads', str(args.threads)]
+    process = subprocess.Popen(command + [app], cwd=directory, env=env)
+    url = f'http://127.0.0.1:{port}'
+    wait_ready(f'{url}/metrics', process)
+    return process, url
+
+
+def worker_cpu(master_pid):
+    # CPU seconds used so far by each child of the gunicorn master; empty where /proc is unavailable
+    ticks = os.sysconf('SC_CLK_TCK')
+    usage = {}
+    for stat in Path('/proc').glob('[0-9]*/stat'):
+        try:
+            fields = stat.read_text().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == master_pid:
+            usage[int(stat.parent.name)] = (int(fields[11]) + int(fields[12])) / ticks
+    return usage
+
+
+def synthetic_post_codes(count, seed):
+    # Well-formed postcodes that the stub geocodes to points across Britain, so requests keep
+    # missing the location keyed caches as they would in production
+    rng = random.Random(seed)
+    letters = 'ABCDEFGHJKLMNPRSTUWYZ'
+    post_codes = set()
+    while len(post_codes) < count:
+        post_codes.add(f'{rng.choice(letters)}{rng.choice(letters)}{rng.randint(1, 29)} {rng.randint(0, 9)}{rng.choice(letters)}{rng.choice(letters)}')
+    return sorted(post_codes)
+
+
+def prepare(args, stub_url):
+    # A fresh database with the appliance catalogue, a client user and submissions to chart
+    os.environ['BENCHMARK_PRODUCTION_TUNING'] = '1'
+    setup_django(stub_url, args.database)
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from rest_framework.authtoken.models import Token
+    from solarApp.models import Submission
+    from .cases import NUMBER_OF_SOLAR_PANELS, POST_CODE, catalogue, solar_request, submission_payload
+    from .stub import load_fixture
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+    user = User.objects.create_user('load')
+    token, _ = Token.objects.get_or_create(user=user)
+    payload = submission_payload(60, 2)
+    solar = {name: value for name, value in payload['solar'].items() if name != 'optimal_time'}
+    for _ in range(args.chart_submissions):
+        Submission(user=user, post_code=POST_CODE, number_of_solar_panels=NUMBER_OF_SOLAR_PANELS, **solar).save()
+    return {
+        'token': token.key,
+        'post_codes': sorted(load_fixture('geocode.json')) + synthetic_post_codes(max(0, args.post_codes - 3), args.seed),
+        'appliances': catalogue(2),
+        'solar_request': solar_request(60, 0),
+        'submission': payload,
+        'submissions': list(Submission.objects.values_list('pk', flat=True)),
+    }
+
+
+def weatherdata_request(rng, plan):
+    return 'POST', '/api/weatherdata/', {'json': {'post_code': rng.choice(plan['post_codes'])}}
+
+
+def solardata_request(rng, plan):
+    # Spread over enough locations and panel setups that the forecast cache sees misses as well as hits
+    appliances = plan['appliances']
+    payload = dict(plan['solar_request'],
+                   post_code=rng.choice(plan['post_codes']),
+                   panel_tilt=rng.choice([30.0, 35.0, 40.0]),
+                   panel_orientation=rng.choice([135.0, 180.0, 225.0]),
+                   number_of_solar_panels=rng.choice([6, 10, 14]),
+                   appliances=rng.choice([[], appliances[:1], appliances]),
+                   resolution_minutes=rng.choice([60, 60, 15]))
+    return 'POST', '/api/solardata/', {'json': payload}
+
+
+def submission_request(rng, plan):
+    return 'POST', '/api/submission/', {'json': plan['submission']}
+
+
+def chart_request(rng, plan):
+    return 'GET', f"/api/submission_chart_data/{rng.choice(plan['submissions'])}/", {}
+
+
+REQUESTS = {
+    'weatherdata': weatherdata_request,
+    'solardata': solardata_request,
+    'submission': submission_request,
+    'chart': chart_request,
+}
+
+
+async def virtual_user(client, plan, mix, rng, deadline, samples):
+    # A closed-loop client: sends the next request as soon as the last one is answered and, like a
+    # browser, revalidates GETs with the ETag it last saw. Samples are (kind, status, latency, server
+    # time from the Server-Timing total or None).
+    kinds, weights = list(mix), list(mix.values())
+    etags = {}
+    while time.perf_counter() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        method, path, kwargs = REQUESTS[kind](rng, plan)
+        headers = {'If-None-Match': etags[path]} if method == 'GET' and path in etags else {}
+        started = time.perf_counter()
+        server_time = None
+        try:
+            response = await client.request(method, path, headers=headers, **kwargs)
+            status = response.status_code
+            if 'ETag' in response.headers:
+                etags[path] = response.headers['ETag']
+            total = SERVER_TOTAL.search(response.headers.get('Server-Timing', ''))
+            if total:
+                server_time = float(total.group(1)) / 1000
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        samples.append((kind, status, time.perf_counter() - started, server_time))
+
+
+async def drive(url, plan, mix, concurrency, duration, seed):
+    samples = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {'Authorization': f"Token {plan['token']}", 'X-Server-Timing': '1'}
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(virtual_user(client, plan, mix, random.Random(seed + index), deadline, samples)
+                               for index in range(concurrency)))
+        return samples, time.perf_counter() - started
+
+
+def percentile(values, percent):
+    # Nearest-rank percentile of sorted values
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def latency_summary(latencies):
+    values = sorted(latencies)
+    summary = {f'p{percent}': percentile(values, percent) for percent in PERCENTILES}
+    summary.update(mean=sum(values) / len(values), max=values[-1])
+    return summary
+
+
+def failed(status):
+    return not isinstance(status, int) or status >= 400
+
+
+def summarize(samples, elapsed):
+    by_kind = defaultdict(list)
+    for kind, status, latency, _ in samples:
+        by_kind[kind].append((status, latency))
+    server_times = [server_time for *_, server_time in samples if server_time is not None]
+    summary = {
+        'requests': len(samples),
+        'throughput': len(samples) / elapsed,
+        'errors': sum(failed(status) for _, status, _, _ in samples),
+        'statuses': dict(Counter(str(status) for _, status, _, _ in samples)),
+        'latency': latency_summary([latency for _, _, latency, _ in samples]),
+        # Time spent inside the app; the rest of the latency is queueing and transport
+        'server_time': latency_summary(server_times) if server_times else None,
+        'server_seconds': sum(server_times),
+        'by_kind': {},
+    }
+    for kind, results in sorted(by_kind.items()):
+        summary['by_kind'][kind] = {
+            'requests': len(results),
+            'errors': sum(failed(status) for status, _ in results),
+            'latency': latency_summary([latency for _, latency in results]),
+        }
+    return summary
+
+
+def upstream_delta(before, after):
+    return {name: {api: count - before[name].get(api, 0) for api, count in after[name].items()} for name in after}
+
+
+def run_level(worker_class, server, url, stub_url, plan, args, concurrency):
+    # One warm-up period, then a measured period at the given number of concurrent clients
+    asyncio.run(drive(url, plan, args.mix, concurrency, args.warmup, args.seed))
+    cpu_before, upstream_before, client_cpu = worker_cpu(server.pid), stub_stats(stub_url), time.process_time()
+    samples, elapsed = asyncio.run(drive(url, plan, args.mix, concurrency, args.duration, args.seed))
+    cpu_after, upstream_after, client_cpu = worker_cpu(server.pid), stub_stats(stub_url), time.process_time() - client_cpu
+    if not samples:
+        raise RuntimeError('No requests completed; increase --duration')
+    result = summarize(samples, elapsed)
+    cpu = {pid: seconds - cpu_before.get(pid, 0.0) for pid, seconds in cpu_after.items()}
+    slots = args.workers * (args.threads if worker_class == 'gthread' else 1)
+    result.update(
+        worker_class=worker_class,
+        workers=args.workers,
+        threads=args.threads if worker_class == 'gthread' else 1,
+        concurrency=concurrency,
+        duration=elapsed,
+        # Share of the request slots (workers x threads) that were handling a request
+        busy=result['server_seconds'] / elapsed / slots,
+        # CPU seconds per second of each worker process; up to 1.0 for a worker busy on one core
+        cpu={'mean': sum(cpu.values()) / elapsed / args.workers, 'max': max(cpu.values()) / elapsed,
+             'workers': sorted(seconds / elapsed for seconds in cpu.values())} if cpu else None,
+        # Load generator CPU use; near 1.0 means the client, not the server, limited throughput
+        client_cpu=client_cpu / elapsed,
+        upstream=upstream_delta(upstream_before, upstream_after),
+    )
+    return result
+
+
+def print_row(result):
+    latency = result['latency']
+    cpu = f"{result['cpu']['mean']:.0%}" if result['cpu'] else '-'
+    print(f"{result['worker_class']:<8} {result['concurrency']:>5} {result['throughput']:>8.1f} {format_seconds(latency['p50']):>9} "
+          f"{format_seconds(latency['p95']):>9} {format_seconds(latency['p99']):>9} {result['errors'] / result['requests']:>7.1%} "
+          f"{result['busy']:>6.0%} {cpu:>6} {result['client_cpu']:>7.0%}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load', description='Load test the API under gunicorn worker classes')
+    parser.add_argument('--worker-class', nargs='+', choices=list(WORKER_CLASSES), default=list(WORKER_CLASSES))
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker for gthread')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='Concurrent clients; one run per value')
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds per run')
+    parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds before each run')
+    parser.add_argument('--mix', type=parse_mix, default=MIXES['default'],
+                        help=f"Request weights: one of {', '.join(MIXES)}, or e.g. solardata=3,chart=1")
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds the upstream stub takes to answer')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Uniform +- variation of the upstream latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of upstream requests that fail with a 503')
+    parser.add_argument('--post-codes', type=int, default=100, help='Distinct postcodes the weather and forecast requests pick from')
+    parser.add_argument('--chart-submissions', type=int, default=20, help='Stored submissions the chart requests pick from')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'solar-load.sqlite3'), help='SQLite file to (re)create for the run')
+    parser.add_argument('--database-url', default=os.environ.get('BENCHMARK_DATABASE_URL', ''),
+                        help='postgres:// URL of a database to empty and use instead of SQLite; use it when sizing')
+    parser.add_argument('--output', '-o', help='Write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        os.environ['BENCHMARK_DATABASE_URL'] = args.database_url
+    else:
+        print('Running on SQLite: concurrent writes can fail with "database is locked", so use --database-url when sizing', file=sys.stderr)
+    stub, stub_url = start_stub(args)
+    results = []
+    try:
+        plan = prepare(args, stub_url)
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', BENCHMARK_UPSTREAM_URL=stub_url,
+                   BENCHMARK_DATABASE=args.database, BENCHMARK_PRODUCTION_TUNING='1', SERVER_TIMING='1')
+        print(f"{'class':<8} {'conc':>5} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7} {'busy':>6} {'cpu':>6} {'client':>7}")
+        with tempfile.TemporaryDirectory() as directory:
+            for worker_class in args.worker_class:
+                server, url = start_server(worker_class, args, env, directory)
+                try:
+                    for concurrency in args.concurrency:
+                        result = run_level(worker_class, server, url, stub_url, plan, args, concurrency)
+                        results.append(result)
+                        print_row(result)
+                finally:
+                    stop(server)
+    finally:
+        stop(stub)
+
+    if args.output:
+        output = {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'environment': environment(),
+            'options': {name: value for name, value in vars(args).items() if name not in ('database', 'database_url', 'output')},
+            'database': 'postgresql' if args.database_url else 'sqlite',
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from .compare import format_seconds, report
+from .stub import UpstreamStub
+
+# Runs the benchmark cases in benchmarks/cases.py against a fresh SQLite database and the fixture
+# stub, and writes the timings as JSON:
+#   python -m benchmarks.run --output results.json [--baseline baseline.json] [-k calculate_optimal]
+
+RESULTS_VERSION = 1
+PACKAGES = ('django', 'djangorestframework', 'numpy', 'pandas', 'pvlib', 'httpx')
+
+
+def time_calls(run, number):
+    # Seconds for `number` calls, with the garbage collector paused as timeit does
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(number):
+            run()
+        return time.perf_counter() - started
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def calibrate(run, min_time):
+    # Calls per sample so that one sample takes at least min_time seconds
+    number = 1
+    while True:
+        elapsed = time_calls(run, number)
+        if elapsed >= min_time or number >= 1_000_000:
+            return number
+        number = min(1_000_000, max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1)))
+
+
+def measure(timed, repeat, min_time):
+    # Per-call times of `repeat` samples. Cases with a reset are timed one call per sample, after
+    # an untimed reset; the others loop enough calls per sample to rise above timer noise.
+    if timed.reset is not None:
+        timed.reset()
+        timed.run()
+        samples = []
+        for _ in range(repeat):
+            timed.reset()
+            samples.append(time_calls(timed.run, 1))
+        return samples, 1
+    timed.run()
+    number = calibrate(timed.run, min_time)
+    return [time_calls(timed.run, number) / number for _ in range(repeat)], number
+
+
+def summarize(samples):
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'iqr': quartiles[2] - quartiles[0],
+        'max': max(samples),
+    }
+
+
+def environment():
+    packages = {}
+    for name in PACKAGES:
+        try:
+            packages[name] = version(name)
+        except PackageNotFoundError:
+            packages[name] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'packages': packages,
+        'commit': commit,
+        'dirty': dirty,
+    }
+
+
+def setup_django(upstream_url, database):
+    os.environ['BENCHMARK_UPSTREAM_URL'] = upstream_url
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    if database:
+        os.environ['BENCHMARK_DATABASE'] = database
+    import django
+    from django.conf import settings
+    django.setup()
+    # Every run starts from an empty, freshly migrated database
+    from django.core.management import call_command
+    if settings.DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+        path = Path(settings.DATABASES['default']['NAME'])
+        if path.exists():
+            path.unlink()
+        call_command('migrate', verbosity=0)
+    else:
+        call_command('migrate', verbosity=0)
+        call_command('flush', interactive=False, verbosity=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='Benchmark the forecast and scheduling hot paths')
+    parser.add_argument('--output', '-o', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare the results with an earlier results file')
+    parser.add_argument('-k', '--filter', action='append', default=[], help='Only run cases whose id contains this text (repeatable)')
+    parser.add_argument('--repeat', type=int, default=7, help='Timed samples per case')
+    parser.add_argument('--min-time', type=float, default=0.1, help='Minimum seconds per sample for looped cases')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change in the median reported as slower/faster')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 if any case got slower than the baseline')
+    parser.add_argument('--database', help='SQLite file to (re)create for the run (default: in the temp directory)')
+    parser.add_argument('--list', action='store_true', help='List the case ids and exit')
+    args = parser.parse_args(argv)
+
+    stub = UpstreamStub().start()
+    try:
+        setup_django(stub.url, args.database)
+        from .cases import BENCHMARKS
+        cases = [case for case in BENCHMARKS if not args.filter or any(text in case.id for text in args.filter)]
+        if args.list:
+            print('\n'.join(case.id for case in cases))
+            return 0
+
+        results = []
+        width = max([len(case.id) for case in cases] + [4])
+        for case in cases:
+            timed = case.setup(**case.params)
+            try:
+                samples, number = measure(timed, args.repeat, args.min_time)
+            finally:
+                if timed.teardown is not None:
+                    timed.teardown()
+            stats = summarize(samples)
+            results.append({'id': case.id, 'name': case.name, 'params': case.params, 'number': number, 'repeat': args.repeat,
+                            'stats': stats, 'samples': samples})
+            print(f"{case.id:<{width}}  {format_seconds(stats['median']):>10} +- {format_seconds(stats['iqr'] / 2):<9} ({number} x {args.repeat})",
+                  flush=True)
+    finally:
+        stub.stop()
+
+    output = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'options': {'repeat': args.repeat, 'min_time': args.min_time, 'filter': args.filter},
+        'upstream_requests': dict(stub.requests),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        rows = report(baseline, output, args.threshold)
+        if args.fail_on_regression and any(row[4] == 'slower' for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+POST_CODE = re.compile(r'^[A-Z]{1,2}[0-9][A-Z0-9]? [0-9][A-Z]{2}$')
+# Where postcodes without a fixture are placed: mainland Britain, roughly
+SYNTHETIC_LAT = (50.5, 57.5)
+SYNTHETIC_LON = (-4.5, 1.0)
+
+
+def load_fixture(name):
+    return json.loads((FIXTURES / name).read_text())
+
+
+class UpstreamStub:
+    # Serves the recorded OpenWeatherMap (zip geocoding, One Call) and PVGIS DRcalc responses on
+    # localhost, so the app can run its real HTTP path without network access or API keys.
+    # Other well-formed postcodes geocode to a fixed pseudo-random point, and weather and irradiance
+    # are answered from the fixture location nearest to the requested point.
+    # Each response is delayed by latency +- jitter seconds, and error_rate of them fail with
+    # error_status instead. GET /_stub/stats returns the request and error counts.
+    def __init__(self, latency=0.0, port=0, jitter=0.0, error_rate=0.0, error_status=503, seed=None):
+        self.latency = latency
+        self.port = port
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.geocode = load_fixture('geocode.json')
+        self.onecall = load_fixture('onecall.json')
+        self.drcalc = load_fixture('pvgis_drcalc.json')
+        self.requests = Counter()
+        self.errors = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                status, body = stub.respond(parts.path, {name: values[0] for name, values in parse_qs(parts.query).items()})
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                try:
+                    self.wfile.write(content)
+                except ConnectionError:
+                    # The client gave up waiting (e.g. it timed out)
+                    pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='upstream-stub', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {'requests': dict(self.requests), 'errors': dict(self.errors)}
+
+    def respond(self, path, query):
+        if path == '/_stub/stats':
+            return 200, self.stats()
+        api = 'geocode' if path.endswith('/geo/1.0/zip') else 'weather' if path.endswith('/data/3.0/onecall') else 'pvgis' if path.endswith('/DRcalc') else None
+        with self._lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+            self.requests[api or 'unknown'] += 1
+            if failed:
+                self.errors[api or 'unknown'] += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return self.error_status, {'message': 'injected error'}
+        if api == 'geocode':
+            post_code = ' '.join(query.get('zip', '').split(',')[0].upper().split())
+            if post_code in self.geocode:
+                return 200, self.geocode[post_code]
+            if not POST_CODE.match(post_code):
+                return 404, {'cod': '404', 'message': 'not found'}
+            return 200, self.synthetic_location(post_code)
+        if api == 'weather':
+            return 200, self.onecall[self.nearest(self.onecall, query)]
+        if api == 'pvgis':
+            location = self.drcalc[self.nearest(self.drcalc, query)]
+            response = location['months'].get(str(int(query.get('month', 0))))
+            if response is None:
+                return 400, {'message': 'month must be between 1 and 12'}
+            return 200, response
+        return 404, {'message': f'no fixture for {path}'}
+
+    def synthetic_location(self, post_code):
+        digest = hashlib.blake2b(post_code.encode(), digest_size=8).digest()
+        lat = SYNTHETIC_LAT[0] + (SYNTHETIC_LAT[1] - SYNTHETIC_LAT[0]) * int.from_bytes(digest[:4], 'big') / 2 ** 32
+        lon = SYNTHETIC_LON[0] + (SYNTHETIC_LON[1] - SYNTHETIC_LON[0]) * int.from_bytes(digest[4:], 'big') / 2 ** 32
+        return {'zip': post_code, 'name': post_code.split()[0], 'lat': round(lat, 4), 'lon': round(lon, 4), 'country': 'GB'}
+
+    def nearest(self, fixtures, query):
+        lat, lon = float(query['lat']), float(query['lon'])
+        return min(fixtures, key=lambda key: (fixtures[key]['lat'] - lat) ** 2 + (fixtures[key]['lon'] - lon) ** 2)
+
+
+def main(argv=None):
+    # Run the stub on its own, e.g. for a local server: OPENWEATHERMAP_API_URL=http://127.0.0.1:8765
+    # and PVGIS_API_URL=http://127.0.0.1:8765/api
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.stub', description='Serve the upstream API fixtures on localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Uniform +- variation of the latency, in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with --error-status')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+    stub = UpstreamStub(args.latency, args.port, args.jitter, args.error_rate, args.error_status, args.seed).start()
+    print(f'Serving upstream fixtures on {stub.url}', flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myProject.settings')
 
 application = get_asgi_application()
+
+# Load the appliance profiles when the worker starts rather than during its first request
+from solarApp.profiles import appliance_profiles  # noqa: E402
+
+appliance_profiles.warm()
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'solarApp.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -164,3 +165,177 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# External APIs
+# Base URLs are configurable so the app can be pointed at local stub servers
+
+OPENWEATHERMAP_API_URL = os.environ.get('OPENWEATHERMAP_API_URL', 'https://api.openweathermap.org')
+
+
+# Geocoding cache
+# Postcodes are cached in process (LRU + TTL) in front of the GeocodedPostCode table.
+# Postcodes the API rejects are cached for GEOCODE_NEGATIVE_TTL seconds.
+
+GEOCODE_CACHE_SIZE = int(os.environ.get('GEOCODE_CACHE_SIZE', 4096))
+GEOCODE_CACHE_TTL = int(os.environ.get('GEOCODE_CACHE_TTL', 60 * 60 * 24))
+GEOCODE_DB_TTL = int(os.environ.get('GEOCODE_DB_TTL', 60 * 60 * 24 * 365))
+GEOCODE_NEGATIVE_TTL = int(os.environ.get('GEOCODE_NEGATIVE_TTL', 60 * 60 * 24))
+
+
+# Irradiance profile store
+# PVGIS DRcalc profiles only depend on (lat, lon, month), so they are stored per grid cell
+# (IRRADIANCE_GRID_STEP degrees, fetched for the centre of the cell) and month.
+# Warm the store ahead of time with `python manage.py warm_irradiance_profiles`.
+
+PVGIS_API_URL = os.environ.get('PVGIS_API_URL', 'https://re.jrc.ec.europa.eu/api')
+IRRADIANCE_GRID_STEP = float(os.environ.get('IRRADIANCE_GRID_STEP', 0.05))
+IRRADIANCE_CACHE_SIZE = int(os.environ.get('IRRADIANCE_CACHE_SIZE', 2048))
+IRRADIANCE_CACHE_TTL = int(os.environ.get('IRRADIANCE_CACHE_TTL', 60 * 60 * 24))
+IRRADIANCE_PROFILE_MAX_AGE = int(os.environ.get('IRRADIANCE_PROFILE_MAX_AGE', 60 * 60 * 24 * 365))
+
+IRRADIANCE_DATASET_PATH = os.environ.get('IRRADIANCE_DATASET_PATH', str(BASE_DIR / 'data' / 'irradiance'))
+
+
+# Data providers
+# Fallback order for irradiance ('store': cache and IrradianceProfile table, 'dataset': the memory-mapped
+# dataset from import_irradiance_dataset, 'pvgis': the live API) and for weather ('openweathermap').
+# Local providers are always consulted before remote ones; use IRRADIANCE_PROVIDERS=dataset to run offline.
+# A remote request still pending after *_HEDGE_AFTER seconds is raced against the next provider, or
+# repeated if it is the last one (0 disables hedging). Stats are served at /api/providers/stats/.
+
+IRRADIANCE_PROVIDERS = os.environ.get('IRRADIANCE_PROVIDERS', 'store,pvgis').split(',')
+IRRADIANCE_HEDGE_AFTER = float(os.environ.get('IRRADIANCE_HEDGE_AFTER', 3))
+WEATHER_PROVIDERS = os.environ.get('WEATHER_PROVIDERS', 'openweathermap').split(',')
+WEATHER_HEDGE_AFTER = float(os.environ.get('WEATHER_HEDGE_AFTER', 1))
+
+
+# Appliance scheduling
+# The joint scheduler returns its best schedule so far once SCHEDULER_TIME_BUDGET seconds have passed.
+# Appliances run one at a time unless a request sets allow_overlap. HOUSEHOLD_POWER_CAP (W) then limits their
+# combined load; without overlap it only rules out appliances that draw more on their own. Requests may override it.
+
+SCHEDULER_TIME_BUDGET = float(os.environ.get('SCHEDULER_TIME_BUDGET', 0.5))
+HOUSEHOLD_POWER_CAP = float(os.environ['HOUSEHOLD_POWER_CAP']) if os.environ.get('HOUSEHOLD_POWER_CAP') else None
+
+
+# PV modelling
+# Prebuilt ModelChains are pooled per (tilt, azimuth, location cell) and solar positions are shared
+# between every configuration at the same location cell.
+
+MODEL_CHAIN_POOL_SIZE = int(os.environ.get('MODEL_CHAIN_POOL_SIZE', 256))
+SOLAR_POSITION_CACHE_SIZE = int(os.environ.get('SOLAR_POSITION_CACHE_SIZE', 1024))
+SOLAR_POSITION_CACHE_TTL = int(os.environ.get('SOLAR_POSITION_CACHE_TTL', 60 * 60 * 24))
+
+# Upper bound on panel configurations across all sites of one /api/solardata/batch/ request
+SOLAR_BATCH_MAX_CONFIGURATIONS = int(os.environ.get('SOLAR_BATCH_MAX_CONFIGURATIONS', 500))
+
+
+# Outbound HTTP
+# Shared async client for OpenWeatherMap and PVGIS: one keep-alive pool per worker process,
+# per-host concurrency limits, timeouts (seconds) and retries with exponential backoff.
+
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 10))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3))
+HTTP_MAX_CONNECTIONS = int(os.environ.get('HTTP_MAX_CONNECTIONS', 100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('HTTP_MAX_KEEPALIVE_CONNECTIONS', 20))
+HTTP_MAX_CONCURRENCY_PER_HOST = int(os.environ.get('HTTP_MAX_CONCURRENCY_PER_HOST', 10))
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 2))
+HTTP_RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF', 0.2))
+
+
+# Weather cache
+# Current conditions are cached per WEATHER_GRID_STEP cell for WEATHER_CACHE_TTL seconds, then served
+# stale for up to WEATHER_CACHE_STALE_TTL more while a background refresh runs.
+
+WEATHER_GRID_STEP = float(os.environ.get('WEATHER_GRID_STEP', 0.1))
+WEATHER_CACHE_SIZE = int(os.environ.get('WEATHER_CACHE_SIZE', 2048))
+WEATHER_CACHE_TTL = int(os.environ.get('WEATHER_CACHE_TTL', 300))
+WEATHER_CACHE_STALE_TTL = int(os.environ.get('WEATHER_CACHE_STALE_TTL', 1800))
+
+
+# Appliance profiles
+# ApplianceConsumption is held in memory per worker and reloaded when the table changes. Changes made by
+# other processes (e.g. import_appliance_profiles) are announced through the shared cache, so they reach
+# every worker when the cache is shared, and otherwise after APPLIANCE_PROFILE_TTL seconds.
+
+APPLIANCE_PROFILE_TTL = int(os.environ.get('APPLIANCE_PROFILE_TTL', 300))
+
+
+# Submission history
+# Cursor-paginated list of a user's saved runs, newest first.
+
+SUBMISSION_HISTORY_PAGE_SIZE = int(os.environ.get('SUBMISSION_HISTORY_PAGE_SIZE', 50))
+SUBMISSION_HISTORY_MAX_PAGE_SIZE = int(os.environ.get('SUBMISSION_HISTORY_MAX_PAGE_SIZE', 200))
+
+
+# Shared cache
+# Defaults to per-process memory; point DJANGO_CACHE_BACKEND/DJANGO_CACHE_LOCATION at Redis
+# (django.core.cache.backends.redis.RedisCache) so every worker sees the same entries and invalidations.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', ''),
+    }
+}
+
+
+# Submission chart data
+# Rendered chart responses are cached per submission for CHART_DATA_CACHE_TTL seconds and dropped on save.
+
+CHART_DATA_CACHE_TTL = int(os.environ.get('CHART_DATA_CACHE_TTL', 60 * 60 * 24))
+
+
+# Forecast horizon
+# /api/solardata/ models up to SOLAR_MAX_HORIZON_DAYS consecutive days as one series (horizon_days),
+# at resolution_minutes steps; SOLAR_MAX_SERIES_POINTS bounds horizon and resolution together.
+
+SOLAR_MAX_HORIZON_DAYS = int(os.environ.get('SOLAR_MAX_HORIZON_DAYS', 14))
+SOLAR_MAX_SERIES_POINTS = int(os.environ.get('SOLAR_MAX_SERIES_POINTS', 7 * 24 * 60))
+
+
+# Regional forecast grid
+# `python manage.py refresh_forecast_grid` precomputes output for every tilt x azimuth preset below, per
+# irradiance grid cell and day, for FORECAST_GRID_DAYS days. Without --post-codes or --bbox it covers
+# FORECAST_GRID_BBOX (min lat, min lon, max lat, max lon; the UK by default).
+
+FORECAST_GRID_TILTS = [float(tilt) for tilt in os.environ.get('FORECAST_GRID_TILTS', '30,35,40,45').split(',')]
+FORECAST_GRID_AZIMUTHS = [float(azimuth) for azimuth in os.environ.get('FORECAST_GRID_AZIMUTHS', '90,135,180,225,270').split(',')]
+FORECAST_GRID_DAYS = int(os.environ.get('FORECAST_GRID_DAYS', 3))
+FORECAST_GRID_BBOX = [float(value) for value in os.environ.get('FORECAST_GRID_BBOX', '49.9,-8.2,58.7,1.8').split(',')]
+
+
+# Forecast result cache
+# /api/solardata/ results are cached per panel, keyed on the location cell, date, horizon, resolution,
+# panel angles (rounded to FORECAST_CACHE_ANGLE_DECIMALS places), appliances and power cap.
+# FORECAST_CACHE_SIZE entries are kept per process in front of the shared cache for FORECAST_CACHE_TTL
+# seconds (0 disables the cache). Hit rates are served at /api/solardata/cache/stats/.
+
+FORECAST_CACHE_SIZE = int(os.environ.get('FORECAST_CACHE_SIZE', 256))
+FORECAST_CACHE_TTL = int(os.environ.get('FORECAST_CACHE_TTL', 60 * 15))
+FORECAST_CACHE_ANGLE_DECIMALS = int(os.environ.get('FORECAST_CACHE_ANGLE_DECIMALS', 1))
+
+
+# Metrics
+# Per-stage, upstream and database timings plus cache hit ratios are served in the Prometheus text
+# format at /metrics to requests sending METRICS_TOKEN as a bearer token; while it is unset /metrics
+# answers 404. Requests sending 'X-Server-Timing: 1' get a Server-Timing header if SERVER_TIMING is
+# on (staff always can).
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'False').lower() in ('true', '1', 'yes')
+
+
+# Background forecast jobs
+# /api/solardata/jobs/ and /api/solardata/batch/jobs/ queue requests in the database for
+# `manage.py run_forecast_jobs`, which runs FORECAST_JOB_WORKERS worker processes. Jobs running
+# longer than FORECAST_JOB_TIMEOUT seconds are stopped, results are kept for
+# FORECAST_JOB_RESULT_TTL seconds, and each user may have FORECAST_JOB_MAX_PENDING jobs queued or
+# running. Clients poll /api/jobs/<id>/ at the interval its Retry-After header gives.
+
+FORECAST_JOB_WORKERS = int(os.environ.get('FORECAST_JOB_WORKERS', 2))
+FORECAST_JOB_POLL_INTERVAL = float(os.environ.get('FORECAST_JOB_POLL_INTERVAL', 0.5))
+FORECAST_JOB_TIMEOUT = int(os.environ.get('FORECAST_JOB_TIMEOUT', 60 * 5))
+FORECAST_JOB_RESULT_TTL = int(os.environ.get('FORECAST_JOB_RESULT_TTL', 60 * 60))
+FORECAST_JOB_MAX_PENDING = int(os.environ.get('FORECAST_JOB_MAX_PENDING', 20))
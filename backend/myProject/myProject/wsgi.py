@@ -18,3 +18,8 @@ application = get_wsgi_application()
 
 logging.basicConfig(filename="django.log", level=logging.DEBUG)
 logging.debug("Django initialization started")
+
+# Load the appliance profiles when the worker starts rather than during its first request
+from solarApp.profiles import appliance_profiles  # noqa: E402
+
+appliance_profiles.warm()
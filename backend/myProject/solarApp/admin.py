@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import Submission
+from .models import Appliance, ForecastJob, Submission
 
 admin.site.register(Submission)
+admin.site.register(Appliance)
+admin.site.register(ForecastJob)
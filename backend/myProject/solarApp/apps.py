@@ -1,6 +1,40 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
 
 
 class SolarappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'solarApp'
+
+    def ready(self):
+        from .models import Appliance, ApplianceConsumption, Submission
+        from .profiles import appliance_profiles
+        from .chart_cache import invalidate_chart_response
+
+        # Drop the in-process appliance profiles whenever the catalogue or a profile changes
+        for model in (Appliance, ApplianceConsumption):
+            post_save.connect(appliance_profiles.invalidate, sender=model, dispatch_uid=f'appliance_profiles_save_{model.__name__}')
+            post_delete.connect(appliance_profiles.invalidate, sender=model, dispatch_uid=f'appliance_profiles_delete_{model.__name__}')
+        m2m_changed.connect(appliance_profiles.invalidate, sender=Appliance.run_after.through, dispatch_uid='appliance_profiles_run_after')
+        post_migrate.connect(appliance_profiles.invalidate, sender=self, dispatch_uid='appliance_profiles_migrate')
+
+        # Cached chart responses are only valid for the version they were rendered from
+        post_save.connect(invalidate_chart_response, sender=Submission, dispatch_uid='chart_response_save')
+        post_delete.connect(invalidate_chart_response, sender=Submission, dispatch_uid='chart_response_delete')
+
+        # Cache hit ratios and provider outcomes are read when /metrics is scraped
+        from .forecast_cache import forecast_cache
+        from .geocoding import geocode_cache
+        from .irradiance import irradiance_cache
+        from .metrics import registry
+        from .modelling import solar_position_cache
+        from .providers import provider_stats
+        from .weather import weather_cache
+        for name, cache in (('geocode', geocode_cache), ('irradiance', irradiance_cache), ('solar_position', solar_position_cache),
+                            ('weather', weather_cache), ('forecast', forecast_cache)):
+            registry.register_cache(name, cache.stats)
+        registry.register_collector('providers', provider_stats.render_metrics)
+
+        # Queue depth and age of the background forecast jobs
+        from .jobs import render_metrics as render_job_metrics
+        registry.register_collector('forecast_jobs', render_job_metrics)
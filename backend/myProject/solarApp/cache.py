@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    # Thread-safe in-process LRU cache where every entry also expires after a TTL
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        # (hits, misses, entries) for the metrics endpoint
+        return self.hits, self.misses, len(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class AsyncRefreshingCache:
+    # Cache for short-lived upstream data, used from a single event loop. Entries are fresh for
+    # `ttl` seconds and are then served stale for up to `stale_ttl` more while one background
+    # refresh runs. Concurrent misses for the same key share a single load (single-flight).
+    def __init__(self, maxsize=1024, ttl=300, stale_ttl=1800):
+        self.ttl = ttl
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl + stale_ttl)
+        self._inflight = {}
+
+    async def get(self, key, load, cacheable=None):
+        # load is a zero-argument coroutine function; values failing cacheable(value) are returned but not stored
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fresh_until = entry
+            if fresh_until <= time.monotonic() and key not in self._inflight:
+                self._load(key, load, cacheable)
+            return value
+        task = self._inflight.get(key) or self._load(key, load, cacheable)
+        return await asyncio.shield(task)
+
+    def _load(self, key, load, cacheable):
+        async def run():
+            try:
+                value = await load()
+                if cacheable is None or cacheable(value):
+                    self._entries.set(key, (value, time.monotonic() + self.ttl))
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        # Background refreshes have nobody awaiting them, so retrieve their errors here
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = task
+        return task
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        # Stale entries served while refreshing count as hits
+        return self._entries.stats()
+
+    def __len__(self):
+        return len(self._entries)
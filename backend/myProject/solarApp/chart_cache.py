@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+
+def chart_cache_key(pk):
+    return f"submission-chart:v2:{pk}"
+
+
+def submission_version(submission):
+    # updated_at changes on every save, so it identifies the version of the submission
+    return f"{submission.pk}-{int(submission.updated_at.timestamp() * 1_000_000)}"
+
+
+def get_chart_response(pk):
+    # {'etag', 'last_modified', 'content', 'user_id'} for the current version, or None
+    return cache.get(chart_cache_key(pk))
+
+
+def set_chart_response(submission, data):
+    entry = {
+        'etag': f'"{submission_version(submission)}"',
+        'last_modified': int(submission.updated_at.timestamp()),
+        'content': JSONRenderer().render(data),
+        'user_id': submission.user_id,
+    }
+    cache.set(chart_cache_key(submission.pk), entry, settings.CHART_DATA_CACHE_TTL)
+    return entry
+
+
+def invalidate_chart_response(sender, instance, **kwargs):
+    cache.delete(chart_cache_key(instance.pk))
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from .cache import TTLCache
+from .irradiance import location_cell
+from .metrics import stage
+from .scheduling import ScheduleResult
+
+# SolarDataView results shared between requests whose inputs normalize to the same key. Output is
+# already modelled at the centre of the location cell, so keying on the cell instead of the exact
+# coordinates changes nothing. Entries are for a single panel: production and schedule scores scale
+# linearly with the number of panels and the chosen starts do not change, so the panel count is
+# applied to the cached entry instead of being part of the key.
+
+CACHE_VERSION = 2
+
+
+@dataclass(frozen=True)
+class ForecastResult:
+    production: np.ndarray  # AC W per panel at every step of the series (read-only)
+    clear_sky_output: float  # Wh per panel, None unless it came from the regional forecast grid
+    solar_altitude: float
+    solar_azimuth: float
+    schedule: ScheduleResult  # chosen on the per-panel production
+
+
+def normalize_angle(value):
+    return round(float(value), settings.FORECAST_CACHE_ANGLE_DECIMALS)
+
+
+def forecast_key(lat, lon, day, horizon_days, resolution_minutes, panel_tilt, panel_orientation, profiles, power_cap, allow_overlap=False):
+    # The appliances are identified by a digest of their profiles, so re-imported profiles miss
+    lat_cell, lon_cell = location_cell(lat, lon)
+    digest = hashlib.blake2b(digest_size=16)
+    for profile in sorted(profiles, key=lambda profile: profile.name):
+        digest.update(f"{profile.name}:{','.join(profile.run_after)}:".encode())
+        digest.update(np.ascontiguousarray(profile.consumption, dtype=float).tobytes())
+    return (f"forecast:{CACHE_VERSION}:{lat_cell}:{lon_cell}:{day.isoformat()}:{horizon_days}:{resolution_minutes}:"
+            f"{panel_tilt}:{panel_orientation}:{power_cap}:{int(bool(allow_overlap))}:{digest.hexdigest()}")
+
+
+class ForecastCache:
+    # Per-process LRU in front of the shared Django cache. Entries found in the shared cache are
+    # copied into the process; a shared cache that fails is treated as a miss.
+    def __init__(self, maxsize, ttl):
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._counts = dict.fromkeys(('memory_hits', 'shared_hits', 'misses', 'errors'), 0)
+        self._lock = threading.Lock()
+
+    @stage('forecast_cache')
+    def get(self, key):
+        if not self.ttl:
+            return None
+        result = self.memory.get(key)
+        if result is not None:
+            self.record('memory_hits')
+            return result
+        try:
+            result = cache.get(key)
+        except Exception as e:
+            self.record('errors')
+            print(f"Forecast cache read failed: {str(e)}")
+            result = None
+        if result is None:
+            self.record('misses')
+            return None
+        self.record('shared_hits')
+        self.memory.set(key, result)
+        return result
+
+    def set(self, key, result):
+        if not self.ttl:
+            return
+        result.production.flags.writeable = False
+        self.memory.set(key, result)
+        try:
+            cache.set(key, result, self.ttl)
+        except Exception as e:
+            self.record('errors')
+            print(f"Forecast cache write failed: {str(e)}")
+
+    def record(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        requests = counts['memory_hits'] + counts['shared_hits'] + counts['misses']
+        hits = counts['memory_hits'] + counts['shared_hits']
+        return dict(counts, requests=requests, hit_rate=hits / requests if requests else 0.0, entries=len(self.memory))
+
+    def stats(self):
+        # (hits in either tier, misses, entries in this process) for the metrics endpoint
+        with self._lock:
+            return self._counts['memory_hits'] + self._counts['shared_hits'], self._counts['misses'], len(self.memory)
+
+    def clear(self):
+        self.memory.clear()
+
+
+forecast_cache = ForecastCache(maxsize=settings.FORECAST_CACHE_SIZE, ttl=settings.FORECAST_CACHE_TTL)
@@ -0,0 +1,53 @@
+from datetime import datetime, time
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+from . import timeseries
+from .irradiance import location_cell, profile_series
+from .metrics import stage
+from .modelling import get_location, simulate_configurations
+from .models import RegionalForecast
+
+
+def forecast_presets():
+    # Standard (tilt, azimuth) pairs precomputed for every cell
+    return [(tilt, azimuth) for tilt in settings.FORECAST_GRID_TILTS for azimuth in settings.FORECAST_GRID_AZIMUTHS]
+
+
+def day_times(day):
+    return pd.date_range(start=datetime.combine(day, time()), periods=24, freq='1h', tz='UTC')
+
+
+def compute_regional_forecasts(lat_cell, lon_cell, day, profile, presets):
+    # Forecast and clear-sky output per panel for every preset at one cell and day, as unsaved rows
+    times = day_times(day)
+    location = get_location(lat_cell, lon_cell)
+    solar_position = location.get_solarposition(times)
+    tilts = [tilt for tilt, _ in presets]
+    azimuths = [azimuth for _, azimuth in presets]
+    forecast = simulate_configurations(profile_series({day.month: profile}, times), solar_position, tilts, azimuths)
+    clear_sky_weather = location.get_clearsky(times, model='simplified_solis', solar_position=solar_position)
+    clear_sky = simulate_configurations(clear_sky_weather, solar_position, tilts, azimuths)
+    computed_at = timezone.now()
+    return [RegionalForecast(lat=lat_cell, lon=lon_cell, date=day, panel_tilt=tilt, panel_orientation=azimuth,
+                             forecast=timeseries.encode_values(forecast[:, column]),
+                             clear_sky=timeseries.encode_values(clear_sky[:, column]), computed_at=computed_at)
+            for column, (tilt, azimuth) in enumerate(presets)]
+
+
+def store_regional_forecasts(rows):
+    RegionalForecast.objects.bulk_create(rows, update_conflicts=True,
+                                         unique_fields=['lat', 'lon', 'date', 'panel_tilt', 'panel_orientation'],
+                                         update_fields=['forecast', 'clear_sky', 'computed_at'])
+
+
+@stage('grid_lookup')
+def lookup_regional_forecast(lat, lon, day, panel_tilt, panel_orientation):
+    # (forecast, clear_sky) hourly W per panel if this cell, day and preset were precomputed, else None
+    lat_cell, lon_cell = location_cell(lat, lon)
+    row = (RegionalForecast.objects
+           .filter(lat=lat_cell, lon=lon_cell, date=day, panel_tilt=float(panel_tilt), panel_orientation=float(panel_orientation))
+           .values_list('forecast', 'clear_sky').first())
+    if row is None:
+        return None
+    return timeseries.decode_values(row[0]), timeseries.decode_values(row[1])
@@ -0,0 +1,78 @@
+import os
+from datetime import timedelta
+import httpx
+from django.conf import settings
+from django.utils import timezone
+from .cache import TTLCache, MISSING
+from .http_client import http_client
+from .metrics import stage
+from .models import GeocodedPostCode
+
+# In-process tier in front of the GeocodedPostCode table
+geocode_cache = TTLCache(maxsize=settings.GEOCODE_CACHE_SIZE, ttl=settings.GEOCODE_CACHE_TTL)
+
+NOT_FOUND = (None, None)
+# Longer input is not a postcode, and would not fit the GeocodedPostCode table
+MAX_POST_CODE_LENGTH = GeocodedPostCode._meta.get_field('post_code').max_length
+
+
+def normalize_post_code(post_code):
+    # "sw1a  1aa" and "SW1A 1AA" are the same postcode, so they should share a cache entry
+    return ' '.join(str(post_code).upper().split())
+
+
+def lookup_geocoded_post_code(post_code):
+    try:
+        geocoded = GeocodedPostCode.objects.get(post_code=post_code)
+    except GeocodedPostCode.DoesNotExist:
+        return MISSING
+    ttl = settings.GEOCODE_DB_TTL if geocoded.found else settings.GEOCODE_NEGATIVE_TTL
+    if geocoded.updated_at < timezone.now() - timedelta(seconds=ttl):
+        return MISSING
+    return (geocoded.lat, geocoded.lon)
+
+
+def store_geocoded_post_code(post_code, lat, lon):
+    GeocodedPostCode.objects.update_or_create(post_code=post_code, defaults={'lat': lat, 'lon': lon})
+
+
+def fetch_lat_lon_from_post_code(post_code):
+    # Returns (lat, lon), NOT_FOUND for postcodes the API rejects, or None if the lookup failed and should not be cached
+    geocoding_api_key = os.environ.get('OPENWEATHERMAP_API_KEY')
+    geocoding_api_url = f"{settings.OPENWEATHERMAP_API_URL}/geo/1.0/zip?zip={post_code}&appid={geocoding_api_key}"
+    try:
+        geocoding_response = http_client.get_sync(geocoding_api_url)
+    except httpx.HTTPError as e:
+        print(f"Geocoding API Error: {str(e)}")
+        return None
+    if geocoding_response.status_code == 200:
+        geocoding_data = geocoding_response.json()
+        return geocoding_data.get('lat'), geocoding_data.get('lon')
+    print(f"Geocoding API Error: {geocoding_response.text}")
+    if geocoding_response.status_code in (400, 404):
+        return NOT_FOUND
+    return None
+
+
+@stage('geocode')
+def get_lat_lon_from_post_code(post_code):
+    if not post_code:
+        return NOT_FOUND
+    post_code = normalize_post_code(post_code)
+    if len(post_code) > MAX_POST_CODE_LENGTH:
+        return NOT_FOUND
+
+    lat_lon = geocode_cache.get(post_code, MISSING)
+    if lat_lon is not MISSING:
+        return lat_lon
+
+    lat_lon = lookup_geocoded_post_code(post_code)
+    if lat_lon is MISSING:
+        lat_lon = fetch_lat_lon_from_post_code(post_code)
+        if lat_lon is None:
+            return NOT_FOUND
+        store_geocoded_post_code(post_code, *lat_lon)
+
+    ttl = settings.GEOCODE_CACHE_TTL if lat_lon != NOT_FOUND else settings.GEOCODE_NEGATIVE_TTL
+    geocode_cache.set(post_code, lat_lon, ttl=min(ttl, settings.GEOCODE_CACHE_TTL))
+    return lat_lon
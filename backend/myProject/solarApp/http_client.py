@@ -0,0 +1,84 @@
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import httpx
+from django.conf import settings
+from .metrics import record_upstream
+
+# Upstream responses worth retrying; anything else is returned to the caller as-is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AsyncHTTPClient:
+    # Shared async HTTP client for the external APIs. It owns one event loop on a background
+    # thread, so a single keep-alive connection pool serves every request thread in the worker
+    # (under both WSGI and ASGI). Requests to a host are capped at max_per_host at a time,
+    # time out, and are retried with exponential backoff on connection errors and 429/5xx.
+    def __init__(self, timeout, connect_timeout, max_connections, max_keepalive, max_per_host, retries, backoff):
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self._loop = None
+        self._client = None
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='http-client', daemon=True).start()
+            return self._loop
+
+    def run(self, coroutine):
+        # Run a coroutine on the client's loop and wait for it from synchronous code
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def gather(self, coroutines):
+        # Run a dict of coroutines concurrently; failures come back as exception values
+        async def gather_all():
+            results = await asyncio.gather(*coroutines.values(), return_exceptions=True)
+            return dict(zip(coroutines, results))
+        return self.run(gather_all())
+
+    async def get(self, url, **kwargs):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                async with self._host_limits[host]:
+                    started = time.perf_counter()
+                    response = await self._client.get(url, **kwargs)
+            except httpx.TransportError as e:
+                record_upstream(host, type(e).__name__, time.perf_counter() - started)
+                if last_attempt:
+                    raise
+            else:
+                record_upstream(host, response.status_code, time.perf_counter() - started)
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    return response
+            await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    def get_sync(self, url, **kwargs):
+        return self.run(self.get(url, **kwargs))
+
+
+http_client = AsyncHTTPClient(
+    timeout=settings.HTTP_TIMEOUT,
+    connect_timeout=settings.HTTP_CONNECT_TIMEOUT,
+    max_connections=settings.HTTP_MAX_CONNECTIONS,
+    max_keepalive=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    max_per_host=settings.HTTP_MAX_CONCURRENCY_PER_HOST,
+    retries=settings.HTTP_RETRIES,
+    backoff=settings.HTTP_RETRY_BACKOFF,
+)
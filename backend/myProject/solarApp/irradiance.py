@@ -0,0 +1,175 @@
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+from .cache import TTLCache
+from .http_client import http_client
+from .irradiance_dataset import get_dataset
+from .metrics import stage
+from .models import IrradianceProfile
+from .providers import Provider, ProviderError, build_chain
+
+# In-process tier in front of the IrradianceProfile table, keyed by (lat cell, lon cell, month)
+irradiance_cache = TTLCache(maxsize=settings.IRRADIANCE_CACHE_SIZE, ttl=settings.IRRADIANCE_CACHE_TTL)
+
+
+def location_cell(lat, lon, step=None):
+    # Snap a coordinate to the centre of its grid cell so nearby requests share one profile
+    step = step or settings.IRRADIANCE_GRID_STEP
+    return round(round(float(lat) / step) * step, 4), round(round(float(lon) / step) * step, 4)
+
+
+async def afetch_pvgis_daily_profile(lat, lon, month):
+    url = f"{settings.PVGIS_API_URL}/DRcalc?lat={lat}&lon={lon}&month={month}&global=1&outputformat=json"
+    solar_response = await http_client.get(url)
+    if solar_response.status_code == 200:
+        solar_data = solar_response.json()
+        daily_profile = solar_data['outputs']['daily_profile']
+        ghi = [hour['G(i)'] for hour in daily_profile]
+        dni = [hour['Gb(i)'] for hour in daily_profile]
+        dhi = [hour['Gd(i)'] for hour in daily_profile]
+        return ghi, dni, dhi
+    else:
+        raise ProviderError(f"Error fetching solar data: {solar_response.status_code}", status=solar_response.status_code)
+
+
+def fetch_pvgis_daily_profile(lat, lon, month):
+    return http_client.run(afetch_pvgis_daily_profile(lat, lon, month))
+
+
+def lookup_irradiance_profile(lat_cell, lon_cell, month):
+    max_age = timezone.now() - timedelta(seconds=settings.IRRADIANCE_PROFILE_MAX_AGE)
+    profile = IrradianceProfile.objects.filter(lat=lat_cell, lon=lon_cell, month=month, fetched_at__gte=max_age).first()
+    if profile is None:
+        return None
+    return profile.ghi, profile.dni, profile.dhi
+
+
+def store_irradiance_profile(lat_cell, lon_cell, month, ghi, dni, dhi):
+    IrradianceProfile.objects.update_or_create(lat=lat_cell, lon=lon_cell, month=month,
+                                               defaults={'ghi': ghi, 'dni': dni, 'dhi': dhi, 'fetched_at': timezone.now()})
+
+
+class StoreIrradianceProvider(Provider):
+    # Memory, then the IrradianceProfile table; keeps whatever remote providers return
+    name = 'store'
+    local = True
+
+    def get(self, lat, lon, month):
+        lat_cell, lon_cell = location_cell(lat, lon)
+        key = (lat_cell, lon_cell, month)
+        profile = irradiance_cache.get(key)
+        if profile is None:
+            profile = lookup_irradiance_profile(lat_cell, lon_cell, month)
+            if profile is not None:
+                irradiance_cache.set(key, profile)
+        return profile
+
+    def save(self, lat, lon, month, value):
+        lat_cell, lon_cell = location_cell(lat, lon)
+        store_irradiance_profile(lat_cell, lon_cell, month, *value)
+        irradiance_cache.set((lat_cell, lon_cell, month), value)
+
+
+class DatasetIrradianceProvider(Provider):
+    # The memory-mapped dataset at IRRADIANCE_DATASET_PATH (see import_irradiance_dataset)
+    name = 'dataset'
+    local = True
+
+    def get(self, lat, lon, month):
+        dataset = get_dataset()
+        if dataset is None:
+            raise LookupError(f"There is no irradiance dataset at {settings.IRRADIANCE_DATASET_PATH}")
+        return dataset.get(*location_cell(lat, lon), month)
+
+
+class PVGISIrradianceProvider(Provider):
+    # Profiles are always fetched for the centre of the cell
+    name = 'pvgis'
+
+    async def afetch(self, lat, lon, month):
+        return await afetch_pvgis_daily_profile(*location_cell(lat, lon), month)
+
+
+IRRADIANCE_PROVIDERS = {provider.name: provider for provider in (StoreIrradianceProvider, DatasetIrradianceProvider, PVGISIrradianceProvider)}
+
+irradiance_providers = build_chain('irradiance', IRRADIANCE_PROVIDERS, settings.IRRADIANCE_PROVIDERS,
+                                   hedge_after=settings.IRRADIANCE_HEDGE_AFTER)
+
+
+def cached_irradiance_profile(lat, lon, month):
+    # Local providers only (memory, database, dataset); None if none of them has the profile
+    return irradiance_providers.get_local(lat, lon, month)
+
+
+def save_irradiance_profile(lat, lon, month, profile):
+    irradiance_providers.save(lat, lon, month, value=profile)
+
+
+async def afetch_irradiance_profile(lat, lon, month):
+    # Network half of the read-through path, through the remote providers in order
+    return await irradiance_providers.afetch(lat, lon, month)
+
+
+def get_irradiance_profile(lat, lon, month, refresh=False):
+    # Read-through lookup: local providers, then remote ones
+    profile = None if refresh else cached_irradiance_profile(lat, lon, month)
+    if profile is None:
+        profile = http_client.run(afetch_irradiance_profile(lat, lon, month))
+        save_irradiance_profile(lat, lon, month, profile)
+    return profile
+
+
+@stage('irradiance')
+def fetch_solar_profiles(locations):
+    # Irradiance profiles for several (lat, lon, month) at once; cold cells are fetched concurrently
+    profiles = {location: cached_irradiance_profile(*location) for location in locations}
+    missing = {location: afetch_irradiance_profile(*location) for location, profile in profiles.items() if profile is None}
+    for location, profile in http_client.gather(missing).items():
+        if not isinstance(profile, Exception):
+            save_irradiance_profile(*location, profile)
+        profiles[location] = profile
+    return profiles
+
+
+def cells_in_bbox(min_lat, min_lon, max_lat, max_lon, step=None):
+    # Every grid cell centre inside a bounding box
+    step = step or settings.IRRADIANCE_GRID_STEP
+    lat, _ = location_cell(min_lat, min_lon, step)
+    while lat <= max_lat + step / 2:
+        lon = location_cell(min_lat, min_lon, step)[1]
+        while lon <= max_lon + step / 2:
+            yield location_cell(lat, lon, step)
+            lon += step
+        lat += step
+
+
+def profile_series(profiles, times):
+    # Lay {month: (ghi, dni, dhi)} daily profiles out along a UTC index, so a horizon spanning
+    # several days (and months) becomes one weather frame for a single model run. Sub-hourly
+    # timestamps take the value of their hour; see follow_solar_position.
+    months = times.month.to_numpy()
+    hours = times.hour.to_numpy()
+    columns = {name: np.zeros(len(times)) for name in ('ghi', 'dni', 'dhi')}
+    for month, profile in profiles.items():
+        in_month = months == month
+        for name, values in zip(columns, profile):
+            columns[name][in_month] = np.asarray(values, dtype=float)[hours[in_month]]
+    return pd.DataFrame(columns, index=times)
+
+
+def follow_solar_position(weather, solar_position):
+    # Reshape hourly-held irradiance within each hour by the cosine of the solar zenith, scaled so
+    # every hour keeps its PVGIS mean (and so its energy). GHI and DHI then rise and fall with the
+    # sun inside the hour, DNI is held while the sun is up, and hours where the sun never clears
+    # the horizon at any sample keep their flat values.
+    cos_zenith = np.clip(np.cos(np.radians(solar_position['apparent_zenith'].to_numpy())), 0, None)
+    hour_mean = pd.Series(cos_zenith, index=weather.index).groupby(weather.index.floor('h')).transform('mean').to_numpy()
+    sun_up = hour_mean > 0
+    factor = np.where(sun_up, cos_zenith / np.where(sun_up, hour_mean, 1), 1)
+    return pd.DataFrame({
+        'ghi': weather['ghi'].to_numpy() * factor,
+        'dni': np.where(sun_up & (cos_zenith == 0), 0, weather['dni'].to_numpy()),
+        'dhi': weather['dhi'].to_numpy() * factor,
+    }, index=weather.index)
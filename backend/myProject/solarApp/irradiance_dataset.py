@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+
+# On-disk irradiance dataset for serving profiles without PVGIS, written by import_irradiance_dataset.
+# Every import is a directory holding:
+#   meta.json       {"version": 1, "grid_step": degrees}
+#   cells.npy       float64 (cells, 2) lat/lon cell centres
+#   irradiance.npy  float32 (cells, 12 months, 24 hours, 3) ghi/dni/dhi, NaN where a month is missing
+# The dataset path holds one such directory per import and a `current` symlink to the latest, or
+# (as written before versioning) the files themselves. irradiance.npy is memory-mapped read-only,
+# so every worker on a host shares one page-cached copy.
+
+DATASET_VERSION = 1
+COMPONENTS = ('ghi', 'dni', 'dhi')
+CURRENT = 'current'
+
+
+def dataset_directory(path):
+    # The directory holding the files of the dataset at path, resolved once so that every file is
+    # read from the same import
+    path = Path(path)
+    current = path / CURRENT
+    return current.resolve() if current.is_symlink() else path
+
+
+class IrradianceDataset:
+    def __init__(self, path):
+        self.path = dataset_directory(path)
+        meta = json.loads((self.path / 'meta.json').read_text())
+        if meta.get('version') != DATASET_VERSION:
+            raise ValueError(f"Unsupported irradiance dataset version {meta.get('version')} in {self.path}")
+        self.grid_step = meta['grid_step']
+        self.cells = np.load(self.path / 'cells.npy')
+        self.values = np.load(self.path / 'irradiance.npy', mmap_mode='r')
+        self.index = {(float(lat), float(lon)): i for i, (lat, lon) in enumerate(self.cells)}
+
+    def get(self, lat_cell, lon_cell, month):
+        # (ghi, dni, dhi) views into the mapped file, or None if the cell or any hour of the month is
+        # not in the dataset
+        i = self.index.get((float(lat_cell), float(lon_cell)))
+        if i is None:
+            return None
+        profile = self.values[i, month - 1]
+        if np.isnan(profile).any():
+            return None
+        return profile[:, 0], profile[:, 1], profile[:, 2]
+
+    def __len__(self):
+        return len(self.cells)
+
+
+def write_dataset(path, profiles, grid_step):
+    # profiles maps (lat cell, lon cell) -> float array (12, 24, 3). The files go into a new version
+    # directory and the `current` symlink is swapped to it with one os.replace, so a loader sees
+    # either the old import or the new one, never a mix. Running workers keep reading the copy they
+    # mapped; versions older than the one being replaced are removed.
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    version = path / f'v{time.time_ns()}'
+    version.mkdir()
+    cells = sorted(profiles)
+    values = np.stack([profiles[cell] for cell in cells]).astype(np.float32) if cells else np.empty((0, 12, 24, 3), np.float32)
+    files = {
+        'cells.npy': lambda f: np.save(f, np.array(cells, dtype=np.float64).reshape(-1, 2)),
+        'irradiance.npy': lambda f: np.save(f, values),
+        'meta.json': lambda f: f.write(json.dumps({'version': DATASET_VERSION, 'grid_step': grid_step}).encode()),
+    }
+    for name, write in files.items():
+        with open(version / name, 'wb') as f:
+            write(f)
+
+    current = path / CURRENT
+    previous = os.readlink(current) if current.is_symlink() else None
+    link = path / f'.{version.name}.link'
+    os.symlink(version.name, link)
+    os.replace(link, current)
+    for old in path.glob('v*'):
+        if old.is_dir() and old.name not in (version.name, previous):
+            shutil.rmtree(old, ignore_errors=True)
+    return version
+
+
+def read_dataset_profiles(path):
+    # The profiles of an existing dataset as a dict, for merging new imports into it
+    dataset = IrradianceDataset(path)
+    return {cell: np.array(dataset.values[i], dtype=float) for cell, i in dataset.index.items()}, dataset.grid_step
+
+
+_dataset = None
+_dataset_lock = threading.Lock()
+
+
+def get_dataset():
+    # The dataset at IRRADIANCE_DATASET_PATH, mapped once per process; None if there is none.
+    # Workers have to be restarted to see a newly imported dataset.
+    global _dataset
+    if _dataset is None:
+        with _dataset_lock:
+            if _dataset is None and (dataset_directory(settings.IRRADIANCE_DATASET_PATH) / 'meta.json').exists():
+                dataset = IrradianceDataset(settings.IRRADIANCE_DATASET_PATH)
+                if dataset.grid_step != settings.IRRADIANCE_GRID_STEP:
+                    raise ValueError(f"Irradiance dataset grid step {dataset.grid_step} does not match IRRADIANCE_GRID_STEP")
+                _dataset = dataset
+    return _dataset
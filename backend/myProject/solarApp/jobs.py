@@ -0,0 +1,199 @@
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from .metrics import format_labels
+from .models import ForecastJob
+
+# A database-backed queue for forecast requests too slow to hold a request worker for. The API
+# queues ForecastJobs, `manage.py run_forecast_jobs` runs them in a pool of worker processes and
+# clients poll for the result, so no broker is needed beyond the database.
+
+PENDING = (ForecastJob.QUEUED, ForecastJob.RUNNING)
+# How often the pool deletes jobs whose results have expired
+PURGE_INTERVAL = 60
+
+
+def worker_name(pid=None):
+    return f'{socket.gethostname()}:{pid or os.getpid()}'
+
+
+def pending_jobs(user):
+    return ForecastJob.objects.filter(user=user, status__in=PENDING).count()
+
+
+def claim_job(worker):
+    # The oldest queued job, marked as running on this worker, or None when the queue is empty.
+    # Rows locked by other workers are skipped where the database supports it; the conditional
+    # update keeps the claim safe where it does not (SQLite).
+    while True:
+        with transaction.atomic():
+            job = (ForecastJob.objects.select_for_update(skip_locked=True)
+                   .filter(status=ForecastJob.QUEUED).order_by('created_at').first())
+            if job is None:
+                return None
+            now = timezone.now()
+            claimed = (ForecastJob.objects.filter(pk=job.pk, status=ForecastJob.QUEUED)
+                       .update(status=ForecastJob.RUNNING, worker=worker, started_at=now))
+        if claimed:
+            job.status, job.worker, job.started_at = ForecastJob.RUNNING, worker, now
+            return job
+
+
+def finish_job(job_id, status, status_code=None, result=None, error='', from_statuses=(ForecastJob.RUNNING,)):
+    # Record the outcome unless the job has already left from_statuses (e.g. it was cancelled or
+    # timed out meanwhile). Returns whether it was recorded.
+    now = timezone.now()
+    return bool(ForecastJob.objects.filter(pk=job_id, status__in=from_statuses).update(
+        status=status, status_code=status_code, result=result, error=error, finished_at=now,
+        expires_at=now + timedelta(seconds=settings.FORECAST_JOB_RESULT_TTL)))
+
+
+def cancel_job(job):
+    # Queued jobs are cancelled at once; running ones are flagged for their pool to stop
+    if not finish_job(job.pk, ForecastJob.CANCELLED, error='Cancelled', from_statuses=(ForecastJob.QUEUED,)):
+        ForecastJob.objects.filter(pk=job.pk, status=ForecastJob.RUNNING).update(cancel_requested=True)
+
+
+def execute(job):
+    # (status code, body) of the synchronous endpoint for the job's request
+    from .views import SolarBatchView, SolarDataView
+    if job.kind == ForecastJob.BATCH:
+        return 200, {"results": [json.loads(line) for line in SolarBatchView().stream_results(job.payload['sites'])]}
+    response = SolarDataView().forecast(job.payload)
+    # Through the API's renderer, which also converts the numpy values
+    return response.status_code, json.loads(JSONRenderer().render(response.data))
+
+
+def run_job(job):
+    try:
+        status_code, result = execute(job)
+    except Exception as e:
+        print(f"Error in forecast job {job.pk}: {str(e)}")
+        status_code, result = 500, {"error": "An unexpected error occurred"}
+    finish_job(job.pk, ForecastJob.SUCCEEDED if status_code < 400 else ForecastJob.FAILED, status_code=status_code, result=result)
+
+
+def work(stop, burst):
+    # Worker process: run jobs until stop is set, or in burst mode until the queue is empty.
+    # SIGTERM is left to kill the process, which is how the pool stops a job.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker = worker_name()
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            job = claim_job(worker)
+        except DatabaseError as e:
+            print(f"Error claiming a forecast job: {str(e)}")
+            stop.wait(settings.FORECAST_JOB_POLL_INTERVAL)
+            continue
+        if job is None:
+            if burst:
+                break
+            stop.wait(settings.FORECAST_JOB_POLL_INTERVAL)
+            continue
+        run_job(job)
+
+
+class WorkerPool:
+    # Runs size worker processes, forked so they share the parent's warmed imports and appliance
+    # profiles. The pool replaces workers that exit, kills those whose job was cancelled or ran past
+    # FORECAST_JOB_TIMEOUT, and deletes jobs whose results have expired.
+    def __init__(self, size, burst=False, log=print):
+        self.size = size
+        self.burst = burst
+        self.log = log
+        self.context = multiprocessing.get_context('fork')
+        self.stop = self.context.Event()
+        self.processes = {}
+        self.next_purge = 0.0
+
+    def run(self):
+        from .profiles import appliance_profiles
+        appliance_profiles.warm()
+        for _ in range(self.size):
+            self.start_worker()
+        while self.processes:
+            try:
+                self.supervise()
+            except DatabaseError as e:
+                print(f"Error supervising forecast job workers: {str(e)}")
+                close_old_connections()
+            time.sleep(settings.FORECAST_JOB_POLL_INTERVAL)
+
+    def shutdown(self):
+        # Workers finish their current job, then exit
+        self.stop.set()
+
+    def start_worker(self):
+        # Forked children must not share the parent's database connection
+        connections.close_all()
+        process = self.context.Process(target=work, args=(self.stop, self.burst), daemon=True)
+        process.start()
+        self.processes[process.pid] = process
+
+    def kill_worker(self, pid, job_id):
+        process = self.processes.pop(pid)
+        process.terminate()
+        process.join()
+        # A job the worker claimed after the one being stopped goes back on the queue
+        (ForecastJob.objects.filter(status=ForecastJob.RUNNING, worker=worker_name(pid)).exclude(pk=job_id)
+         .update(status=ForecastJob.QUEUED, worker='', started_at=None))
+        if not self.stop.is_set():
+            self.start_worker()
+
+    def supervise(self):
+        workers = {worker_name(pid): pid for pid in self.processes}
+        deadline = timezone.now() - timedelta(seconds=settings.FORECAST_JOB_TIMEOUT)
+        # Cancelled jobs on this pool's workers, and overrunning jobs on any worker
+        for job in (ForecastJob.objects.filter(status=ForecastJob.RUNNING)
+                    .filter(Q(cancel_requested=True, worker__in=workers) | Q(started_at__lt=deadline))
+                    .only('id', 'worker', 'started_at', 'cancel_requested')):
+            pid = workers.get(job.worker)
+            if pid in self.processes:
+                self.kill_worker(pid, job.pk)
+            if job.started_at < deadline:
+                if finish_job(job.pk, ForecastJob.FAILED, status_code=504, error=f'Stopped after {settings.FORECAST_JOB_TIMEOUT} seconds'):
+                    self.log(f'Forecast job {job.pk} timed out')
+            elif finish_job(job.pk, ForecastJob.CANCELLED, error='Cancelled'):
+                self.log(f'Forecast job {job.pk} cancelled')
+
+        for pid, process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del self.processes[pid]
+            for job in ForecastJob.objects.filter(status=ForecastJob.RUNNING, worker=worker_name(pid)).only('id'):
+                finish_job(job.pk, ForecastJob.FAILED, status_code=500, error='The worker running the job exited')
+            if process.exitcode != 0:
+                self.log(f'Forecast job worker {pid} exited with status {process.exitcode}')
+            if not self.stop.is_set() and not (self.burst and process.exitcode == 0):
+                self.start_worker()
+
+        if time.monotonic() >= self.next_purge:
+            expired, _ = ForecastJob.objects.filter(expires_at__lt=timezone.now()).delete()
+            if expired:
+                self.log(f'Deleted {expired} expired forecast jobs')
+            self.next_purge = time.monotonic() + PURGE_INTERVAL
+
+
+def render_metrics():
+    # Jobs per status and the age of the oldest queued job, for the metrics registry
+    counts = dict(ForecastJob.objects.values_list('status').annotate(count=Count('id')).order_by())
+    oldest = ForecastJob.objects.filter(status=ForecastJob.QUEUED).aggregate(oldest=Min('created_at'))['oldest']
+    lines = ['# HELP solar_forecast_jobs Forecast jobs by status', '# TYPE solar_forecast_jobs gauge']
+    lines += [f'solar_forecast_jobs{format_labels(("status",), (status,))} {counts.get(status, 0)}'
+              for status, _ in ForecastJob.STATUS_CHOICES]
+    lines += ['# HELP solar_forecast_job_queue_age_seconds Time the oldest queued forecast job has waited',
+              '# TYPE solar_forecast_job_queue_age_seconds gauge',
+              f'solar_forecast_job_queue_age_seconds {(timezone.now() - oldest).total_seconds() if oldest else 0}']
+    return lines
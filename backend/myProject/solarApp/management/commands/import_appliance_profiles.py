@@ -0,0 +1,131 @@
+import csv
+import math
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import slug_re
+from django.db import transaction
+from solarApp.models import Appliance, ApplianceConsumption
+from solarApp.profiles import appliance_profiles
+
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = ('Bulk upsert appliance consumption profiles from CSV files with appliance_name,sequence,consumption columns; '
+            'appliance_name is the catalogue slug and missing appliances are added to the catalogue')
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help="CSV files to import ('-' reads standard input)")
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per INSERT ... ON CONFLICT statement')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the files without writing anything')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        batch_size = max(1, options['batch_size'])
+        self.errors = []
+        self.lengths = {}  # appliance name -> highest sequence seen
+        self.seen = set()
+        self.appliance_ids = {}  # slug -> Appliance id
+        rows = written = 0
+
+        # One transaction for the whole import: any invalid row rolls every batch back
+        with transaction.atomic():
+            batch = []
+            for record in self.read_records(options['files']):
+                rows += 1
+                if options['dry_run'] or self.errors:
+                    continue
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    written += self.upsert(batch)
+                    batch = []
+            if batch and not options['dry_run'] and not self.errors:
+                written += self.upsert(batch)
+
+            self.check_sequences()
+            if self.errors:
+                for error in self.errors[:MAX_REPORTED_ERRORS]:
+                    self.stderr.write(error)
+                more = len(self.errors) - MAX_REPORTED_ERRORS
+                raise CommandError(f'{len(self.errors)} invalid rows, nothing was imported' + (f' ({more} not shown)' if more > 0 else ''))
+
+            trimmed = 0
+            if not options['dry_run']:
+                # Steps past the end of a re-imported profile belong to its previous version
+                for name, length in self.lengths.items():
+                    trimmed += ApplianceConsumption.objects.filter(appliance_id=self.appliance_ids[name], sequence__gt=length).delete()[0]
+                # bulk_create sends no post_save signals, so invalidate explicitly; this drops the
+                # profiles here and, through the shared cache, in every worker
+                transaction.on_commit(appliance_profiles.invalidate)
+
+        elapsed = time.monotonic() - started
+        summary = f'{rows} rows for {len(self.lengths)} appliances in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)'
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Dry run: validated {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Successfully upserted {written} of {summary}, removed {trimmed} stale steps'))
+
+    def read_records(self, paths):
+        # Validated rows as model field dicts, streamed from each file in turn
+        for path in paths:
+            try:
+                f = sys.stdin if path == '-' else open(path, newline='')
+            except OSError as e:
+                raise CommandError(f'Could not open {path}: {e}')
+            with f:
+                reader = csv.DictReader(f)
+                missing = {'appliance_name', 'sequence', 'consumption'} - set(reader.fieldnames or ())
+                if missing:
+                    raise CommandError(f'{path} is missing columns: {", ".join(sorted(missing))}')
+                for row in reader:
+                    record = self.validate(row, f'{path}:{reader.line_num}')
+                    if record is not None:
+                        yield record
+
+    def validate(self, row, where):
+        name = (row['appliance_name'] or '').strip()
+        try:
+            sequence = int(row['sequence'])
+            consumption = float(row['consumption'])
+        except (TypeError, ValueError):
+            self.errors.append(f'{where}: sequence must be an integer and consumption a number')
+            return None
+        if not name or len(name) > Appliance._meta.get_field('slug').max_length or not slug_re.match(name):
+            self.errors.append(f'{where}: appliance_name must be a slug of 1-50 letters, digits, hyphens or underscores')
+        elif sequence < 1:
+            self.errors.append(f'{where}: sequence must be at least 1')
+        elif not math.isfinite(consumption) or consumption < 0:
+            self.errors.append(f'{where}: consumption must be a non-negative number of watts')
+        elif (name, sequence) in self.seen:
+            self.errors.append(f'{where}: duplicate step {sequence} for {name}')
+        else:
+            self.seen.add((name, sequence))
+            self.lengths[name] = max(self.lengths.get(name, 0), sequence)
+            return {'appliance_name': name, 'sequence': sequence, 'consumption': consumption}
+        return None
+
+    def check_sequences(self):
+        # Profiles are consecutive 10-minute steps, so every appliance needs sequences 1..n without gaps
+        counts = {}
+        for name, _ in self.seen:
+            counts[name] = counts.get(name, 0) + 1
+        for name, length in self.lengths.items():
+            if counts[name] != length:
+                self.errors.append(f'{name}: sequences must run from 1 to {length} without gaps ({length - counts[name]} missing)')
+
+    def upsert(self, records):
+        self.add_appliances({record['appliance_name'] for record in records} - set(self.appliance_ids))
+        batch = [ApplianceConsumption(appliance_id=self.appliance_ids[record['appliance_name']], sequence=record['sequence'],
+                                      consumption=record['consumption']) for record in records]
+        ApplianceConsumption.objects.bulk_create(batch, update_conflicts=True, unique_fields=['appliance', 'sequence'],
+                                                 update_fields=['consumption'])
+        return len(batch)
+
+    def add_appliances(self, slugs):
+        # Catalogue entries for slugs first seen in this import; existing entries keep their names
+        if not slugs:
+            return
+        Appliance.objects.bulk_create([Appliance(slug=slug, name=slug.replace('_', ' ').capitalize()) for slug in slugs],
+                                      ignore_conflicts=True)
+        self.appliance_ids.update(Appliance.objects.filter(slug__in=slugs).values_list('slug', 'id'))
@@ -0,0 +1,110 @@
+import csv
+import json
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from solarApp.irradiance import location_cell
+from solarApp.irradiance_dataset import COMPONENTS, read_dataset_profiles, write_dataset
+from solarApp.models import IrradianceProfile
+
+# DRcalc field names for ghi/dni/dhi, as the live fetch reads them. Its dni is Gb(i), the beam
+# irradiance on the horizontal plane (slope 0) rather than direct normal.
+DRCALC_FIELDS = ('G(i)', 'Gb(i)', 'Gd(i)')
+
+
+class Command(BaseCommand):
+    help = 'Build the memory-mapped irradiance dataset from PVGIS DRcalc/TMY JSON exports, CSV files or the profile store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='PVGIS DRcalc or TMY JSON exports, or CSV files with '
+                                                     'lat,lon,month,hour,ghi,dni,dhi columns')
+        parser.add_argument('--from-store', action='store_true', help='Also import every profile in the IrradianceProfile table')
+        parser.add_argument('--output', default=settings.IRRADIANCE_DATASET_PATH, help='Dataset directory')
+        parser.add_argument('--merge', action='store_true', help='Keep the cells already in the output dataset')
+
+    def handle(self, *args, **options):
+        if not options['files'] and not options['from_store']:
+            raise CommandError('Nothing to import, pass files and/or --from-store')
+        started = time.monotonic()
+
+        # (lat cell, lon cell) -> (12, 24, 3) sums and sample counts, averaged at the end
+        self.sums = {}
+        self.counts = {}
+        for path in options['files']:
+            try:
+                if path.lower().endswith('.csv'):
+                    self.import_csv(path)
+                else:
+                    self.import_json(path)
+            except (OSError, ValueError, KeyError, CommandError) as e:
+                raise CommandError(f'Could not import {path}: {e}')
+        if options['from_store']:
+            for profile in IrradianceProfile.objects.iterator():
+                for hour, values in enumerate(zip(profile.ghi, profile.dni, profile.dhi)):
+                    self.add(profile.lat, profile.lon, profile.month, hour, values)
+
+        profiles = {}
+        if options['merge']:
+            try:
+                profiles, grid_step = read_dataset_profiles(options['output'])
+            except FileNotFoundError:
+                grid_step = settings.IRRADIANCE_GRID_STEP
+            if grid_step != settings.IRRADIANCE_GRID_STEP:
+                raise CommandError(f'Existing dataset uses grid step {grid_step}, not IRRADIANCE_GRID_STEP')
+        for cell, sums in self.sums.items():
+            counts = self.counts[cell]
+            averaged = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+            if cell in profiles:
+                averaged = np.where(np.isnan(averaged), profiles[cell], averaged)
+            profiles[cell] = averaged
+
+        write_dataset(options['output'], profiles, settings.IRRADIANCE_GRID_STEP)
+        # Months with any hour missing are not served, see IrradianceDataset.get
+        months = sum(int((~np.isnan(profile).any(axis=(1, 2))).sum()) for profile in profiles.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully wrote {len(profiles)} cells ({months} cell-months) to {options["output"]} in {time.monotonic() - started:.1f}s'))
+
+    def add(self, lat, lon, month, hour, values):
+        if not 1 <= month <= 12:
+            raise CommandError(f'Month {month} is not between 1 and 12')
+        if not 0 <= hour <= 23:
+            raise CommandError(f'Hour {hour} is not between 0 and 23')
+        cell = location_cell(lat, lon)
+        if cell not in self.sums:
+            self.sums[cell] = np.zeros((12, 24, len(COMPONENTS)))
+            self.counts[cell] = np.zeros((12, 24, 1))
+        self.sums[cell][month - 1, hour] += values
+        self.counts[cell][month - 1, hour] += 1
+
+    def import_csv(self, path):
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                self.add(float(row['lat']), float(row['lon']), int(row['month']), int(row['hour']),
+                         [float(row[component]) for component in COMPONENTS])
+
+    def import_json(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        location = data['inputs']['location']
+        lat, lon = location['latitude'], location['longitude']
+        outputs = data['outputs']
+        if 'tmy_hourly' in outputs:
+            # Hourly typical-year records ("time(UTC)": "20070101:0010") averaged per month and hour
+            for record in outputs['tmy_hourly']:
+                stamp = record['time(UTC)']
+                self.add(lat, lon, int(stamp[4:6]), int(stamp[9:11]), self.tmy_values(record))
+        else:
+            # DRcalc daily profiles; exports for all months carry the month on every record
+            default_month = data['inputs'].get('month')
+            for record in outputs['daily_profile']:
+                month = record.get('month', default_month)
+                if not month:
+                    raise ValueError('daily profile without a month')
+                self.add(lat, lon, int(month), int(record['time'][:2]), [record[name] for name in DRCALC_FIELDS])
+
+    def tmy_values(self, record):
+        # TMY gives direct normal irradiance (Gb(n)); the beam on the horizontal, which DRcalc's
+        # Gb(i) is, is what remains of the global horizontal once the diffuse part is taken out
+        ghi, dhi = float(record['G(h)']), float(record['Gd(h)'])
+        return [ghi, max(ghi - dhi, 0.0), dhi]
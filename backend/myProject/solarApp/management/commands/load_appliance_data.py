@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from solarApp.models import ApplianceConsumption
+from solarApp.models import Appliance, ApplianceConsumption
 
 
 class Command(BaseCommand):
@@ -35,8 +35,16 @@ class Command(BaseCommand):
             {"appliance_name": "tumble_dryer", "sequence": 13, "consumption": 0.02},
         ]
 
+        appliances = {
+            "washing_machine": Appliance.objects.get_or_create(slug="washing_machine", defaults={"name": "Washing machine"})[0],
+            "tumble_dryer": Appliance.objects.get_or_create(slug="tumble_dryer", defaults={"name": "Tumble dryer"})[0],
+        }
+        # The dryer only runs on what the washing machine has finished
+        appliances["tumble_dryer"].run_after.add(appliances["washing_machine"])
+
         for record in predefined_data:
-            obj, created = ApplianceConsumption.objects.get_or_create(**record)
+            obj, created = ApplianceConsumption.objects.get_or_create(appliance=appliances[record["appliance_name"]], sequence=record["sequence"],
+                                                                      defaults={"consumption": record["consumption"]})
             if created:
                 self.stdout.write(self.style.SUCCESS(f'Added new record for {record["appliance_name"]} at sequence {record["sequence"]}'))
             else:
@@ -0,0 +1,78 @@
+import time
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from solarApp.forecast_grid import compute_regional_forecasts, forecast_presets, store_regional_forecasts
+from solarApp.geocoding import get_lat_lon_from_post_code
+from solarApp.irradiance import cells_in_bbox, fetch_solar_profiles, location_cell
+from solarApp.models import RegionalForecast
+
+
+class Command(BaseCommand):
+    help = 'Precompute forecast and clear-sky output for standard panel presets over a grid of location cells'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post-codes', nargs='+', default=[], help='Postcodes whose cells to compute')
+        parser.add_argument('--bbox', nargs=4, type=float, metavar=('MIN_LAT', 'MIN_LON', 'MAX_LAT', 'MAX_LON'),
+                            help='Compute every grid cell inside this bounding box (default: FORECAST_GRID_BBOX)')
+        parser.add_argument('--start', help='First day to compute, YYYY-MM-DD (default: today, UTC)')
+        parser.add_argument('--days', type=int, default=settings.FORECAST_GRID_DAYS, help='Number of days to compute')
+        parser.add_argument('--batch-size', type=int, default=100, help='Cells fetched and written per batch')
+        parser.add_argument('--interval', type=int, help='Keep running and refresh every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        cells = set()
+        for post_code in options['post_codes']:
+            lat, lon = get_lat_lon_from_post_code(post_code)
+            if lat is None or lon is None:
+                self.stdout.write(self.style.WARNING(f'Could not geocode {post_code}, skipping'))
+                continue
+            cells.add(location_cell(lat, lon))
+        if options['post_codes'] and not cells:
+            raise CommandError('None of the postcodes could be geocoded')
+
+        # The default grid only applies when no postcodes were given
+        bbox = options['bbox'] or (None if options['post_codes'] else settings.FORECAST_GRID_BBOX)
+        if bbox:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            if min_lat > max_lat or min_lon > max_lon:
+                raise CommandError('Bounding box minimums must not exceed maximums')
+            cells.update(cells_in_bbox(min_lat, min_lon, max_lat, max_lon))
+
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+
+        while True:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else timezone.now().date()
+            self.refresh(sorted(cells), [start + timedelta(days=offset) for offset in range(options['days'])],
+                         max(1, options['batch_size']))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def refresh(self, cells, days, batch_size):
+        presets = forecast_presets()
+        months = sorted({day.month for day in days})
+        self.stdout.write(f'Computing {len(presets)} presets for {len(cells)} cells over {len(days)} days')
+
+        started = time.monotonic()
+        computed = failed = 0
+        for first in range(0, len(cells), batch_size):
+            batch = cells[first:first + batch_size]
+            # Irradiance profiles for the batch are fetched concurrently; modelling and writes stay on this thread
+            profiles = fetch_solar_profiles({(lat, lon, month) for lat, lon in batch for month in months})
+            rows = []
+            for lat, lon in batch:
+                if any(isinstance(profiles[(lat, lon, month)], Exception) for month in months):
+                    failed += 1
+                    continue
+                for day in days:
+                    rows += compute_regional_forecasts(lat, lon, day, profiles[(lat, lon, day.month)], presets)
+                computed += 1
+            store_regional_forecasts(rows)
+
+        # Days before the window will not be asked for again
+        deleted, _ = RegionalForecast.objects.filter(date__lt=days[0]).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully computed {computed} cells ({failed} failed, {deleted} old rows removed) in {time.monotonic() - started:.1f}s'))
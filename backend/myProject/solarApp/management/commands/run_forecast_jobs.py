@@ -0,0 +1,23 @@
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from solarApp.jobs import WorkerPool
+
+
+class Command(BaseCommand):
+    help = 'Run queued forecast jobs in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.FORECAST_JOB_WORKERS, help='Number of worker processes')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty instead of waiting for new jobs')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        pool = WorkerPool(options['workers'], burst=options['burst'], log=self.stdout.write)
+        # On SIGINT or SIGTERM the workers finish the job in hand, then exit
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: pool.shutdown())
+        self.stdout.write(f"Running forecast jobs in {options['workers']} worker processes")
+        pool.run()
+        self.stdout.write(self.style.SUCCESS('Forecast job workers stopped'))
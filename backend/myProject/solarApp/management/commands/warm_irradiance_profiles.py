@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from solarApp.geocoding import get_lat_lon_from_post_code
+from solarApp.irradiance import cells_in_bbox, fetch_pvgis_daily_profile, location_cell, lookup_irradiance_profile, store_irradiance_profile
+
+
+class Command(BaseCommand):
+    help = 'Pre-warm the PVGIS irradiance profile store for a list of postcodes or a bounding box'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post-codes', nargs='+', default=[], help='Postcodes to warm')
+        parser.add_argument('--bbox', nargs=4, type=float, metavar=('MIN_LAT', 'MIN_LON', 'MAX_LAT', 'MAX_LON'),
+                            help='Warm every grid cell inside this bounding box')
+        parser.add_argument('--months', nargs='+', type=int, default=list(range(1, 13)), help='Months to warm (default: all)')
+        parser.add_argument('--refresh', action='store_true', help='Re-fetch profiles that are already stored')
+        parser.add_argument('--workers', type=int, default=4, help='Number of concurrent PVGIS requests')
+
+    def handle(self, *args, **options):
+        cells = set()
+        for post_code in options['post_codes']:
+            lat, lon = get_lat_lon_from_post_code(post_code)
+            if lat is None or lon is None:
+                self.stdout.write(self.style.WARNING(f'Could not geocode {post_code}, skipping'))
+                continue
+            cells.add(location_cell(lat, lon))
+
+        if options['bbox']:
+            min_lat, min_lon, max_lat, max_lon = options['bbox']
+            if min_lat > max_lat or min_lon > max_lon:
+                raise CommandError('Bounding box minimums must not exceed maximums')
+            cells.update(cells_in_bbox(min_lat, min_lon, max_lat, max_lon))
+
+        if not cells:
+            raise CommandError('Nothing to warm, pass --post-codes and/or --bbox')
+
+        months = sorted(set(options['months']))
+        if any(month < 1 or month > 12 for month in months):
+            raise CommandError('Months must be between 1 and 12')
+
+        jobs = [(lat, lon, month) for lat, lon in sorted(cells) for month in months]
+        if not options['refresh']:
+            jobs = [job for job in jobs if lookup_irradiance_profile(*job) is None]
+        self.stdout.write(f'Warming {len(jobs)} profiles for {len(cells)} cells')
+
+        # Only the PVGIS requests run concurrently, the database writes stay on this thread
+        warmed = failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            for (lat, lon, month), result in zip(jobs, executor.map(self.fetch, jobs)):
+                if isinstance(result, Exception):
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'Failed to warm ({lat}, {lon}) month {month}: {result}'))
+                    continue
+                store_irradiance_profile(lat, lon, month, *result)
+                warmed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully warmed {warmed} irradiance profiles ({failed} failed)'))
+
+    def fetch(self, job):
+        try:
+            return fetch_pvgis_daily_profile(*job)
+        except Exception as e:
+            return e
@@ -0,0 +1,212 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+
+# In-process metrics for the solar pipeline, rendered in the Prometheus text format at /metrics.
+# Each worker process keeps its own values, so scrape every worker (or run a single one per host).
+# Stage timers also feed a per-request trace that is returned as a Server-Timing header on request.
+
+# Histogram buckets in seconds, from a cache hit to an upstream timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        lines += [f'{self.name}{format_labels(self.labels, key)} {value}' for key, value in sorted(values.items())]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [count per bucket (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{format_labels(self.labels + ("le",), key + (bound,))} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, key)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        self.caches = {}
+        self.collectors = {}
+
+    def counter(self, name, documentation, labels=()):
+        metric = Counter(name, documentation, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def register_cache(self, name, stats):
+        # stats is a callable returning (hits, misses, entries), read at scrape time
+        self.caches[name] = stats
+
+    def register_collector(self, name, collect):
+        # collect returns lines in the text format, read at scrape time
+        self.collectors[name] = collect
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        if self.caches:
+            lines += ['# HELP solar_cache_requests_total Cache lookups by cache and result',
+                      '# TYPE solar_cache_requests_total counter']
+            stats = {name: collect() for name, collect in self.caches.items()}
+            for name, (hits, misses, _) in sorted(stats.items()):
+                lines.append(f'solar_cache_requests_total{format_labels(("cache", "result"), (name, "hit"))} {hits}')
+                lines.append(f'solar_cache_requests_total{format_labels(("cache", "result"), (name, "miss"))} {misses}')
+            lines += ['# HELP solar_cache_hit_ratio Share of cache lookups that were hits since the worker started',
+                      '# TYPE solar_cache_hit_ratio gauge']
+            lines += [f'solar_cache_hit_ratio{format_labels(("cache",), (name,))} {hits / (hits + misses) if hits + misses else 0.0}'
+                      for name, (hits, misses, _) in sorted(stats.items())]
+            lines += ['# HELP solar_cache_entries Entries held by each in-process cache', '# TYPE solar_cache_entries gauge']
+            lines += [f'solar_cache_entries{format_labels(("cache",), (name,))} {entries}' for name, (_, _, entries) in sorted(stats.items())]
+        for collect in self.collectors.values():
+            lines += collect()
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+request_seconds = registry.histogram('solar_http_request_duration_seconds', 'Time to serve each request by route, method and status',
+                                     ('route', 'method', 'status'))
+stage_seconds = registry.histogram('solar_stage_duration_seconds', 'Time spent in each stage of the solar pipeline', ('stage',))
+upstream_seconds = registry.histogram('solar_upstream_request_duration_seconds',
+                                      'External API requests (every attempt, including retries) by host and outcome', ('host', 'outcome'))
+db_query_seconds = registry.histogram('solar_db_query_duration_seconds', 'Database queries by route', ('route',))
+errors_total = registry.counter('solar_errors_total', 'Unexpected errors caught by the views, by view', ('view',))
+
+
+class Trace:
+    # Timings collected while serving one request; appended to from the HTTP client's loop thread too
+    def __init__(self):
+        self.timings = []  # (name, seconds, description)
+
+    def add(self, name, seconds, description=None):
+        self.timings.append((name, seconds, description))
+
+    def server_timing(self, total):
+        # Header value with repeated names summed, e.g. 'geocode;dur=1.2, upstream;desc="host";dur=80.1'
+        summed = {}
+        for name, seconds, description in list(self.timings):
+            count, duration = summed.get((name, description), (0, 0.0))
+            summed[(name, description)] = (count + 1, duration + seconds)
+        entries = []
+        for (name, description), (count, duration) in summed.items():
+            if count > 1:
+                description = f'{description} x{count}' if description else f'x{count}'
+            entries.append(name + (f';desc="{description}"' if description else '') + f';dur={duration * 1000:.1f}')
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+current_trace = contextvars.ContextVar('solar_trace', default=None)
+
+
+@contextmanager
+def stage(name):
+    # Time a block as one stage of the pipeline
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=name)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(name, elapsed)
+
+
+def record_upstream(host, outcome, elapsed):
+    upstream_seconds.observe(elapsed, host=host, outcome=outcome)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add('upstream', elapsed, host)
+
+
+class MetricsMiddleware:
+    # Times every request and its database queries. Clients get a Server-Timing header by sending
+    # 'X-Server-Timing: 1' when SERVER_TIMING is on, or when they are staff.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace = Trace()
+        token = current_trace.set(trace)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self.time_query(trace)):
+                response = self.get_response(request)
+        finally:
+            current_trace.reset(token)
+        elapsed = time.perf_counter() - started
+
+        route = request.resolver_match.route if request.resolver_match else 'unmatched'
+        request_seconds.observe(elapsed, route=route, method=request.method, status=response.status_code)
+        for name, seconds, _ in trace.timings:
+            if name == 'db':
+                db_query_seconds.observe(seconds, route=route)
+        if request.headers.get('X-Server-Timing') == '1' and (settings.SERVER_TIMING or getattr(request.user, 'is_staff', False)):
+            response['Server-Timing'] = trace.server_timing(elapsed)
+        return response
+
+    def time_query(self, trace):
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                trace.add('db', time.perf_counter() - started)
+        return wrapper
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.2 on 2026-10-18 17:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solarApp', '0002_geocodedpostcode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IrradianceProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lat', models.FloatField()),
+                ('lon', models.FloatField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('ghi', models.JSONField()),
+                ('dni', models.JSONField()),
+                ('dhi', models.JSONField()),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('lat', 'lon', 'month')},
+            },
+        ),
+    ]
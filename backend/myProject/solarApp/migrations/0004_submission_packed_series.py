@@ -0,0 +1,59 @@
+from django.db import migrations, models
+from solarApp import timeseries
+
+BATCH_SIZE = 500
+
+
+def pack_series(apps, schema_editor):
+    Submission = apps.get_model('solarApp', 'Submission')
+    batch = []
+    for submission in Submission.objects.only('hourly_solar_production', 'appliance_consumption').iterator(chunk_size=BATCH_SIZE):
+        submission.hourly_solar_production_data = timeseries.encode_production(submission.hourly_solar_production)
+        submission.appliance_consumption_data = timeseries.encode_consumption(submission.appliance_consumption)
+        batch.append(submission)
+        if len(batch) >= BATCH_SIZE:
+            Submission.objects.bulk_update(batch, ['hourly_solar_production_data', 'appliance_consumption_data'])
+            batch = []
+    Submission.objects.bulk_update(batch, ['hourly_solar_production_data', 'appliance_consumption_data'])
+
+
+def unpack_series(apps, schema_editor):
+    Submission = apps.get_model('solarApp', 'Submission')
+    batch = []
+    for submission in Submission.objects.only('hourly_solar_production_data', 'appliance_consumption_data').iterator(chunk_size=BATCH_SIZE):
+        submission.hourly_solar_production = timeseries.decode(submission.hourly_solar_production_data)
+        submission.appliance_consumption = timeseries.decode(submission.appliance_consumption_data)
+        batch.append(submission)
+        if len(batch) >= BATCH_SIZE:
+            Submission.objects.bulk_update(batch, ['hourly_solar_production', 'appliance_consumption'])
+            batch = []
+    Submission.objects.bulk_update(batch, ['hourly_solar_production', 'appliance_consumption'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solarApp', '0003_irradianceprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='hourly_solar_production_data',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='appliance_consumption_data',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(pack_series, unpack_series),
+        migrations.RemoveField(
+            model_name='submission',
+            name='hourly_solar_production',
+        ),
+        migrations.RemoveField(
+            model_name='submission',
+            name='appliance_consumption',
+        ),
+    ]
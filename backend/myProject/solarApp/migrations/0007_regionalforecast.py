@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-18 17:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solarApp', '0006_submission_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionalForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lat', models.FloatField()),
+                ('lon', models.FloatField()),
+                ('date', models.DateField()),
+                ('panel_tilt', models.FloatField()),
+                ('panel_orientation', models.FloatField()),
+                ('forecast', models.BinaryField()),
+                ('clear_sky', models.BinaryField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('lat', 'lon', 'date', 'panel_tilt', 'panel_orientation')},
+            },
+        ),
+    ]
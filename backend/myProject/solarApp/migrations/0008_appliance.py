@@ -0,0 +1,69 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The ordering rule that used to be hard-coded in views.py
+RUN_AFTER = {'tumble_dryer': ('washing_machine',)}
+
+
+def create_appliances(apps, schema_editor):
+    Appliance = apps.get_model('solarApp', 'Appliance')
+    ApplianceConsumption = apps.get_model('solarApp', 'ApplianceConsumption')
+    names = ApplianceConsumption.objects.order_by().values_list('appliance_name', flat=True).distinct()
+    appliances = {name: Appliance.objects.create(slug=name, name=name.replace('_', ' ').capitalize()) for name in names}
+    for name, appliance in appliances.items():
+        ApplianceConsumption.objects.filter(appliance_name=name).update(appliance=appliance)
+        appliance.run_after.set([appliances[first] for first in RUN_AFTER.get(name, ()) if first in appliances])
+
+
+def restore_appliance_names(apps, schema_editor):
+    Appliance = apps.get_model('solarApp', 'Appliance')
+    ApplianceConsumption = apps.get_model('solarApp', 'ApplianceConsumption')
+    for appliance in Appliance.objects.all():
+        ApplianceConsumption.objects.filter(appliance=appliance).update(appliance_name=appliance.slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solarApp', '0007_regionalforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Appliance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('run_after', models.ManyToManyField(blank=True, related_name='followed_by', to='solarApp.appliance')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='applianceconsumption',
+            name='appliance',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='steps', to='solarApp.appliance'),
+        ),
+        migrations.AlterField(
+            model_name='applianceconsumption',
+            name='appliance_name',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AlterUniqueTogether(
+            name='applianceconsumption',
+            unique_together=set(),
+        ),
+        migrations.RunPython(create_appliances, restore_appliance_names),
+        migrations.AlterUniqueTogether(
+            name='applianceconsumption',
+            unique_together={('appliance', 'sequence')},
+        ),
+        migrations.RemoveField(
+            model_name='applianceconsumption',
+            name='appliance_name',
+        ),
+        migrations.AlterField(
+            model_name='applianceconsumption',
+            name='appliance',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='steps', to='solarApp.appliance'),
+        ),
+    ]
@@ -0,0 +1,128 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from django.conf import settings
+from pvlib import inverter, irradiance, pvsystem, temperature
+from pvlib.location import Location
+from pvlib.modelchain import ModelChain
+from pvlib.pvsystem import PVSystem
+from pvlib.temperature import TEMPERATURE_MODEL_PARAMETERS
+from .cache import TTLCache
+from .irradiance import location_cell
+from .metrics import stage
+
+MODULE_PARAMETERS = {'pdc0': 250, 'gamma_pdc': -0.004}
+INVERTER_PARAMETERS = {'pdc0': 250, 'eta_inv_nom': 0.96}
+TEMPERATURE_PARAMETERS = TEMPERATURE_MODEL_PARAMETERS['sapm']['open_rack_glass_glass']
+
+# Solar position per (location cell, times index), shared by every panel configuration
+solar_position_cache = TTLCache(maxsize=settings.SOLAR_POSITION_CACHE_SIZE, ttl=settings.SOLAR_POSITION_CACHE_TTL)
+
+
+def times_key(times):
+    return (times[0].isoformat(), len(times), times.freqstr)
+
+
+def get_location(lat, lon):
+    return Location(*location_cell(lat, lon), tz='UTC')
+
+
+@stage('solar_position')
+def get_solar_position(lat, lon, times):
+    key = (location_cell(lat, lon), times_key(times))
+    solar_position = solar_position_cache.get(key)
+    if solar_position is None:
+        solar_position = get_location(lat, lon).get_solarposition(times)
+        solar_position_cache.set(key, solar_position)
+    return solar_position
+
+
+class SharedSolarPositionModelChain(ModelChain):
+    # ModelChain that takes a precomputed solar position for the weather's index instead of
+    # recomputing it on every run. _prep_inputs_solar_pos is private to pvlib, hence the version
+    # range pinned in requirements.txt; tests/test_modelling.py checks the override still applies.
+    solar_position = None
+
+    def _prep_inputs_solar_pos(self, weather):
+        if self.solar_position is not None and self.solar_position.index.equals(self.results.times):
+            self.results.solar_position = self.solar_position
+            return self
+        return super()._prep_inputs_solar_pos(weather)
+
+
+@stage('model')
+def simulate_configurations(weather, solar_position, panel_tilts, panel_orientations):
+    # AC power per panel for many (tilt, azimuth) configurations in one vectorized pass over
+    # a shared weather frame. Follows the same steps as the pooled ModelChain (Hay-Davies
+    # transposition, no AOI or spectral losses, SAPM cell temperature, PVWatts DC and AC)
+    # and returns an array of shape (len(weather), number of configurations).
+    surface_tilt = np.asarray(panel_tilts, dtype=float)[np.newaxis, :]
+    surface_azimuth = np.asarray(panel_orientations, dtype=float)[np.newaxis, :]
+
+    def column(values):
+        return np.asarray(values, dtype=float)[:, np.newaxis]
+
+    total_irrad = irradiance.get_total_irradiance(
+        surface_tilt, surface_azimuth,
+        column(solar_position['apparent_zenith']), column(solar_position['azimuth']),
+        column(weather['dni']), column(weather['ghi']), column(weather['dhi']),
+        dni_extra=column(irradiance.get_extra_radiation(weather.index)),
+        model='haydavies')
+    poa_global = np.asarray(total_irrad['poa_global'], dtype=float)
+    temp_air = column(weather['temp_air']) if 'temp_air' in weather else 20.0
+    wind_speed = column(weather['wind_speed']) if 'wind_speed' in weather else 0.0
+    temp_cell = temperature.sapm_cell(poa_global, temp_air, wind_speed, **TEMPERATURE_PARAMETERS)
+    dc = pvsystem.pvwatts_dc(poa_global, temp_cell, MODULE_PARAMETERS['pdc0'], MODULE_PARAMETERS['gamma_pdc'])
+    ac = inverter.pvwatts(dc, INVERTER_PARAMETERS['pdc0'], INVERTER_PARAMETERS['eta_inv_nom'])
+    return np.nan_to_num(np.asarray(ac, dtype=float))
+
+
+def build_model_chain(panel_tilt, panel_orientation, lat, lon):
+    system = PVSystem(surface_tilt=panel_tilt, surface_azimuth=panel_orientation,
+                      module_parameters=MODULE_PARAMETERS,
+                      inverter_parameters=INVERTER_PARAMETERS,
+                      temperature_model_parameters=TEMPERATURE_PARAMETERS)
+    return SharedSolarPositionModelChain(system, get_location(lat, lon), aoi_model='no_loss', spectral_model='no_loss',)
+
+
+class ModelChainPool:
+    # Bounded LRU pool of prebuilt model chains keyed by (tilt, azimuth, location cell).
+    # A ModelChain keeps its results on itself, so each one is only run by one thread at a time.
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._chains = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, panel_tilt, panel_orientation, lat, lon):
+        key = (float(panel_tilt), float(panel_orientation), location_cell(lat, lon))
+        with self._lock:
+            entry = self._chains.get(key)
+            if entry is not None:
+                self._chains.move_to_end(key)
+                return entry
+        entry = (build_model_chain(panel_tilt, panel_orientation, lat, lon), threading.Lock())
+        with self._lock:
+            entry = self._chains.setdefault(key, entry)
+            self._chains.move_to_end(key)
+            while len(self._chains) > self.maxsize:
+                self._chains.popitem(last=False)
+        return entry
+
+    @stage('model')
+    def run(self, panel_tilt, panel_orientation, lat, lon, weather, solar_position=None):
+        # AC power per panel for the weather frame
+        mc, lock = self.get(panel_tilt, panel_orientation, lat, lon)
+        with lock:
+            mc.solar_position = solar_position
+            mc.run_model(weather)
+            return mc.results.ac.copy()
+
+    def clear(self):
+        with self._lock:
+            self._chains.clear()
+
+    def __len__(self):
+        return len(self._chains)
+
+
+model_chain_pool = ModelChainPool(maxsize=settings.MODEL_CHAIN_POOL_SIZE)
@@ -1,8 +1,12 @@
+import uuid
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
+from . import timeseries
 
 
 class Submission(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='submissions')
     post_code = models.CharField(max_length=10)
     number_of_solar_panels = models.IntegerField(null=True)
     date = models.DateTimeField(default=timezone.now)
@@ -23,17 +27,150 @@ class Submission(models.Model):
     optimal_power = models.FloatField(max_length=50, null=True)
     wm_optimal_usage = models.JSONField(null=True, blank=True)
     td_optimal_usage = models.JSONField(null=True, blank=True)
-    hourly_solar_production = models.JSONField(null=True, blank=True)
-    appliance_consumption = models.JSONField(null=True, blank=True)
+    # Packed with solarApp.timeseries; read and write them through the properties below
+    hourly_solar_production_data = models.BinaryField(null=True, blank=True)
+    appliance_consumption_data = models.BinaryField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def hourly_solar_production(self):
+        # Decoded on access, so queries that never read the series never pay for it
+        return timeseries.decode(self.hourly_solar_production_data)
+
+    @hourly_solar_production.setter
+    def hourly_solar_production(self, value):
+        self.hourly_solar_production_data = timeseries.encode_production(value)
+
+    @property
+    def appliance_consumption(self):
+        return timeseries.decode(self.appliance_consumption_data)
+
+    @appliance_consumption.setter
+    def appliance_consumption(self, value):
+        self.appliance_consumption_data = timeseries.encode_consumption(value)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='submission_user_date_idx'),
+            models.Index(fields=['post_code', 'date'], name='submission_post_code_date_idx'),
+        ]
+
+
+class Appliance(models.Model):
+    # Catalogue entry; its consumption profile is the ApplianceConsumption rows pointing at it
+    slug = models.SlugField(max_length=50, unique=True)
+    name = models.CharField(max_length=100)
+    # Appliances this one may only start after, e.g. a tumble dryer after the washing machine
+    run_after = models.ManyToManyField('self', symmetrical=False, blank=True, related_name='followed_by')
+
+    def __str__(self):
+        return self.name
 
 
 class ApplianceConsumption(models.Model):
-    appliance_name = models.CharField(max_length=50)
+    appliance = models.ForeignKey(Appliance, on_delete=models.CASCADE, related_name='steps')
     sequence = models.IntegerField()
     consumption = models.FloatField()
 
     class Meta:
-        unique_together = ('appliance_name', 'sequence',)
+        unique_together = ('appliance', 'sequence',)
+
+    def __str__(self):
+        return f"{self.appliance.slug} consumption sequence {self.sequence}"
+
+
+class GeocodedPostCode(models.Model):
+    # Persistent geocoding cache; lat/lon are null for postcodes the geocoding API rejected
+    post_code = models.CharField(max_length=20, unique=True)
+    lat = models.FloatField(null=True)
+    lon = models.FloatField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def found(self):
+        return self.lat is not None and self.lon is not None
+
+    def __str__(self):
+        return f"{self.post_code} ({self.lat}, {self.lon})"
+
+
+class IrradianceProfile(models.Model):
+    # PVGIS DRcalc daily profile for one grid cell and month, as 24 hourly values per component
+    lat = models.FloatField()
+    lon = models.FloatField()
+    month = models.PositiveSmallIntegerField()
+    ghi = models.JSONField()
+    dni = models.JSONField()
+    dhi = models.JSONField()
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('lat', 'lon', 'month',)
+
+    def __str__(self):
+        return f"Irradiance profile ({self.lat}, {self.lon}) month {self.month}"
+
+
+class RegionalForecast(models.Model):
+    # Precomputed AC output per panel for one irradiance grid cell, day and standard panel preset,
+    # written by the refresh_forecast_grid command. Series are hourly from 00:00 UTC, packed with
+    # timeseries.encode_values.
+    lat = models.FloatField()
+    lon = models.FloatField()
+    date = models.DateField()
+    panel_tilt = models.FloatField()
+    panel_orientation = models.FloatField()
+    forecast = models.BinaryField()  # from the PVGIS daily profile, as SolarDataView models it
+    clear_sky = models.BinaryField()  # under a simplified Solis clear sky
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('lat', 'lon', 'date', 'panel_tilt', 'panel_orientation',)
+
+    def __str__(self):
+        return f"Forecast ({self.lat}, {self.lon}) {self.date} tilt {self.panel_tilt} azimuth {self.panel_orientation}"
+
+
+class ForecastJob(models.Model):
+    # A solardata or batch request queued for the run_forecast_jobs workers. The result is the body
+    # the synchronous endpoint would have returned, with its status code, kept until expires_at.
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed'), (CANCELLED, 'Cancelled')]
+    FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+    SOLARDATA = 'solardata'
+    BATCH = 'batch'
+    KIND_CHOICES = [(SOLARDATA, 'Solar data'), (BATCH, 'Solar batch')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='forecast_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    cancel_requested = models.BooleanField(default=False)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)  # host:pid of the process running it
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest queued job; housekeeping looks for expired and stuck ones
+            models.Index(fields=['status', 'created_at'], name='forecastjob_status_created_idx'),
+            models.Index(fields=['expires_at'], name='forecastjob_expires_idx'),
+        ]
+
+    @property
+    def finished(self):
+        return self.status in self.FINISHED
 
     def __str__(self):
-        return f"{self.appliance_name} consumption sequence {self.sequence}"
+        return f"{self.kind} job {self.id} ({self.status})"
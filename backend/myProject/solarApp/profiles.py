@@ -0,0 +1,117 @@
+import threading
+import time
+from dataclasses import dataclass
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from .models import Appliance, ApplianceConsumption
+
+# Shared cache key bumped whenever the catalogue changes, so every process knows to reload
+VERSION_KEY = 'appliance_profiles:version'
+# How often a process asks the shared cache whether another one changed the catalogue
+VERSION_CHECK_INTERVAL = 1.0
+
+
+@dataclass(frozen=True)
+class ApplianceProfile:
+    id: int
+    name: str  # the appliance slug
+    sequence: np.ndarray  # int sequence numbers, ascending
+    consumption: np.ndarray  # W for each 10-minute step
+    run_after: tuple = ()  # slugs of the appliances this one has to start after
+
+    def rows(self):
+        # Shape used by the API responses and stored submissions
+        return [{"appliance_name": self.name, "sequence": int(sequence), "consumption": float(consumption)}
+                for sequence, consumption in zip(self.sequence, self.consumption)]
+
+
+class ApplianceProfileRegistry:
+    # In-process copy of the appliance catalogue with its consumption steps as NumPy arrays, keyed by slug.
+    # It is loaded once per worker and dropped whenever the table changes (see SolarappConfig.ready).
+    # Changes made by other processes reach it through VERSION_KEY in the shared cache, or after
+    # APPLIANCE_PROFILE_TTL seconds when the cache is per-process.
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._profiles = None
+        self._by_id = {}
+        self._loaded_at = 0.0
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        # Read the version first, so a change committed while loading is picked up by the next check
+        version = self.shared_version()
+        appliances = Appliance.objects.prefetch_related('run_after')
+        rows = ApplianceConsumption.objects.order_by('appliance_id', 'sequence').values_list('appliance_id', 'sequence', 'consumption')
+        grouped = {}
+        for appliance_id, sequence, consumption in rows:
+            grouped.setdefault(appliance_id, []).append((sequence, consumption))
+        # Appliances without any steps have nothing to schedule and are left out
+        profiles = {appliance.slug: ApplianceProfile(id=appliance.id, name=appliance.slug,
+                                                     sequence=np.array([sequence for sequence, _ in grouped[appliance.id]], dtype=int),
+                                                     consumption=np.array([consumption for _, consumption in grouped[appliance.id]], dtype=float),
+                                                     run_after=tuple(sorted(first.slug for first in appliance.run_after.all())))
+                    for appliance in appliances if appliance.id in grouped}
+        by_id = {profile.id: profile for profile in profiles.values()}
+        with self._lock:
+            self._profiles = profiles
+            self._by_id = by_id
+            self._loaded_at = self._checked_at = time.monotonic()
+            self._version = version
+        return profiles
+
+    @property
+    def profiles(self):
+        profiles = self._profiles
+        if profiles is not None and time.monotonic() - self._checked_at > VERSION_CHECK_INTERVAL:
+            self._checked_at = time.monotonic()
+            if self.shared_version() != self._version:
+                profiles = None
+        if profiles is None or (self.ttl is not None and time.monotonic() - self._loaded_at > self.ttl):
+            profiles = self.load()
+        return profiles
+
+    @property
+    def by_id(self):
+        self.profiles
+        return self._by_id
+
+    def warm(self):
+        # Load ahead of the first request; if the database is not reachable yet, the first request loads instead
+        try:
+            self.load()
+        except DatabaseError as e:
+            print(f"Could not preload appliance profiles: {str(e)}")
+
+    def get(self, name):
+        return self.profiles.get(name)
+
+    def select(self, ids):
+        # Profiles for a list of appliance ids in the given order; raises KeyError for unknown ids
+        by_id = self.by_id
+        return [by_id[appliance_id] for appliance_id in ids]
+
+    def invalidate(self, *args, **kwargs):
+        # Also used directly as a signal receiver. The other processes are told once the change commits.
+        with self._lock:
+            self._profiles = None
+        transaction.on_commit(self.bump_version)
+
+    def shared_version(self):
+        try:
+            return cache.get(VERSION_KEY)
+        except Exception as e:
+            print(f"Could not read the appliance profile version: {str(e)}")
+            return self._version
+
+    def bump_version(self):
+        try:
+            cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+        except Exception as e:
+            print(f"Could not publish the appliance profile version: {str(e)}")
+
+
+appliance_profiles = ApplianceProfileRegistry(ttl=settings.APPLIANCE_PROFILE_TTL)
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+from collections import deque
+import numpy as np
+from .metrics import format_labels
+
+# Pluggable data providers. Concrete providers live next to the parsing code they wrap
+# (irradiance.py, weather.py); this module has the base class, the fallback chain and the stats.
+
+
+class ProviderError(Exception):
+    # An upstream answered but could not serve the request; status is the HTTP status to report
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class ProviderStats:
+    # Per-provider request outcomes and a window of recent latencies, shared by every chain in the process
+    def __init__(self, window=1024):
+        self.window = window
+        self._counts = {}
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, outcome, latency=None):
+        # outcome is one of 'hit', 'miss', 'error', 'hedge' or 'hedge_win'
+        with self._lock:
+            counts = self._counts.setdefault(name, dict.fromkeys(('hit', 'miss', 'error', 'hedge', 'hedge_win'), 0))
+            counts[outcome] += 1
+            if latency is not None:
+                self._latencies.setdefault(name, deque(maxlen=self.window)).append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            counts = {name: dict(values) for name, values in self._counts.items()}
+            latencies = {name: list(values) for name, values in self._latencies.items()}
+        stats = {}
+        for name, values in counts.items():
+            requests = values['hit'] + values['miss'] + values['error']
+            stats[name] = {
+                'requests': requests,
+                'hits': values['hit'],
+                'misses': values['miss'],
+                'errors': values['error'],
+                'error_rate': values['error'] / requests if requests else 0.0,
+                'hedges': values['hedge'],
+                'hedge_wins': values['hedge_win'],
+            }
+            if latencies.get(name):
+                p50, p95, p99 = np.percentile(latencies[name], [50, 95, 99]) * 1000
+                stats[name].update(latency_p50_ms=float(p50), latency_p95_ms=float(p95), latency_p99_ms=float(p99))
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self._latencies.clear()
+
+    def render_metrics(self):
+        # Outcome counts in the text format, for the metrics registry
+        with self._lock:
+            counts = {name: dict(values) for name, values in self._counts.items()}
+        lines = ['# HELP solar_provider_requests_total Data provider lookups by provider and outcome',
+                 '# TYPE solar_provider_requests_total counter']
+        for name, values in sorted(counts.items()):
+            lines += [f'solar_provider_requests_total{format_labels(("provider", "outcome"), (name, outcome))} {count}'
+                      for outcome, count in values.items()]
+        return lines
+
+
+provider_stats = ProviderStats()
+
+
+class Provider:
+    # Local providers answer from this process or its database without waiting on the network and
+    # implement get(); remote providers implement the coroutine afetch(). Both return None when they
+    # have no data for the key and raise when they fail.
+    name = None
+    local = False
+
+    def get(self, *key):
+        raise NotImplementedError
+
+    async def afetch(self, *key):
+        raise NotImplementedError
+
+    def save(self, *key, value):
+        # Local providers that keep what remote providers returned override this
+        pass
+
+
+class ProviderChain:
+    # Providers in a configured fallback order. Local providers are consulted first, synchronously in
+    # the calling thread (they may use the ORM); remote providers run on the HTTP client's event loop.
+    # A remote provider that has not answered after hedge_after seconds is raced against the next one
+    # (or against a second request to itself if it is the last), and the first useful answer wins.
+    def __init__(self, kind, providers, hedge_after=None):
+        self.kind = kind
+        self.local = [provider for provider in providers if provider.local]
+        self.remote = [provider for provider in providers if not provider.local]
+        self.hedge_after = hedge_after
+
+    def get_local(self, *key):
+        for provider in self.local:
+            started = time.monotonic()
+            try:
+                value = provider.get(*key)
+            except Exception as e:
+                provider_stats.record(provider.name, 'error', time.monotonic() - started)
+                print(f"{self.kind} provider {provider.name} failed: {str(e)}")
+                continue
+            provider_stats.record(provider.name, 'miss' if value is None else 'hit', time.monotonic() - started)
+            if value is not None:
+                return value
+        return None
+
+    def save(self, *key, value):
+        for provider in self.local:
+            provider.save(*key, value=value)
+
+    async def afetch(self, *key):
+        remaining = list(self.remote)
+        error = None
+        while remaining:
+            primary = remaining.pop(0)
+            tasks = {asyncio.ensure_future(self.atimed(primary, key)): primary}
+            hedge = None
+            while tasks:
+                timeout = self.hedge_after if hedge is None and self.hedge_after else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    secondary = remaining.pop(0) if remaining else primary
+                    provider_stats.record(primary.name, 'hedge')
+                    hedge = asyncio.ensure_future(self.atimed(secondary, key))
+                    tasks[hedge] = secondary
+                    continue
+                for task in done:
+                    provider = tasks.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif task.result() is not None:
+                        for other in tasks:
+                            other.cancel()
+                        if task is hedge:
+                            provider_stats.record(provider.name, 'hedge_win')
+                        return task.result()
+        if error is not None:
+            raise error
+        raise LookupError(f"No {self.kind} provider has data for {key}")
+
+    async def atimed(self, provider, key):
+        started = time.monotonic()
+        try:
+            value = await provider.afetch(*key)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            provider_stats.record(provider.name, 'error', time.monotonic() - started)
+            raise
+        provider_stats.record(provider.name, 'miss' if value is None else 'hit', time.monotonic() - started)
+        return value
+
+
+def build_chain(kind, available, names, hedge_after=None):
+    # available maps provider names to classes; names is the configured fallback order
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown {kind} providers {unknown}, expected some of {sorted(available)}")
+    return ProviderChain(kind, [available[name]() for name in names], hedge_after=hedge_after)
@@ -0,0 +1,305 @@
+import time
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+# ApplianceConsumption profiles are recorded in 10-minute steps
+PROFILE_STEP_MINUTES = 10
+
+
+def series_step_minutes(index):
+    # Time resolution of a production series, in whole minutes
+    if len(index) < 2:
+        return 60
+    return max(1, int(round((index[1] - index[0]) / pd.Timedelta(minutes=1))))
+
+
+def profile_to_grid(consumption, step_minutes, profile_step_minutes=PROFILE_STEP_MINUTES):
+    # Resample a consumption profile onto a grid of step_minutes: spread every profile
+    # step over the minutes it covers, then average those minutes into grid steps
+    per_minute = np.repeat(np.asarray(consumption, dtype=float), profile_step_minutes)
+    n_steps = -(-len(per_minute) // step_minutes)
+    per_minute = np.pad(per_minute, (0, n_steps * step_minutes - len(per_minute)))
+    return per_minute.reshape(n_steps, step_minutes).mean(axis=1)
+
+
+def window_scores(production, load):
+    # Score every feasible start in one pass: the production during the run, weighted by
+    # how much of the appliance's consumption falls in each step. scores[i] is the score
+    # of starting at production[i]; starts that would run past the end are not scored.
+    production = np.asarray(production, dtype=float)
+    load = np.asarray(load, dtype=float)
+    if len(load) == 0 or len(load) > len(production):
+        return np.empty(0)
+    total = load.sum()
+    weights = load / total if total > 0 else np.full(len(load), 1.0 / len(load))
+    return np.correlate(production, weights, mode='valid')
+
+
+def find_optimal_start(production, consumption, profile_step_minutes=PROFILE_STEP_MINUTES):
+    # production is a pandas Series indexed by time at any fixed resolution
+    load = profile_to_grid(consumption, series_step_minutes(production.index), profile_step_minutes)
+    scores = window_scores(production.to_numpy(), load)
+    if len(scores) == 0:
+        return None
+    return production.index[int(np.argmax(scores))]
+
+
+def load_scores(production, load):
+    # Like window_scores but weighted by the appliance's draw itself rather than its share of it,
+    # so when several appliances compete for the sunniest window a larger load counts for more.
+    # Still linear in production, so a schedule chosen for one panel holds for any number of them.
+    production = np.asarray(production, dtype=float)
+    load = np.asarray(load, dtype=float)
+    if len(load) == 0 or len(load) > len(production):
+        return np.empty(0)
+    return np.correlate(production, load, mode='valid')
+
+
+@dataclass
+class ScheduleResult:
+    starts: dict  # appliance name -> start index on the production grid, None if it could not be placed
+    objective: float  # sum of the load scores of the placed appliances
+    optimal: bool  # False if the time budget ran out before the search space was exhausted
+    nodes: int
+
+
+def order_appliances(names, run_after, max_scores):
+    # Topological order so an appliance is always placed after the ones it must follow,
+    # otherwise strongest appliances first so good incumbents are found early
+    ordered, placed = [], set()
+    remaining = sorted(names, key=lambda name: -max_scores[name])
+    while remaining:
+        for name in remaining:
+            if all(first in placed or first not in names for first in run_after.get(name, ())):
+                break
+        else:
+            raise ValueError('Appliance ordering constraints contain a cycle')
+        ordered.append(name)
+        placed.add(name)
+        remaining.remove(name)
+    return ordered
+
+
+def solve_schedule(production, loads, run_after=None, allow_overlap=False, power_cap=None, time_budget=None):
+    # Jointly place several appliances over precomputed load scores.
+    #   loads: appliance name -> load profile on the production grid (see profile_to_grid)
+    #   run_after: appliance name -> names it may only start once they have finished
+    #     (e.g. the dryer after the washer); it is not scheduled if they cannot be
+    #   allow_overlap: let appliances run at the same time, subject to power_cap (W)
+    # Schedules that place more appliances always win, the summed load score breaks ties.
+    # When time_budget (s) runs out the best schedule found so far is returned with optimal=False.
+    production = np.asarray(production, dtype=float)
+    run_after = {name: tuple(first for first in firsts if first in loads) for name, firsts in (run_after or {}).items()}
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+
+    scores = {name: load_scores(production, load) for name, load in loads.items()}
+    max_scores = {name: float(score.max()) if len(score) else 0.0 for name, score in scores.items()}
+    names = order_appliances(list(loads), run_after, max_scores)
+    # Every placed appliance earns a bonus larger than any achievable score
+    bonus = sum(max_scores.values()) + 1.0
+
+    problem = (production, names, loads, scores, run_after, power_cap, bonus)
+    if not allow_overlap and 2 ** len(names) <= DP_MAX_SUBSETS and (len(production) + 1) * 2 ** len(names) <= DP_MAX_CELLS:
+        result = solve_non_overlapping(*problem, deadline)
+        if result is not None:
+            return result
+        # Out of time: settle for the first (greedy) schedule the branch-and-bound finds
+        deadline = time.monotonic()
+    return solve_branch_and_bound(*problem, allow_overlap, deadline)
+
+
+# Above this many appliance subsets the exact dynamic programme gets too large
+DP_MAX_SUBSETS = 4096
+# ...or above this many (time step, subset) cells, at 10 bytes each for its tables (about 20 MB)
+DP_MAX_CELLS = 2_000_000
+
+
+def solve_non_overlapping(production, names, loads, scores, run_after, power_cap, bonus, deadline):
+    # Exact dynamic programme over time and the subset of appliances already finished:
+    # value[t, S] is the best objective with exactly the appliances in S run inside [0, t).
+    # Returns None if the deadline passes first.
+    n_steps = len(production)
+    subsets = np.arange(2 ** len(names))
+    value = np.full((n_steps + 1, len(subsets)), -np.inf)
+    value[0, 0] = 0.0
+    # Appliance finishing at t for this subset, or -1 if the value carries over from t - 1
+    choice = np.full((n_steps + 1, len(subsets)), -1, dtype=np.int16)
+
+    transitions = []
+    for i, name in enumerate(names):
+        bit = 1 << i
+        required = sum(1 << names.index(first) for first in run_after.get(name, ()))
+        with_i = subsets[(subsets & bit) != 0]
+        without_i = with_i ^ bit
+        allowed = (without_i & required) == required
+        if power_cap is not None and len(loads[name]) and loads[name].max() > power_cap:
+            allowed[:] = False
+        transitions.append((with_i[allowed], without_i[allowed], len(loads[name])))
+
+    for t in range(1, n_steps + 1):
+        if deadline is not None and time.monotonic() > deadline:
+            return None
+        value[t] = value[t - 1]
+        for i, (with_i, without_i, length) in enumerate(transitions):
+            start = t - length
+            if start < 0 or len(with_i) == 0:
+                continue
+            candidate = value[start, without_i] + scores[names[i]][start] + bonus
+            better = candidate > value[t, with_i]
+            value[t, with_i[better]] = candidate[better]
+            choice[t, with_i[better]] = i
+
+    subset = int(np.argmax(value[n_steps]))
+    objective = float(value[n_steps, subset])
+    starts = {name: None for name in names}
+    t = n_steps
+    while subset:
+        i = choice[t, subset]
+        if i < 0:
+            t -= 1
+            continue
+        t -= len(loads[names[i]])
+        starts[names[i]] = t
+        subset ^= 1 << i
+        objective -= bonus
+    return ScheduleResult(starts=starts, objective=max(objective, 0.0), optimal=True, nodes=n_steps * len(subsets))
+
+
+def solve_branch_and_bound(production, names, loads, scores, run_after, power_cap, bonus, allow_overlap, deadline):
+    # Depth-first search over start times, best-scoring first, then over leaving the appliance
+    # out (which can make room for several others under power_cap). A node is pruned when its
+    # objective plus the best start each remaining appliance could still take cannot beat
+    # the incumbent. The first descent always reaches a leaf, so a schedule is returned
+    # even when the deadline has already passed.
+    order = {name: np.argsort(-scores[name], kind='stable') for name in names}
+    usage = np.zeros(len(production))
+    busy = np.zeros(len(production), dtype=int)
+    starts = {}
+    best = {'objective': -1.0, 'starts': {name: None for name in names}}
+    state = {'nodes': 0, 'timed_out': False}
+
+    def feasible_starts(name):
+        # Boolean mask over every start of this appliance given the appliances placed so far
+        length = len(loads[name])
+        n_starts = len(scores[name])
+        mask = np.ones(n_starts, dtype=bool)
+        for first in run_after.get(name, ()):
+            if first not in starts:
+                # Not placed yet, so this only matters once it is (names are in topological order)
+                continue
+            if starts[first] is None:
+                mask[:] = False
+            else:
+                mask[:starts[first] + len(loads[first])] = False
+        if not allow_overlap:
+            busy_before = np.concatenate([[0], np.cumsum(busy)])
+            mask &= busy_before[length:length + n_starts] == busy_before[:n_starts]
+        if power_cap is not None and n_starts:
+            windows = np.lib.stride_tricks.sliding_window_view(usage, length)[:n_starts]
+            mask &= (windows + loads[name]).max(axis=1) <= power_cap
+        return mask
+
+    def bound(name, mask):
+        # Best value this appliance could still add, ignoring the appliances placed after it
+        return float(scores[name][mask].max()) + bonus if mask.any() else 0.0
+
+    def search(depth, objective):
+        state['nodes'] += 1
+        if deadline is not None and best['objective'] >= 0 and time.monotonic() > deadline:
+            state['timed_out'] = True
+        if state['timed_out']:
+            return
+        if depth == len(names):
+            if objective > best['objective']:
+                best['objective'] = objective
+                best['starts'] = dict(starts)
+            return
+
+        name = names[depth]
+        masks = [feasible_starts(other) for other in names[depth:]]
+        rest = sum(bound(other, mask) for other, mask in zip(names[depth + 1:], masks[1:]))
+        if objective + bound(name, masks[0]) + rest <= best['objective']:
+            return
+
+        mask = masks[0]
+        length = len(loads[name])
+        for start in order[name][mask[order[name]]]:
+            value = objective + scores[name][start] + bonus
+            if value + rest <= best['objective']:
+                # Candidates are sorted, so nothing after this one can do better either
+                break
+            start = int(start)
+            starts[name] = start
+            usage[start:start + length] += loads[name]
+            busy[start:start + length] += 1
+            search(depth + 1, value)
+            usage[start:start + length] -= loads[name]
+            busy[start:start + length] -= 1
+            del starts[name]
+            if state['timed_out']:
+                return
+        if objective + rest > best['objective']:
+            starts[name] = None
+            search(depth + 1, objective)
+            del starts[name]
+
+    search(0, 0.0)
+    placed = sum(start is not None for start in best['starts'].values())
+    return ScheduleResult(starts=best['starts'], objective=max(float(best['objective']) - placed * bonus, 0.0),
+                          optimal=not state['timed_out'], nodes=state['nodes'])
+
+
+@dataclass
+class EnergyBalance:
+    self_consumption: float  # Wh of appliance load covered by production
+    grid_import: float  # Wh of appliance load drawn from the grid
+    grid_export: float  # Wh of production left over
+
+
+def scheduled_load(n_steps, loads, starts):
+    # Total appliance load on a production grid of n_steps, built with one scatter-add per appliance.
+    #   loads: appliance name -> load profile on the grid (see profile_to_grid)
+    #   starts: appliance name -> start index, or None if it is not placed. Starts may also be
+    #     arrays of K candidate starts (negative for "not placed"), giving a (K, n_steps) array
+    #     so many schedules can be evaluated in one call. Load past the end of the grid is dropped.
+    placed = {name: np.asarray(start) for name, start in starts.items() if start is not None}
+    batch = np.broadcast_shapes(*(start.shape for start in placed.values()))
+    total = np.zeros((int(np.prod(batch)), n_steps))
+    rows = np.arange(total.shape[0])[:, None]
+    for name, start in placed.items():
+        load = np.asarray(loads[name], dtype=float)
+        start = np.broadcast_to(start, batch).reshape(-1, 1)
+        positions = start + np.arange(len(load))
+        valid = (start >= 0) & (positions < n_steps)
+        np.add.at(total, (np.broadcast_to(rows, positions.shape)[valid], positions[valid]),
+                  np.broadcast_to(load, positions.shape)[valid])
+    return total.reshape(batch + (n_steps,))
+
+
+def energy_balance(production, load, step_minutes):
+    # Energy totals of a schedule's load against production; load may be (K, n_steps) for K schedules
+    production = np.asarray(production, dtype=float)
+    load = np.asarray(load, dtype=float)
+    hours = step_minutes / 60
+    self_consumption = np.minimum(production, load).sum(axis=-1) * hours
+    grid_import = np.clip(load - production, 0, None).sum(axis=-1) * hours
+    grid_export = np.clip(production - load, 0, None).sum(axis=-1) * hours
+    if load.ndim == 1:
+        return EnergyBalance(float(self_consumption), float(grid_import), float(grid_export))
+    return EnergyBalance(self_consumption, grid_import, grid_export)
+
+
+def grid_position(index, when):
+    # Position of the grid step containing `when`, or None if it falls outside the grid.
+    # "HH:MM" strings are taken on the first day of the index.
+    if isinstance(when, str) and len(when) <= 5:
+        hour, minute = when.split(':')
+        when = index[0].normalize() + pd.Timedelta(hours=int(hour), minutes=int(minute))
+    when = pd.Timestamp(when)
+    if when.tzinfo is None and index.tz is not None:
+        when = when.tz_localize(index.tz)
+    position = int(index.searchsorted(when, side='right')) - 1
+    if position < 0 or when >= index[-1] + pd.Timedelta(minutes=series_step_minutes(index)):
+        return None
+    return position
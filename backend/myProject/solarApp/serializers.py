@@ -1,16 +1,56 @@
 from rest_framework import serializers
-from .models import Submission, ApplianceConsumption
+from .models import Submission, Appliance, ApplianceConsumption, ForecastJob
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 
 
 class SubmissionSerializer(serializers.ModelSerializer):
+    # Model properties over the packed binary columns
+    hourly_solar_production = serializers.JSONField(required=False, allow_null=True)
+    appliance_consumption = serializers.JSONField(required=False, allow_null=True)
+
     class Meta:
         model = Submission
-        fields = '__all__'
+        exclude = ['hourly_solar_production_data', 'appliance_consumption_data']
+        read_only_fields = ['user']
+
+
+class SubmissionHistorySerializer(serializers.ModelSerializer):
+    # Summary columns only; the time series stay in the database until a chart is opened
+    class Meta:
+        model = Submission
+        fields = ['id', 'date', 'post_code', 'number_of_solar_panels', 'panel_orientation', 'panel_tilt',
+                  'washing_machine_selected', 'tumble_dryer_selected', 'daily_solar_output', 'optimal_time', 'optimal_power']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ApplianceSerializer(serializers.ModelSerializer):
+    run_after = serializers.SlugRelatedField(many=True, read_only=True, slug_field='slug')
+    # Annotated by ApplianceListView
+    steps = serializers.IntegerField(source='step_count', read_only=True)
+    energy = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Appliance
+        fields = ['id', 'slug', 'name', 'run_after', 'steps', 'energy']
+
+
+class ForecastJobSerializer(serializers.ModelSerializer):
+    # result is the body the synchronous endpoint would have returned, with status_code
+    class Meta:
+        model = ForecastJob
+        fields = ['id', 'kind', 'status', 'cancel_requested', 'created_at', 'started_at', 'finished_at', 'expires_at',
+                  'status_code', 'result', 'error']
 
 
 class ApplianceConsumptionSerializer(serializers.ModelSerializer):
+    appliance = serializers.SlugRelatedField(queryset=Appliance.objects.all(), slug_field='slug')
+
     class Meta:
         model = ApplianceConsumption
         fields = '__all__'
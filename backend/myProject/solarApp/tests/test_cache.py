@@ -0,0 +1,78 @@
+import asyncio
+from django.test import SimpleTestCase
+from solarApp.cache import AsyncRefreshingCache
+
+
+class CountingLoader:
+    # Zero-argument coroutine function returning the values (or raising the exceptions) in turn
+    # after latency seconds, counting its calls
+    def __init__(self, *values, latency=0.05):
+        self.values = list(values)
+        self.latency = latency
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        value = self.values.pop(0)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def is_ok(value):
+    return 'error' not in value
+
+
+class AsyncRefreshingCacheTests(SimpleTestCase):
+    def test_concurrent_misses_share_one_load(self):
+        async def run():
+            cache = AsyncRefreshingCache(ttl=60)
+            load = CountingLoader({'temp': 12})
+            values = await asyncio.gather(*(cache.get('DD1', load) for _ in range(10)))
+            return values, load.calls, await cache.get('DD1', load)
+
+        values, calls, cached = asyncio.run(run())
+        self.assertEqual(values, [{'temp': 12}] * 10)
+        self.assertEqual(calls, 1)
+        self.assertEqual(cached, {'temp': 12})
+
+    def test_stale_hit_returns_at_once_and_refreshes_once(self):
+        async def run():
+            cache = AsyncRefreshingCache(ttl=0.01, stale_ttl=60)
+            load = CountingLoader({'temp': 12}, {'temp': 14}, latency=0.2)
+            await cache.get('DD1', load)
+            await asyncio.sleep(0.02)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            stale = [await cache.get('DD1', load) for _ in range(5)]
+            elapsed = loop.time() - started
+            # Let the refresh start, then count the loads while it is still running
+            await asyncio.sleep(0.01)
+            calls_while_refreshing = load.calls
+            await asyncio.sleep(0.3)
+            return stale, elapsed, calls_while_refreshing, await cache.get('DD1', load)
+
+        stale, elapsed, calls, refreshed = asyncio.run(run())
+        self.assertEqual(stale, [{'temp': 12}] * 5)
+        self.assertLess(elapsed, 0.1)
+        # The first load plus a single background refresh for all five stale hits
+        self.assertEqual(calls, 2)
+        self.assertEqual(refreshed, {'temp': 14})
+
+    def test_errors_are_not_stored(self):
+        async def run():
+            cache = AsyncRefreshingCache(ttl=60)
+            load = CountingLoader({'error': 'upstream failed'}, RuntimeError('timeout'), {'temp': 12})
+            results = [await cache.get('DD1', load, cacheable=is_ok)]
+            try:
+                await cache.get('DD1', load, cacheable=is_ok)
+            except RuntimeError as e:
+                results.append(str(e))
+            results.append(await cache.get('DD1', load, cacheable=is_ok))
+            results.append(await cache.get('DD1', load, cacheable=is_ok))
+            return results, load.calls
+
+        results, calls = asyncio.run(run())
+        self.assertEqual(results, [{'error': 'upstream failed'}, 'timeout', {'temp': 12}, {'temp': 12}])
+        self.assertEqual(calls, 3)
@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from solarApp.models import Submission
+
+
+class SubmissionChartDataViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='secret')
+        self.submission = Submission.objects.create(user=self.owner, post_code='DD1 4HN')
+        self.url = f'/api/submission_chart_data/{self.submission.pk}/'
+
+    def api_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_only_the_owner_can_read_the_chart(self):
+        other = self.api_client(User.objects.create_user(username='other', password='secret'))
+        # Before and after the owner's request has cached the rendered response
+        self.assertEqual(other.get(self.url).status_code, 404)
+        response = self.api_client(self.owner).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(other.get(self.url).status_code, 404)
+        self.assertEqual(other.get(self.url, HTTP_IF_NONE_MATCH=response.headers['ETag']).status_code, 404)
+        self.assertEqual(self.api_client(self.owner).get(self.url, HTTP_IF_NONE_MATCH=response.headers['ETag']).status_code, 304)
+
+    def test_missing_submission_is_not_found(self):
+        self.assertEqual(self.api_client(self.owner).get(f'/api/submission_chart_data/{self.submission.pk + 1}/').status_code, 404)
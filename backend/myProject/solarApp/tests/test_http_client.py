@@ -0,0 +1,139 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+from django.test import SimpleTestCase
+from solarApp.http_client import AsyncHTTPClient
+from solarApp.metrics import Trace, current_trace, format_labels, upstream_seconds
+
+# Scripted replies: a status code, or DROP to close the connection without answering
+DROP = 'drop'
+
+
+class ScriptedServer:
+    # Local HTTP server answering each request with the next reply in replies (200 once they run
+    # out), after latency seconds. Counts the requests and the most it served at once.
+    def __init__(self, replies=(), latency=0.0):
+        self.replies = list(replies)
+        self.latency = latency
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def host(self):
+        return f'127.0.0.1:{self._server.server_port}'
+
+    @property
+    def url(self):
+        return f'http://{self.host}/'
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                    reply = server.replies.pop(0) if server.replies else 200
+                try:
+                    time.sleep(server.latency)
+                    if reply == DROP:
+                        self.close_connection = True
+                        return
+                    self.send_response(reply)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                finally:
+                    with server._lock:
+                        server.active -= 1
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def upstream_count(host, outcome):
+    # Attempts recorded in the upstream histogram for host and outcome
+    prefix = f'{upstream_seconds.name}_count{format_labels(upstream_seconds.labels, (host, outcome))} '
+    return next((int(line[len(prefix):]) for line in upstream_seconds.render() if line.startswith(prefix)), 0)
+
+
+class AsyncHTTPClientTests(SimpleTestCase):
+    def start_server(self, *args, **kwargs):
+        server = ScriptedServer(*args, **kwargs).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def http_client(self, **kwargs):
+        options = dict(timeout=5, connect_timeout=1, max_connections=20, max_keepalive=20, max_per_host=10, retries=2, backoff=0.01)
+        options.update(kwargs)
+        return AsyncHTTPClient(**options)
+
+    def test_retries_rate_limits_and_server_errors(self):
+        server = self.start_server([429, 503])
+        response = self.http_client().get_sync(server.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(server.requests, 3)
+
+    def test_returns_the_last_error_once_retries_run_out(self):
+        server = self.start_server([500, 502, 504, 200])
+        response = self.http_client(retries=2).get_sync(server.url)
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(server.requests, 3)
+
+    def test_does_not_retry_client_errors(self):
+        server = self.start_server([404])
+        response = self.http_client().get_sync(server.url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(server.requests, 1)
+
+    def test_retries_transport_errors(self):
+        server = self.start_server([DROP])
+        response = self.http_client().get_sync(server.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(server.requests, 2)
+
+    def test_raises_transport_errors_once_retries_run_out(self):
+        server = self.start_server([DROP, DROP])
+        with self.assertRaises(httpx.TransportError):
+            self.http_client(retries=1).get_sync(server.url)
+        self.assertEqual(server.requests, 2)
+
+    def test_limits_concurrent_requests_per_host(self):
+        server = self.start_server(latency=0.1)
+        client = self.http_client(max_per_host=2)
+        responses = client.gather({index: client.get(server.url) for index in range(8)})
+        self.assertEqual([response.status_code for response in responses.values()], [200] * 8)
+        self.assertEqual(server.requests, 8)
+        self.assertEqual(server.max_active, 2)
+
+    def test_records_every_attempt(self):
+        server = self.start_server([503, DROP, 404])
+        trace = Trace()
+        token = current_trace.set(trace)
+        try:
+            response = self.http_client(retries=3).get_sync(server.url)
+        finally:
+            current_trace.reset(token)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(upstream_count(server.host, 503), 1)
+        self.assertEqual(upstream_count(server.host, 'RemoteProtocolError'), 1)
+        self.assertEqual(upstream_count(server.host, 404), 1)
+        self.assertEqual(upstream_count(server.host, 200), 0)
+        # The request's trace gets one upstream timing per attempt, from the client's loop thread
+        self.assertEqual([(name, description) for name, _, description in trace.timings], [('upstream', server.host)] * 3)
@@ -0,0 +1,125 @@
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from solarApp.jobs import cancel_job, claim_job, finish_job, run_job
+from solarApp.models import ForecastJob
+
+
+class ForecastJobQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='jobs', password='secret')
+
+    def queue(self, age=0, **kwargs):
+        kwargs.setdefault('kind', ForecastJob.SOLARDATA)
+        kwargs.setdefault('payload', {})
+        return ForecastJob.objects.create(user=self.user, created_at=timezone.now() - timedelta(seconds=age), **kwargs)
+
+    def test_claims_the_oldest_queued_job(self):
+        newer = self.queue(age=1)
+        older = self.queue(age=10)
+        self.queue(age=20, status=ForecastJob.RUNNING)
+
+        job = claim_job('host:1')
+        self.assertEqual(job.pk, older.pk)
+        self.assertEqual((job.status, job.worker), (ForecastJob.RUNNING, 'host:1'))
+        older.refresh_from_db()
+        self.assertEqual((older.status, older.worker), (ForecastJob.RUNNING, 'host:1'))
+        self.assertIsNotNone(older.started_at)
+
+        self.assertEqual(claim_job('host:2').pk, newer.pk)
+        self.assertIsNone(claim_job('host:3'))
+
+    def test_finish_records_the_outcome_once(self):
+        job = self.queue()
+        claim_job('host:1')
+        self.assertTrue(finish_job(job.pk, ForecastJob.SUCCEEDED, status_code=200, result={"ok": True}))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.status_code, job.result), (ForecastJob.SUCCEEDED, 200, {"ok": True}))
+        self.assertGreater(job.expires_at, job.finished_at)
+
+        # A finished job is not overwritten, e.g. by a worker finishing after a timeout
+        self.assertFalse(finish_job(job.pk, ForecastJob.FAILED, status_code=500))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ForecastJob.SUCCEEDED)
+
+    def test_finish_ignores_jobs_that_are_not_running(self):
+        job = self.queue()
+        self.assertFalse(finish_job(job.pk, ForecastJob.SUCCEEDED, status_code=200))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ForecastJob.QUEUED)
+
+    def test_cancel_queued_job(self):
+        job = self.queue()
+        cancel_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (ForecastJob.CANCELLED, 'Cancelled'))
+        self.assertIsNone(claim_job('host:1'))
+
+    def test_cancel_running_job_flags_it_for_the_pool(self):
+        job = self.queue()
+        claim_job('host:1')
+        cancel_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ForecastJob.RUNNING)
+        self.assertTrue(job.cancel_requested)
+        # The worker's own result no longer counts once the pool has cancelled it
+        self.assertTrue(finish_job(job.pk, ForecastJob.CANCELLED, error='Cancelled'))
+        self.assertFalse(finish_job(job.pk, ForecastJob.SUCCEEDED, status_code=200))
+
+    def test_run_job_stores_the_endpoint_response(self):
+        job = self.queue(kind=ForecastJob.BATCH, payload={"sites": [{"post_code": "DD1 4HN", "configurations": []}]})
+        run_job(claim_job('host:1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.status_code), (ForecastJob.SUCCEEDED, 200))
+        self.assertEqual(job.result["results"][0]["site"], 0)
+        self.assertIn("Invalid site", job.result["results"][0]["error"])
+
+        job = self.queue(payload={"number_of_solar_panels": 1, "panel_tilt": 30, "panel_orientation": 180, "horizon_days": 999})
+        run_job(claim_job('host:1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.status_code), (ForecastJob.FAILED, 400))
+        self.assertIn("horizon_days", job.result["error"])
+
+    def test_run_job_rejects_zero_horizon_and_resolution(self):
+        for field in ('horizon_days', 'resolution_minutes'):
+            job = self.queue(payload={"number_of_solar_panels": 1, "panel_tilt": 30, "panel_orientation": 180, field: 0})
+            run_job(claim_job('host:1'))
+            job.refresh_from_db()
+            with self.subTest(field=field):
+                self.assertEqual((job.status, job.status_code), (ForecastJob.FAILED, 400))
+                self.assertIn(field, job.result["error"])
+
+
+class ForecastJobViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='jobs', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_poll_answers_at_once_with_retry_after_until_finished(self):
+        response = self.client.post('/api/solardata/jobs/', {"post_code": "DD1 4HN"}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertIn('Retry-After', response.headers)
+        location = response.headers['Location']
+
+        response = self.client.get(location)
+        self.assertEqual((response.status_code, response.json()['status']), (200, ForecastJob.QUEUED))
+        self.assertIn('Retry-After', response.headers)
+
+        job = claim_job('host:1')
+        finish_job(job.pk, ForecastJob.SUCCEEDED, status_code=200, result={"ok": True})
+        response = self.client.get(location)
+        self.assertEqual(response.json()['status'], ForecastJob.SUCCEEDED)
+        self.assertNotIn('Retry-After', response.headers)
+
+    def test_delete_cancels_and_other_users_cannot_see_the_job(self):
+        location = self.client.post('/api/solardata/jobs/', {"post_code": "DD1 4HN"}, format='json').headers['Location']
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='secret'))
+        self.assertEqual(other.get(location).status_code, 404)
+        self.assertEqual(other.delete(location).status_code, 404)
+
+        response = self.client.delete(location)
+        self.assertEqual((response.status_code, response.json()['status']), (200, ForecastJob.CANCELLED))
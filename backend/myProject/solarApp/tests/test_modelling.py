@@ -0,0 +1,28 @@
+from unittest import mock
+import pandas as pd
+from django.test import SimpleTestCase
+from pvlib.location import Location
+from solarApp.modelling import ModelChainPool, get_location, get_solar_position
+
+LAT, LON = 56.46, -2.97
+
+
+class SharedSolarPositionModelChainTests(SimpleTestCase):
+    def setUp(self):
+        self.times = pd.date_range('2024-06-21', periods=24, freq='1h', tz='UTC')
+        self.weather = get_location(LAT, LON).get_clearsky(self.times)
+        self.pool = ModelChainPool(maxsize=4)
+
+    def test_runs_on_the_precomputed_solar_position(self):
+        solar_position = get_solar_position(LAT, LON, self.times)
+        expected = self.pool.run(30, 180, LAT, LON, self.weather)
+        with mock.patch.object(Location, 'get_solarposition', side_effect=AssertionError('solar position recomputed')) as recompute:
+            ac = self.pool.run(30, 180, LAT, LON, self.weather, solar_position)
+        recompute.assert_not_called()
+        pd.testing.assert_series_equal(ac, expected)
+
+    def test_recomputes_a_solar_position_for_other_times(self):
+        solar_position = get_solar_position(LAT, LON, self.times + pd.Timedelta(days=1))
+        with mock.patch.object(Location, 'get_solarposition', wraps=get_location(LAT, LON).get_solarposition) as recompute:
+            self.pool.run(30, 180, LAT, LON, self.weather, solar_position)
+        recompute.assert_called_once()
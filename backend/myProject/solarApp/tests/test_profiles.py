@@ -0,0 +1,40 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from solarApp.profiles import VERSION_KEY, ApplianceProfileRegistry
+
+
+class ApplianceProfileRegistryTests(TestCase):
+    def setUp(self):
+        cache.delete(VERSION_KEY)
+
+    def import_profiles(self, rows):
+        path = Path(tempfile.mkdtemp()) / 'profiles.csv'
+        lines = [f'{name},{sequence},{consumption}\n' for name, sequence, consumption in rows]
+        path.write_text('appliance_name,sequence,consumption\n' + ''.join(lines))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_appliance_profiles', str(path), stdout=StringIO())
+
+    def test_imports_reach_registries_in_other_processes(self):
+        # A second registry stands in for another worker sharing the cache
+        worker = ApplianceProfileRegistry(ttl=None)
+        self.import_profiles([('kettle', 1, 2000.0)])
+        self.assertEqual(list(worker.get('kettle').consumption), [2000.0])
+
+        self.import_profiles([('kettle', 1, 1500.0), ('kettle', 2, 500.0)])
+        # Within the check interval the worker keeps its copy, then it sees the new version
+        self.assertEqual(list(worker.get('kettle').consumption), [2000.0])
+        with mock.patch('solarApp.profiles.VERSION_CHECK_INTERVAL', 0):
+            self.assertEqual(list(worker.get('kettle').consumption), [1500.0, 500.0])
+
+    def test_unchanged_catalogue_is_not_reloaded(self):
+        worker = ApplianceProfileRegistry(ttl=None)
+        self.import_profiles([('kettle', 1, 2000.0)])
+        worker.profiles
+        with mock.patch('solarApp.profiles.VERSION_CHECK_INTERVAL', 0), mock.patch.object(worker, 'load') as load:
+            worker.profiles
+        load.assert_not_called()
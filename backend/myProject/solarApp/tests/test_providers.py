@@ -0,0 +1,108 @@
+import asyncio
+import itertools
+import time
+from django.test import SimpleTestCase
+from solarApp.providers import Provider, ProviderChain, ProviderError, provider_stats
+
+names = itertools.count()
+
+
+class ScriptedProvider(Provider):
+    # Remote provider answering value (or raising error) after latency seconds. Records when each
+    # call started and whether it finished or was cancelled.
+    def __init__(self, value=None, error=None, latency=0.0):
+        self.name = f'scripted{next(names)}'
+        self.value = value
+        self.error = error
+        self.latency = latency
+        self.started = []
+        self.finished = 0
+        self.cancelled = 0
+
+    async def afetch(self, *key):
+        self.started.append(time.monotonic())
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.finished += 1
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def fetch(chain, *key):
+    # (value or raised error, seconds taken), settling the loop afterwards so cancellations land
+    async def run():
+        started = time.monotonic()
+        try:
+            value = await chain.afetch(*key)
+        except Exception as e:
+            value = e
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(0.05)
+        return value, elapsed
+
+    return asyncio.run(run())
+
+
+def stats(provider):
+    return provider_stats.snapshot().get(provider.name, {})
+
+
+class ProviderChainTests(SimpleTestCase):
+    def test_answers_from_the_first_provider_with_data(self):
+        primary, secondary = ScriptedProvider('primary'), ScriptedProvider('secondary')
+        value, _ = fetch(ProviderChain('test', [primary, secondary], hedge_after=1.0), 'key')
+        self.assertEqual(value, 'primary')
+        self.assertEqual(secondary.started, [])
+
+    def test_none_from_the_primary_is_a_miss(self):
+        primary, secondary = ScriptedProvider(None), ScriptedProvider('secondary')
+        value, _ = fetch(ProviderChain('test', [primary, secondary], hedge_after=1.0), 'key')
+        self.assertEqual(value, 'secondary')
+        self.assertEqual((stats(primary)['misses'], stats(primary)['hedges']), (1, 0))
+        self.assertEqual(stats(secondary)['hits'], 1)
+
+    def test_hedges_a_slow_primary_and_cancels_the_loser(self):
+        primary, secondary = ScriptedProvider('primary', latency=1.0), ScriptedProvider('secondary')
+        value, elapsed = fetch(ProviderChain('test', [primary, secondary], hedge_after=0.1), 'key')
+        self.assertEqual(value, 'secondary')
+        # The secondary starts once the hedge timer fires, not before
+        self.assertGreaterEqual(secondary.started[0] - primary.started[0], 0.1)
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual((primary.finished, primary.cancelled), (0, 1))
+        self.assertEqual(stats(primary)['hedges'], 1)
+        self.assertEqual(stats(secondary)['hedge_wins'], 1)
+
+    def test_primary_still_wins_the_race_if_it_answers_first(self):
+        primary, secondary = ScriptedProvider('primary', latency=0.2), ScriptedProvider('secondary', latency=1.0)
+        value, _ = fetch(ProviderChain('test', [primary, secondary], hedge_after=0.1), 'key')
+        self.assertEqual(value, 'primary')
+        self.assertEqual(len(secondary.started), 1)
+        self.assertEqual((secondary.finished, secondary.cancelled), (0, 1))
+        self.assertEqual(stats(secondary).get('hedge_wins', 0), 0)
+
+    def test_last_provider_is_hedged_against_itself(self):
+        provider = ScriptedProvider('only', latency=0.3)
+        value, _ = fetch(ProviderChain('test', [provider], hedge_after=0.1), 'key')
+        self.assertEqual(value, 'only')
+        self.assertEqual(len(provider.started), 2)
+        self.assertEqual(provider.cancelled, 1)
+
+    def test_no_hedge_without_hedge_after(self):
+        primary, secondary = ScriptedProvider('primary', latency=0.2), ScriptedProvider('secondary')
+        value, _ = fetch(ProviderChain('test', [primary, secondary]), 'key')
+        self.assertEqual(value, 'primary')
+        self.assertEqual(secondary.started, [])
+
+    def test_raises_the_last_error_when_no_provider_answers(self):
+        first, last = ProviderError('first', status=503), ProviderError('last', status=502)
+        chain = ProviderChain('test', [ScriptedProvider(error=first), ScriptedProvider(None), ScriptedProvider(error=last)], hedge_after=1.0)
+        value, _ = fetch(chain, 'key')
+        self.assertIs(value, last)
+
+    def test_raises_lookup_error_when_every_provider_misses(self):
+        value, _ = fetch(ProviderChain('test', [ScriptedProvider(None), ScriptedProvider(None)], hedge_after=1.0), 'key')
+        self.assertIsInstance(value, LookupError)
@@ -0,0 +1,184 @@
+import itertools
+import random
+from unittest import mock
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from solarApp.scheduling import (energy_balance, find_optimal_start, load_scores, scheduled_load, solve_branch_and_bound, solve_schedule,
+                                 window_scores)
+
+
+def brute_force(production, loads, run_after, allow_overlap, power_cap):
+    # (appliances placed, summed load score) of the best schedule, by trying every combination
+    # of starts, with None for leaving an appliance out
+    names = list(loads)
+    scores = {name: load_scores(production, load) for name, load in loads.items()}
+    best = (0, 0.0)
+    for combination in itertools.product(*([None] + list(range(len(scores[name]))) for name in names)):
+        starts = dict(zip(names, combination))
+        if not valid_schedule(len(production), loads, starts, run_after, allow_overlap, power_cap):
+            continue
+        placed = [name for name in names if starts[name] is not None]
+        best = max(best, (len(placed), sum(float(scores[name][starts[name]]) for name in placed)))
+    return best
+
+
+def valid_schedule(n_steps, loads, starts, run_after, allow_overlap, power_cap):
+    usage = np.zeros(n_steps)
+    busy = np.zeros(n_steps, dtype=int)
+    for name, start in starts.items():
+        if start is None:
+            continue
+        for first in run_after.get(name, ()):
+            if first in loads and (starts[first] is None or start < starts[first] + len(loads[first])):
+                return False
+        usage[start:start + len(loads[name])] += loads[name]
+        busy[start:start + len(loads[name])] += 1
+    if not allow_overlap and busy.max(initial=0) > 1:
+        return False
+    return power_cap is None or usage.max(initial=0) <= power_cap
+
+
+def summary(production, loads, result):
+    scores = {name: load_scores(production, load) for name, load in loads.items()}
+    placed = [name for name, start in result.starts.items() if start is not None]
+    return len(placed), sum(float(scores[name][result.starts[name]]) for name in placed)
+
+
+def random_instance(rng, n_appliances):
+    n_steps = rng.randint(6, 10)
+    production = np.array([rng.uniform(0, 3000) for _ in range(n_steps)])
+    loads = {f'appliance{i}': np.array([rng.uniform(100, 2000) for _ in range(rng.randint(1, 4))])
+             for i in range(n_appliances)}
+    run_after = {}
+    if n_appliances > 1 and rng.random() < 0.5:
+        run_after['appliance1'] = ('appliance0',)
+    return production, loads, run_after
+
+
+class WindowScoresTests(SimpleTestCase):
+    def test_matches_a_loop_over_every_start(self):
+        rng = np.random.default_rng(4)
+        for n_steps, length in ((24, 1), (24, 5), (96, 17), (10, 10)):
+            production = rng.uniform(0, 3000, n_steps)
+            load = rng.uniform(0, 2000, length)
+            expected = [float(np.dot(production[start:start + length], load / load.sum())) for start in range(n_steps - length + 1)]
+            np.testing.assert_allclose(window_scores(production, load), expected)
+
+    def test_zero_load_weighs_every_step_alike(self):
+        np.testing.assert_allclose(window_scores([1.0, 2.0, 3.0, 6.0], [0.0, 0.0]), [1.5, 2.5, 4.5])
+
+    def test_loads_that_do_not_fit_have_no_scores(self):
+        self.assertEqual(len(window_scores([1.0, 2.0], [1.0, 1.0, 1.0])), 0)
+        self.assertEqual(len(window_scores([1.0, 2.0], [])), 0)
+
+    def test_find_optimal_start_picks_the_best_window(self):
+        index = pd.date_range('2024-05-10', periods=24, freq='1h', tz='UTC')
+        production = pd.Series(np.zeros(24), index=index)
+        production.iloc[13] = 1000.0
+        # Two hours of 10-minute profile steps, heaviest in the second hour
+        consumption = [100.0] * 6 + [500.0] * 6
+        self.assertEqual(find_optimal_start(production, consumption), index[12])
+        self.assertIsNone(find_optimal_start(production.iloc[:1], consumption))
+
+    def test_load_scores_weigh_by_the_load_itself(self):
+        production = np.array([1.0, 2.0, 3.0, 6.0])
+        np.testing.assert_allclose(load_scores(production, [10.0, 30.0]), [70.0, 110.0, 210.0])
+        np.testing.assert_allclose(load_scores(production, [0.0, 0.0]), [0.0, 0.0, 0.0])
+        self.assertEqual(len(load_scores(production, [1.0] * 5)), 0)
+
+
+class SolveScheduleTests(SimpleTestCase):
+    def assertMatchesBruteForce(self, production, loads, run_after, allow_overlap, power_cap):
+        expected = brute_force(production, loads, run_after, allow_overlap, power_cap)
+        result = solve_schedule(production, loads, run_after=run_after, allow_overlap=allow_overlap, power_cap=power_cap)
+        self.assertTrue(result.optimal)
+        self.assertTrue(valid_schedule(len(production), loads, result.starts, run_after, allow_overlap, power_cap))
+        placed, objective = summary(production, loads, result)
+        self.assertEqual(placed, expected[0])
+        self.assertAlmostEqual(objective, expected[1], places=6)
+        self.assertAlmostEqual(result.objective, expected[1], places=6)
+
+    def test_matches_brute_force_without_overlap(self):
+        rng = random.Random(1)
+        for _ in range(40):
+            production, loads, run_after = random_instance(rng, rng.randint(1, 3))
+            power_cap = rng.choice([None, 1500])
+            with self.subTest(production=production, loads=loads, run_after=run_after, power_cap=power_cap):
+                self.assertMatchesBruteForce(production, loads, run_after, False, power_cap)
+
+    def test_matches_brute_force_with_overlap(self):
+        rng = random.Random(2)
+        for _ in range(40):
+            production, loads, run_after = random_instance(rng, rng.randint(1, 3))
+            power_cap = rng.choice([None, 2000, 3000])
+            with self.subTest(production=production, loads=loads, run_after=run_after, power_cap=power_cap):
+                self.assertMatchesBruteForce(production, loads, run_after, True, power_cap)
+
+    def test_matches_brute_force_with_loads_of_very_different_sizes(self):
+        rng = random.Random(4)
+        for _ in range(40):
+            production, loads, run_after = random_instance(rng, rng.randint(2, 3))
+            loads = {name: load * rng.choice([0.05, 1.0, 5.0]) for name, load in loads.items()}
+            allow_overlap = rng.random() < 0.5
+            with self.subTest(production=production, loads=loads, run_after=run_after, allow_overlap=allow_overlap):
+                self.assertMatchesBruteForce(production, loads, run_after, allow_overlap, None)
+
+    def test_larger_appliance_gets_the_sunnier_window(self):
+        production = np.array([0.0, 1000.0, 1000.0, 0.0, 3000.0, 3000.0, 0.0])
+        for names in (('kettle', 'lamp'), ('lamp', 'kettle')):
+            loads = {name: np.array([2000.0, 2000.0] if name == 'kettle' else [100.0, 100.0]) for name in names}
+            result = solve_schedule(production, loads)
+            self.assertEqual(result.starts, {'kettle': 4, 'lamp': 1})
+            balance = energy_balance(production, scheduled_load(len(production), loads, result.starts), 60)
+            self.assertEqual(balance.self_consumption, 4200.0)
+
+    def test_branch_and_bound_matches_brute_force_without_overlap(self):
+        # solve_schedule uses the dynamic programme here, so call the branch-and-bound directly
+        rng = random.Random(3)
+        for _ in range(40):
+            production, loads, run_after = random_instance(rng, rng.randint(1, 3))
+            scores = {name: load_scores(production, load) for name, load in loads.items()}
+            bonus = sum(float(score.max()) if len(score) else 0.0 for score in scores.values()) + 1.0
+            names = list(loads)
+            if run_after:
+                names = ['appliance0'] + [name for name in names if name != 'appliance0']
+            result = solve_branch_and_bound(production, names, loads, scores, run_after, None, bonus, False, None)
+            with self.subTest(production=production, loads=loads, run_after=run_after):
+                self.assertEqual(summary(production, loads, result), brute_force(production, loads, run_after, False, None))
+
+    def test_large_problems_skip_the_dynamic_programme(self):
+        rng = random.Random(5)
+        production, loads, run_after = random_instance(rng, 3)
+        expected = brute_force(production, loads, run_after, False, None)
+        with mock.patch('solarApp.scheduling.DP_MAX_CELLS', len(production) * 8), \
+                mock.patch('solarApp.scheduling.solve_non_overlapping') as solve_non_overlapping:
+            result = solve_schedule(production, loads, run_after=run_after)
+        solve_non_overlapping.assert_not_called()
+        self.assertEqual(summary(production, loads, result), expected)
+
+    def test_run_after_orders_appliances(self):
+        production = np.array([0, 0, 0, 100, 3000, 3000, 100, 0])
+        loads = {'washer': np.array([1000.0, 1000.0]), 'dryer': np.array([2000.0, 2000.0])}
+        result = solve_schedule(production, loads, run_after={'dryer': ('washer',)})
+        self.assertGreaterEqual(result.starts['dryer'], result.starts['washer'] + 2)
+
+        # The dryer is left out when the washer cannot be followed by it
+        result = solve_schedule(production[2:5], loads, run_after={'dryer': ('washer',)})
+        self.assertEqual(result.starts, {'washer': 1, 'dryer': None})
+
+    def test_power_cap_excludes_appliances(self):
+        production = np.full(6, 2000.0)
+        loads = {'kettle': np.array([3000.0]), 'washer': np.array([500.0, 500.0])}
+        for allow_overlap in (False, True):
+            result = solve_schedule(production, loads, allow_overlap=allow_overlap, power_cap=2500)
+            self.assertIsNone(result.starts['kettle'])
+            self.assertIsNotNone(result.starts['washer'])
+
+    def test_power_cap_leaves_out_an_appliance_to_fit_two_others(self):
+        # Running the oven rules out both others, so the best schedule under the cap skips it
+        production = np.array([3000.0, 3000.0])
+        loads = {'oven': np.array([2500.0, 2500.0]), 'washer': np.array([1000.0, 1000.0]), 'dishwasher': np.array([1000.0, 1000.0])}
+        result = solve_schedule(production, loads, allow_overlap=True, power_cap=3000)
+        self.assertEqual(result.starts, {'oven': None, 'washer': 0, 'dishwasher': 0})
+        self.assertTrue(result.optimal)
@@ -0,0 +1,111 @@
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from solarApp import timeseries
+from solarApp.models import Submission
+
+
+def payload_format(data):
+    return timeseries.HEADER.unpack_from(data)[2]
+
+
+def production(labels, values=None):
+    values = values if values is not None else [float(i) * 12.5 for i in range(len(labels))]
+    return [{"hour": label, "production": value} for label, value in zip(labels, values)]
+
+
+class ProductionEncodingTests(SimpleTestCase):
+    def assertRoundTrip(self, series, expected_format):
+        data = timeseries.encode_production(series)
+        self.assertEqual(payload_format(data), expected_format)
+        self.assertEqual(timeseries.decode(data), series)
+
+    def test_hourly_day_is_packed(self):
+        series = production([f'{hour:02d}:00' for hour in range(24)])
+        self.assertRoundTrip(series, timeseries.FORMAT_PRODUCTION)
+        self.assertEqual(len(timeseries.encode_production(series)),
+                         timeseries.HEADER.size + timeseries.PRODUCTION_HEADER.size + 24 * 8)
+
+    def test_sub_hourly_series_wrapping_midnight_is_packed(self):
+        labels = [f'{(23 * 60 + 15 * i) // 60 % 24:02d}:{15 * i % 60:02d}' for i in range(12)]
+        self.assertEqual(labels[:6], ['23:00', '23:15', '23:30', '23:45', '00:00', '00:15'])
+        self.assertRoundTrip(production(labels), timeseries.FORMAT_PRODUCTION)
+
+    def test_dated_labels_are_packed(self):
+        labels = [f'2024-05-{day:02d} {hour:02d}:30' for day in (10, 11) for hour in range(24)]
+        self.assertRoundTrip(production(labels), timeseries.FORMAT_PRODUCTION)
+
+    def test_exact_float_values_survive(self):
+        self.assertRoundTrip(production(['10:00', '11:00'], [0.1 + 0.2, -1e-300]), timeseries.FORMAT_PRODUCTION)
+
+    def test_irregular_or_unexpected_series_fall_back_to_json(self):
+        cases = [
+            production(['10:00', '11:00', '13:00']),
+            production(['10:00', '2024-05-10 11:00']),
+            [{"hour": "10:00", "production": 1.0, "extra": True}],
+            [{"hour": "10:00", "production": "lots"}],
+            [{"hour": "not a time", "production": 1.0}],
+        ]
+        for series in cases:
+            with self.subTest(series=series):
+                self.assertRoundTrip(series, timeseries.FORMAT_JSON)
+
+    def test_empty_and_missing_series(self):
+        self.assertEqual(timeseries.decode(timeseries.encode_production([])), [])
+        self.assertIsNone(timeseries.encode_production(None))
+        self.assertIsNone(timeseries.decode(None))
+
+
+class ConsumptionEncodingTests(SimpleTestCase):
+    def test_rows_ordered_by_sequence_are_packed(self):
+        rows = sorted([{"appliance_name": name, "sequence": first + i, "consumption": float(i * 100 + first)}
+                       for name, first, count in (('Washing Machine', 1, 12), ('Tumble Dryer', 4, 6), ('Kettle', 20, 1))
+                       for i in range(count)], key=lambda row: row['sequence'])
+        data = timeseries.encode_consumption(rows)
+        self.assertEqual(payload_format(data), timeseries.FORMAT_CONSUMPTION)
+        self.assertEqual(timeseries.decode(data), rows)
+
+    def test_rows_that_do_not_fit_fall_back_to_json(self):
+        cases = [
+            # Out of sequence order, which decoding would not reproduce
+            [{"appliance_name": "a", "sequence": 2, "consumption": 1.0}, {"appliance_name": "a", "sequence": 1, "consumption": 2.0}],
+            [{"appliance_name": "a", "sequence": 1, "consumption": 1.0}, {"appliance_name": "a", "sequence": 3, "consumption": 2.0}],
+            [{"appliance_name": "a" * 300, "sequence": 1, "consumption": 1.0}],
+            [{"appliance_name": "a", "sequence": 1, "consumption": 1.0, "unit": "W"}],
+        ]
+        for rows in cases:
+            with self.subTest(rows=rows):
+                data = timeseries.encode_consumption(rows)
+                self.assertEqual(payload_format(data), timeseries.FORMAT_JSON)
+                self.assertEqual(timeseries.decode(data), rows)
+
+
+class ValuesEncodingTests(SimpleTestCase):
+    def test_values_round_trip_without_copying(self):
+        values = np.linspace(0, 1, 48)
+        data = timeseries.encode_values(values)
+        decoded = timeseries.decode_values(data)
+        np.testing.assert_array_equal(decoded, values)
+        self.assertFalse(decoded.flags.writeable)
+        self.assertEqual(timeseries.decode(data), values.tolist())
+
+    def test_rejects_other_blobs(self):
+        with self.assertRaises(ValueError):
+            timeseries.decode_values(timeseries.encode_production(production(['10:00'])))
+        with self.assertRaises(ValueError):
+            timeseries.decode(b'XX\x01\x01')
+        with self.assertRaises(ValueError):
+            timeseries.decode(timeseries.HEADER.pack(timeseries.MAGIC, timeseries.VERSION, 99))
+
+
+class SubmissionSeriesTests(TestCase):
+    def test_series_round_trip_through_the_database(self):
+        series = production([f'{hour:02d}:00' for hour in range(24)])
+        rows = [{"appliance_name": "Kettle", "sequence": 1, "consumption": 2000.0}]
+        submission = Submission(post_code='DD1 4HN')
+        submission.hourly_solar_production = series
+        submission.appliance_consumption = rows
+        submission.save()
+
+        submission = Submission.objects.get(pk=submission.pk)
+        self.assertEqual(submission.hourly_solar_production, series)
+        self.assertEqual(submission.appliance_consumption, rows)
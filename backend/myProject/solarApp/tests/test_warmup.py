@@ -0,0 +1,86 @@
+from io import StringIO
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from benchmarks.stub import UpstreamStub
+from solarApp.http_client import AsyncHTTPClient
+from solarApp.irradiance import cached_irradiance_profile, irradiance_cache, location_cell
+from solarApp.models import IrradianceProfile
+
+# The fixture location for DD1 4HN, and a bounding box holding just its grid cell
+LAT, LON = 56.462, -2.9707
+BBOX = ('--bbox', str(LAT), str(LON), str(LAT), str(LON))
+
+
+class WarmIrradianceProfilesTests(TestCase):
+    def setUp(self):
+        irradiance_cache.clear()
+
+    def warm(self, stub, *args):
+        out = StringIO()
+        with override_settings(OPENWEATHERMAP_API_URL=stub.url, PVGIS_API_URL=f'{stub.url}/api'):
+            call_command('warm_irradiance_profiles', *args, stdout=out)
+        return out.getvalue()
+
+    def start_stub(self, **kwargs):
+        stub = UpstreamStub(**kwargs).start()
+        self.addCleanup(stub.stop)
+        return stub
+
+    def test_warms_the_store_for_postcodes(self):
+        stub = self.start_stub()
+        output = self.warm(stub, '--post-codes', 'DD1 4HN', '--months', '5', '6')
+
+        self.assertIn('Successfully warmed 2 irradiance profiles (0 failed)', output)
+        self.assertEqual(stub.requests['pvgis'], 2)
+        lat_cell, lon_cell = location_cell(LAT, LON)
+        self.assertEqual(sorted(IrradianceProfile.objects.filter(lat=lat_cell, lon=lon_cell).values_list('month', flat=True)), [5, 6])
+
+        hours = stub.drcalc['DD1 4HN']['months']['5']['outputs']['daily_profile']
+        ghi, dni, dhi = cached_irradiance_profile(LAT, LON, 5)
+        self.assertEqual(ghi, [hour['G(i)'] for hour in hours])
+        self.assertEqual(dni, [hour['Gb(i)'] for hour in hours])
+        self.assertEqual(dhi, [hour['Gd(i)'] for hour in hours])
+
+    def test_skips_stored_profiles_unless_refreshing(self):
+        stub = self.start_stub()
+        self.warm(stub, *BBOX, '--months', '5')
+        self.assertIn('Warming 0 profiles for 1 cells', self.warm(stub, *BBOX, '--months', '5'))
+        self.assertEqual(stub.requests['pvgis'], 1)
+
+        self.assertIn('Warming 1 profiles for 1 cells', self.warm(stub, *BBOX, '--months', '5', '--refresh'))
+        self.assertEqual(stub.requests['pvgis'], 2)
+        self.assertEqual(IrradianceProfile.objects.count(), 1)
+
+    def test_upstream_errors_are_reported_and_not_stored(self):
+        stub = self.start_stub(error_rate=1.0, error_status=500)
+        client = AsyncHTTPClient(timeout=5, connect_timeout=1, max_connections=4, max_keepalive=4, max_per_host=4, retries=1, backoff=0.01)
+        with mock.patch('solarApp.irradiance.http_client', client):
+            output = self.warm(stub, *BBOX, '--months', '5', '6')
+
+        self.assertIn('Failed to warm', output)
+        self.assertIn('Successfully warmed 0 irradiance profiles (2 failed)', output)
+        # Each month is tried once and retried once
+        self.assertEqual(stub.requests['pvgis'], 4)
+        self.assertFalse(IrradianceProfile.objects.exists())
+        self.assertIsNone(cached_irradiance_profile(LAT, LON, 5))
+
+    def test_slow_upstream_times_out(self):
+        stub = self.start_stub(latency=1.0)
+        client = AsyncHTTPClient(timeout=0.1, connect_timeout=1, max_connections=4, max_keepalive=4, max_per_host=4, retries=0, backoff=0.01)
+        with mock.patch('solarApp.irradiance.http_client', client):
+            output = self.warm(stub, *BBOX, '--months', '5')
+
+        self.assertIn('Successfully warmed 0 irradiance profiles (1 failed)', output)
+        self.assertFalse(IrradianceProfile.objects.exists())
+
+    def test_postcodes_that_do_not_geocode_are_skipped(self):
+        stub = self.start_stub()
+        with self.assertRaisesMessage(CommandError, 'Nothing to warm'):
+            self.warm(stub, '--post-codes', 'NOT A POSTCODE')
+        self.assertEqual(stub.requests['pvgis'], 0)
+
+    def test_rejects_invalid_months(self):
+        stub = self.start_stub()
+        with self.assertRaisesMessage(CommandError, 'Months must be between 1 and 12'):
+            self.warm(stub, *BBOX, '--months', '13')
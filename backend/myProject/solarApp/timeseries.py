@@ -0,0 +1,161 @@
+import json
+import struct
+import zlib
+from datetime import datetime, timedelta
+import numpy as np
+
+# Packed binary encoding for the time series stored on Submission.
+#
+# Every blob starts with a 4-byte header: magic b'TS', schema version, payload format.
+#   FORMAT_PRODUCTION: flags (B), step minutes (H), start minute (q), count (I), then count float64.
+#     The start is minutes since midnight, or since the Unix epoch when FLAG_DATED is set and
+#     labels carry a date ("YYYY-MM-DD HH:MM" rather than "HH:MM").
+#   FORMAT_CONSUMPTION: appliance count (H), then per appliance: name length (B), UTF-8 name,
+#     first sequence (I), count (I), then count float64 for consecutive sequences.
+#   FORMAT_VALUES: count (I), then count float64; a bare array, see encode_values / decode_values.
+#   FORMAT_JSON: zlib-compressed JSON, for anything that does not fit the packed layouts.
+
+MAGIC = b'TS'
+VERSION = 1
+FORMAT_JSON = 0
+FORMAT_PRODUCTION = 1
+FORMAT_CONSUMPTION = 2
+FORMAT_VALUES = 3
+FLAG_DATED = 1
+
+HEADER = struct.Struct('<2sBB')
+PRODUCTION_HEADER = struct.Struct('<BHqI')
+APPLIANCE_HEADER = struct.Struct('<II')
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def header(payload_format):
+    return HEADER.pack(MAGIC, VERSION, payload_format)
+
+
+def encode_json(value):
+    return header(FORMAT_JSON) + zlib.compress(json.dumps(value, separators=(',', ':')).encode())
+
+
+def parse_label(label):
+    # Minutes since midnight for "HH:MM", or since the epoch (and dated=True) for "YYYY-MM-DD HH:MM"
+    if len(label) == 5:
+        hour, minute = label.split(':')
+        return int(hour) * 60 + int(minute), False
+    moment = datetime.strptime(label, '%Y-%m-%d %H:%M')
+    return int((moment - EPOCH).total_seconds() // 60), True
+
+
+def format_label(minutes, dated):
+    if dated:
+        return (EPOCH + timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M')
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def encode_production(series):
+    # [{"hour": label, "production": W}, ...] at a fixed step
+    if series is None:
+        return None
+    try:
+        parsed = [parse_label(entry['hour']) for entry in series]
+        values = [float(entry['production']) for entry in series]
+        if any(set(entry) != {'hour', 'production'} for entry in series) or len({dated for _, dated in parsed}) > 1:
+            raise ValueError('Mixed labels')
+        minutes = [minute for minute, _ in parsed]
+        # Undated labels wrap at midnight, so unwrap them before checking the spacing
+        if parsed and not parsed[0][1]:
+            for i in range(1, len(minutes)):
+                while minutes[i] < minutes[i - 1]:
+                    minutes[i] += 24 * 60
+        step = minutes[1] - minutes[0] if len(minutes) > 1 else 60
+        if step <= 0 or step > 0xFFFF or any(b - a != step for a, b in zip(minutes, minutes[1:])):
+            raise ValueError('Irregular series')
+    except (KeyError, TypeError, ValueError):
+        return encode_json(series)
+    flags = FLAG_DATED if parsed and parsed[0][1] else 0
+    packed_header = PRODUCTION_HEADER.pack(flags, step, minutes[0] if minutes else 0, len(values))
+    return header(FORMAT_PRODUCTION) + packed_header + struct.pack(f'<{len(values)}d', *values)
+
+
+def encode_consumption(rows):
+    # [{"appliance_name": name, "sequence": n, "consumption": W}, ...], consecutive sequences per appliance
+    if rows is None:
+        return None
+    try:
+        appliances = {}
+        for row in rows:
+            if set(row) != {'appliance_name', 'sequence', 'consumption'}:
+                raise ValueError('Unexpected keys')
+            appliances.setdefault(row['appliance_name'], []).append((int(row['sequence']), float(row['consumption'])))
+        # Decoding yields rows ordered by sequence, so only pack lists that are already in that order
+        order = [(int(row['sequence']), list(appliances).index(row['appliance_name'])) for row in rows]
+        if order != sorted(order):
+            raise ValueError('Unordered rows')
+        parts = [header(FORMAT_CONSUMPTION), struct.pack('<H', len(appliances))]
+        for name, steps in appliances.items():
+            sequences = [sequence for sequence, _ in steps]
+            if sequences != list(range(sequences[0], sequences[0] + len(sequences))):
+                raise ValueError('Non-consecutive sequences')
+            encoded_name = name.encode()
+            parts += [struct.pack('<B', len(encoded_name)), encoded_name, APPLIANCE_HEADER.pack(sequences[0], len(steps)),
+                      struct.pack(f'<{len(steps)}d', *(consumption for _, consumption in steps))]
+    except (KeyError, TypeError, ValueError, AttributeError, struct.error, IndexError):
+        return encode_json(rows)
+    return b''.join(parts)
+
+
+def encode_values(values):
+    values = np.ascontiguousarray(values, dtype='<f8')
+    return header(FORMAT_VALUES) + struct.pack('<I', len(values)) + values.tobytes()
+
+
+def decode_values(data):
+    # Read-only float64 array viewing the blob, without copying the values
+    magic, version, payload_format = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or payload_format != FORMAT_VALUES:
+        raise ValueError(f'Not a packed value array {magic!r} v{version} format {payload_format}')
+    (count,) = struct.unpack_from('<I', data, HEADER.size)
+    return np.frombuffer(data, dtype='<f8', count=count, offset=HEADER.size + 4)
+
+
+def decode(data):
+    # Inverse of encode_production / encode_consumption
+    if data is None:
+        return None
+    data = bytes(data)
+    magic, version, payload_format = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'Unsupported time series encoding {magic!r} v{version}')
+    offset = HEADER.size
+
+    if payload_format == FORMAT_JSON:
+        return json.loads(zlib.decompress(data[offset:]))
+
+    if payload_format == FORMAT_PRODUCTION:
+        flags, step, start, count = PRODUCTION_HEADER.unpack_from(data, offset)
+        values = struct.unpack_from(f'<{count}d', data, offset + PRODUCTION_HEADER.size)
+        dated = bool(flags & FLAG_DATED)
+        return [{"hour": format_label(start + i * step, dated), "production": value} for i, value in enumerate(values)]
+
+    if payload_format == FORMAT_CONSUMPTION:
+        (n_appliances,) = struct.unpack_from('<H', data, offset)
+        offset += 2
+        rows = []
+        for _ in range(n_appliances):
+            (name_length,) = struct.unpack_from('<B', data, offset)
+            name = data[offset + 1:offset + 1 + name_length].decode()
+            offset += 1 + name_length
+            first, count = APPLIANCE_HEADER.unpack_from(data, offset)
+            offset += APPLIANCE_HEADER.size
+            values = struct.unpack_from(f'<{count}d', data, offset)
+            offset += 8 * count
+            rows += [{"appliance_name": name, "sequence": first + i, "consumption": value} for i, value in enumerate(values)]
+        # Stable sort keeps the appliance order within a sequence, matching how rows were written
+        return sorted(rows, key=lambda row: row["sequence"])
+
+    if payload_format == FORMAT_VALUES:
+        return decode_values(data).tolist()
+
+    raise ValueError(f'Unknown time series format {payload_format}')
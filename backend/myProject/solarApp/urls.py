@@ -1,11 +1,22 @@
 from django.urls import path
-from .views import SubmissionView, WeatherDataView, SolarDataView, SubmissionChartDataView, CreateUserView, UserProfileView
+from .views import (ApplianceListView, SubmissionView, SubmissionHistoryView, WeatherDataView, SolarDataView, SolarBatchView,
+                    ForecastCacheStatsView, ForecastJobSubmitView, ForecastJobView, ProviderStatsView, SubmissionChartDataView,
+                    CreateUserView, UserProfileView)
 from dj_rest_auth.views import LoginView
+from .models import ForecastJob
 
 urlpatterns = [
     path('submission/', SubmissionView.as_view(), name='submission'),
+    path('submission/history/', SubmissionHistoryView.as_view(), name='submission_history'),
     path('weatherdata/', WeatherDataView.as_view(), name='weatherdata'),
+    path('appliances/', ApplianceListView.as_view(), name='appliances'),
     path('solardata/', SolarDataView.as_view(), name='solardata'),
+    path('solardata/batch/', SolarBatchView.as_view(), name='solardata_batch'),
+    path('solardata/jobs/', ForecastJobSubmitView.as_view(kind=ForecastJob.SOLARDATA), name='solardata_jobs'),
+    path('solardata/batch/jobs/', ForecastJobSubmitView.as_view(kind=ForecastJob.BATCH), name='solardata_batch_jobs'),
+    path('jobs/<uuid:pk>/', ForecastJobView.as_view(), name='forecast_job'),
+    path('solardata/cache/stats/', ForecastCacheStatsView.as_view(), name='forecast_cache_stats'),
+    path('providers/stats/', ProviderStatsView.as_view(), name='provider_stats'),
     path('submission_chart_data/<int:pk>/', SubmissionChartDataView.as_view(), name='submission_chart_data'),
     path('register/', CreateUserView.as_view(), name='createaccount'),
     path('login/', LoginView.as_view(), name='login'),
@@ -1,70 +1,87 @@
 from rest_framework import generics
-from .models import Submission, ApplianceConsumption
-from .serializers import SubmissionSerializer, ChartDataSerializer, UserProfileSerializer
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from .models import Appliance, ForecastJob, Submission
+from .serializers import ApplianceSerializer, ForecastJobSerializer, SubmissionSerializer, SubmissionHistorySerializer, ChartDataSerializer, UserProfileSerializer
+from .chart_cache import get_chart_response, set_chart_response
+from .forecast_cache import ForecastResult, forecast_cache, forecast_key, normalize_angle
+from .forecast_grid import lookup_regional_forecast
+from .geocoding import get_lat_lon_from_post_code
+from .http_client import http_client
+from .jobs import cancel_job, pending_jobs
+from .irradiance import (afetch_irradiance_profile, cached_irradiance_profile, fetch_solar_profiles, follow_solar_position, location_cell,
+                         profile_series, save_irradiance_profile)
+from .weather import afetch_weather_data, fetch_weather_data
+from .profiles import appliance_profiles
+from .providers import provider_stats
+from .metrics import errors_total, registry, stage
+from .modelling import get_solar_position, model_chain_pool, simulate_configurations
+from .scheduling import energy_balance, find_optimal_start, grid_position, profile_to_grid, scheduled_load, series_step_minutes, solve_schedule
 from rest_framework.views import APIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
-import requests
-import os
-import pvlib
-from pvlib.modelchain import ModelChain
-from pvlib.pvsystem import PVSystem
-from pvlib.location import Location
-from pvlib.temperature import TEMPERATURE_MODEL_PARAMETERS
-import pvlib.irradiance
+import json
+import math
+from dataclasses import asdict
+import numpy as np
 import pandas as pd
 from datetime import datetime
-import pytz
 from rest_framework import status
 from .serializers import UserSerializer
 from rest_framework.permissions import AllowAny
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 import pandas as pd
 
 
-def get_lat_lon_from_post_code(post_code):
-    geocoding_api_key = os.environ.get('OPENWEATHERMAP_API_KEY')
-    geocoding_api_url = f"http://api.openweathermap.org/geo/1.0/zip?zip={post_code}&appid={geocoding_api_key}"
-    geocoding_response = requests.get(geocoding_api_url)
-    if geocoding_response.status_code == 200:
-        geocoding_data = geocoding_response.json()
-        return geocoding_data.get('lat'), geocoding_data.get('lon')
-    else:
-        print(f"Geocoding API Error: {geocoding_response.text}")
-        return None, None
-
-
-def fetch_weather_data(lat, lon):
-    weather_api_key = os.environ.get('OPENWEATHERMAP_API_KEY')
-    weather_api_url = f"https://api.openweathermap.org/data/3.0/onecall?lat={lat}&lon={lon}&exclude=hourly,daily,alerts&appid={weather_api_key}"
-    weather_response = requests.get(weather_api_url)
-    if weather_response.status_code == 200:
-        weather_data = weather_response.json()
-        return {
-            "temperature": float(weather_data['current']['temp']) - 273.15,  # Convert from Kelvin to Celsius
-            "cloud_cover": str(weather_data['current']['clouds']),
-            "wind_speed": weather_data['current']['wind_speed'],
-            "wind_direction": weather_data['current']['wind_deg'],
-            "humidity": weather_data['current']['humidity'],
-            "precipitation": weather_data['current'].get('rain', {'1h': 0.0})['1h'] + weather_data['current'].get('snow', {'1h': 0.0})['1h'],  # Sum rain and snow
-        }
-    else:
-        return {"error": "Error fetching weather data", "status": weather_response.status_code}
-
-
-def fetch_solar_data(lat, lon, panel_orientation, panel_tilt, date):
-    url = f"https://re.jrc.ec.europa.eu/api/DRcalc?lat={lat}&lon={lon}&month={date.month}&global=1&outputformat=json"
-    solar_response = requests.get(url)
-    if solar_response.status_code == 200:
-        solar_data = solar_response.json()
-        daily_profile = solar_data['outputs']['daily_profile']
-        ghi = [hour['G(i)'] for hour in daily_profile]
-        dni = [hour['Gb(i)'] for hour in daily_profile]
-        dhi = [hour['Gd(i)'] for hour in daily_profile]
-        return ghi, dni, dhi
-    else:
-        raise Exception(f"Error fetching solar data: {solar_response.status_code}")
+@stage('irradiance')
+def fetch_weather_and_solar_data(lat, lon, months, include_weather=True):
+    # Once lat/lon are known the current weather (if asked for) and every irradiance profile
+    # that is not already stored are fetched in parallel. Returns (weather, {month: profile}).
+    profiles = {month: cached_irradiance_profile(lat, lon, month) for month in months}
+    pending = {month: afetch_irradiance_profile(lat, lon, month) for month, profile in profiles.items() if profile is None}
+    if include_weather:
+        pending['weather'] = afetch_weather_data(lat, lon)
+    results = http_client.gather(pending) if pending else {}
+
+    for month, profile in profiles.items():
+        if profile is None:
+            profile = results[month]
+            if isinstance(profile, Exception):
+                raise profile
+            save_irradiance_profile(lat, lon, month, profile)
+            profiles[month] = profile
+    weather_data = results.get('weather')
+    if isinstance(weather_data, Exception):
+        weather_data = {"error": "Error fetching weather data", "status": status.HTTP_502_BAD_GATEWAY}
+    return weather_data, profiles
+
+
+# Catalogue slugs behind the boolean flags older clients send instead of an appliances list
+LEGACY_APPLIANCE_FLAGS = (('washing_machine_selected', 'washing_machine'), ('tumble_dryer_selected', 'tumble_dryer'))
+
+
+def select_appliance_profiles(data):
+    # Consumption profiles for the request's appliances list of catalogue ids, or for the legacy
+    # flags when there is none. Raises ValueError for a malformed list or an unknown id.
+    ids = data.get('appliances')
+    if ids is None:
+        profiles = [appliance_profiles.get(slug) for flag, slug in LEGACY_APPLIANCE_FLAGS if data.get(flag)]
+        return [profile for profile in profiles if profile is not None]
+    if not isinstance(ids, list) or not all(isinstance(appliance_id, int) and not isinstance(appliance_id, bool) for appliance_id in ids):
+        raise ValueError("appliances must be a list of appliance ids")
+    try:
+        return appliance_profiles.select(list(dict.fromkeys(ids)))
+    except KeyError as e:
+        raise ValueError(f"Unknown appliance id {e.args[0]}")
 
 
 class WeatherDataView(APIView):
@@ -79,184 +96,367 @@ class WeatherDataView(APIView):
         return Response(weather_data)
 
 
+class ProviderStatsView(APIView):
+    # Request counts, error rates, hedging and latency percentiles per data provider in this worker
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(provider_stats.snapshot())
+
+
+class ApplianceListView(generics.ListAPIView):
+    # The appliance catalogue: ids to send as SolarDataView's appliances list, with each
+    # profile's length in 10-minute steps and its energy per run (Wh)
+    serializer_class = ApplianceSerializer
+    queryset = (Appliance.objects.prefetch_related('run_after')
+                .annotate(step_count=Count('steps'), energy=Sum('steps__consumption') / 6)
+                .filter(step_count__gt=0).order_by('name'))
+
+
+def metrics_view(request):
+    # Prometheus text format for this worker; scrapers send METRICS_TOKEN as a bearer token, and
+    # without one configured the endpoint is not served at all
+    if not settings.METRICS_TOKEN:
+        return HttpResponse(status=404)
+    if request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ForecastCacheStatsView(APIView):
+    # Hits per tier, misses and the hit rate of the forecast result cache in this worker
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(forecast_cache.snapshot())
+
+
 class SolarDataView(APIView):
     def post(self, request):
+        return self.forecast(request.data)
+
+    def forecast(self, data):
+        # The response to one request body; the forecast job workers run it too
         try:
-            post_code = request.data.get('post_code')
-            datetime_str = request.data.get('date')
-            panel_orientation = float(request.data.get('panel_orientation'))
-            panel_tilt = float(request.data.get('panel_tilt'))
-            number_of_solar_panels = int(request.data.get('number_of_solar_panels'))
-            washing_machine_selected = request.data.get('washing_machine_selected')
-            tumble_dryer_selected = request.data.get('tumble_dryer_selected')
-            wm_optimal_usage = request.data.get('wm_optimal_usage')
-            td_optimal_usage = request.data.get('td_optimal_usage')
-            hourly_solar_production = request.data.get('hourly_solar_production')
+            post_code = data.get('post_code')
+            datetime_str = data.get('date')
+            panel_orientation = normalize_angle(data.get('panel_orientation'))
+            panel_tilt = normalize_angle(data.get('panel_tilt'))
+            number_of_solar_panels = int(data.get('number_of_solar_panels'))
+            wm_optimal_usage = data.get('wm_optimal_usage')
+            td_optimal_usage = data.get('td_optimal_usage')
+            hourly_solar_production = data.get('hourly_solar_production')
+            include_weather = data.get('include_weather')
+            try:
+                # Defaults only stand in for missing values, so 0 is rejected below rather than replaced
+                horizon_days = int(1 if data.get('horizon_days') is None else data.get('horizon_days'))
+                resolution_minutes = int(60 if data.get('resolution_minutes') is None else data.get('resolution_minutes'))
+            except (TypeError, ValueError):
+                return Response({"error": "horizon_days and resolution_minutes must be whole numbers"}, status=400)
+            if not 1 <= horizon_days <= settings.SOLAR_MAX_HORIZON_DAYS:
+                return Response({"error": f"horizon_days must be between 1 and {settings.SOLAR_MAX_HORIZON_DAYS}"}, status=400)
+            if resolution_minutes < 1 or 60 % resolution_minutes:
+                return Response({"error": "resolution_minutes must divide 60"}, status=400)
+            if horizon_days * 24 * 60 // resolution_minutes > settings.SOLAR_MAX_SERIES_POINTS:
+                return Response({"error": f"At most {settings.SOLAR_MAX_SERIES_POINTS} time steps per request"}, status=400)
+            # The selected appliances' consumption profiles, from the in-process catalogue
+            try:
+                selected_profiles = select_appliance_profiles(data)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
 
             # Convert datetime string to actual datetime
             input_date = datetime.strptime(datetime_str, '%Y-%m-%dT%H:%M')
             input_date = input_date.replace(hour=0, minute=0)
-            utc_date = pytz.utc.localize(input_date)
+
+            # One continuous series over the whole horizon
+            times = pd.date_range(start=input_date, periods=24 * 60 // resolution_minutes * horizon_days,
+                                  freq=f'{resolution_minutes}min', tz='UTC')
 
             # Fetch latitude and longitude from post code
             lat, lon = get_lat_lon_from_post_code(post_code)
             if lat is None or lon is None:
                 return Response({"error": "Failed to fetch latitude and longitude"}, status=400)
 
-            # Fetch solar data
-            try:
-                ghi, dni, dhi = fetch_solar_data(lat, lon, panel_orientation, panel_tilt, utc_date)
-            except Exception as e:
-                return Response({"error": str(e)}, status=500)
-
-            location = pvlib.location.Location(lat, lon, tz='UTC')
-            times = pd.date_range(start=input_date, periods=24, freq='1h', tz='UTC')
-            solar_position = location.get_solarposition(times=utc_date)
-
-            # Create a DataFrame for weather data
-            weather = pd.DataFrame({'ghi': ghi, 'dni': dni, 'dhi': dhi}, index=times)
-
-            # Initialize PV system and ModelChain
-            module_parameters = {'pdc0': 250, 'gamma_pdc': -0.004}
-            inverter_parameters = {'pdc0': 250, 'eta_inv_nom': 0.96}
-            temperature_model_parameters = TEMPERATURE_MODEL_PARAMETERS['sapm']['open_rack_glass_glass']
-            system = PVSystem(surface_tilt=panel_tilt, surface_azimuth=panel_orientation,
-                            module_parameters=module_parameters,
-                            inverter_parameters=inverter_parameters,
-                            temperature_model_parameters=temperature_model_parameters)
-
-            location = Location(lat, lon, tz='UTC')
-            mc = ModelChain(system, location, aoi_model='no_loss', spectral_model='no_loss',)
-
-            mc.run_model(weather)
-            ac_power = mc.results.ac * number_of_solar_panels
+            # Multi-day series are labelled with their date as well as the time
+            time_format = '%H:%M' if horizon_days == 1 else '%Y-%m-%d %H:%M'
+            power_cap = data.get('power_cap') or settings.HOUSEHOLD_POWER_CAP
+            power_cap = float(power_cap) if power_cap else None
+            # Appliances only run at the same time when the client allows it, subject to power_cap
+            allow_overlap = bool(data.get('allow_overlap'))
+
+            # Identical and near-identical requests share one per-panel result
+            cache_key = forecast_key(lat, lon, input_date.date(), horizon_days, resolution_minutes, panel_tilt, panel_orientation,
+                                     selected_profiles, power_cap, allow_overlap)
+            result = forecast_cache.get(cache_key)
+            weather_data = fetch_weather_data(lat, lon) if result is not None and include_weather else None
+            if result is None:
+                solar_position = get_solar_position(lat, lon, times)
+
+                # Standard presets are precomputed per cell and day by refresh_forecast_grid, so a single
+                # hourly day is usually one indexed read
+                precomputed = None
+                if horizon_days == 1 and resolution_minutes == 60:
+                    precomputed = lookup_regional_forecast(lat, lon, input_date.date(), panel_tilt, panel_orientation)
+
+                clear_sky_output = None
+                if precomputed is not None:
+                    forecast, clear_sky = precomputed
+                    weather_data = fetch_weather_data(lat, lon) if include_weather else None
+                    production = np.array(forecast, dtype=float)
+                    clear_sky_output = float(clear_sky.sum())
+                else:
+                    # Fetch solar data for every month in the horizon, and the current weather alongside it if the client asked for it
+                    try:
+                        weather_data, profiles = fetch_weather_and_solar_data(lat, lon, sorted(set(times.month)), include_weather=include_weather)
+                    except Exception as e:
+                        return Response({"error": str(e)}, status=500)
+
+                    # Create a DataFrame for weather data, interpolated below an hour along the solar position
+                    weather = profile_series(profiles, times)
+                    if resolution_minutes < 60:
+                        weather = follow_solar_position(weather, solar_position)
+
+                    # Run the pooled ModelChain for this panel configuration and location
+                    production = model_chain_pool.run(panel_tilt, panel_orientation, lat, lon, weather, solar_position).to_numpy(dtype=float)
+
+                # The schedule is chosen on a single panel's output; more panels scale every load score alike
+                schedule = self.solve_appliance_schedule(pd.DataFrame({'production': production}, index=times), selected_profiles, power_cap,
+                                                         allow_overlap)
+                result = ForecastResult(production=production, clear_sky_output=clear_sky_output,
+                                        solar_altitude=float(solar_position['apparent_elevation'].iloc[0]),
+                                        solar_azimuth=float(solar_position['azimuth'].iloc[0]), schedule=schedule)
+                forecast_cache.set(cache_key, result)
+
+            # Scale the per-panel result to this installation
+            ac_power = pd.Series(result.production * number_of_solar_panels, index=times)
             ac_power_df = pd.DataFrame({'production': ac_power.values}, index=times)
             ac_power_df['hour'] = ac_power_df.index.hour
 
             optimal_hour = ac_power.idxmax()
 
-            # Fetch appliance consumption data
-            if washing_machine_selected:
-                wm_data = list(ApplianceConsumption.objects.filter(appliance_name="washing_machine").order_by('sequence').values('sequence', 'consumption'))
-            else:
-                wm_data = []
-
-            if tumble_dryer_selected:
-                td_data = list(ApplianceConsumption.objects.filter(appliance_name="tumble_dryer").order_by('sequence').values('sequence', 'consumption'))
-            else:
-                td_data = []
-
-            optimal_periods = self.calculate_optimal_periods(ac_power_df, wm_data, td_data)
+            optimal_periods, schedule, balance = self.calculate_optimal_periods(ac_power_df, selected_profiles, schedule=result.schedule,
+                                                                               time_format=time_format)
+            clear_sky_output = result.clear_sky_output * number_of_solar_panels if result.clear_sky_output is not None else None
 
             wm_optimal_usage = optimal_periods.get('washing_machine')
             td_optimal_usage = optimal_periods.get('tumble_dryer')
 
             # Prepare hourly solar production for response
-            hourly_solar_production = [{"hour": hour.strftime('%H:%M'), "production": production}
+            hourly_solar_production = [{"hour": hour.strftime(time_format), "production": production}
             for hour, production in ac_power.items()]
-            # Fetch and prepare appliance consumption data for response
-            appliance_consumption = ApplianceConsumption.objects.filter(
-                appliance_name__in=["washing_machine", "tumble_dryer"]
-            ).order_by('sequence').values('appliance_name', 'sequence', 'consumption')
-
-            appliance_consumption_list = [{
-                "appliance_name": ac["appliance_name"],
-                "sequence": ac["sequence"],
-                "consumption": ac["consumption"]
-            } for ac in appliance_consumption if (ac["appliance_name"] == "washing_machine" and washing_machine_selected) or (ac["appliance_name"] == "tumble_dryer" and tumble_dryer_selected)]  # Ensure only selected appliances are included
+            # Energy per day (Wh): each sample covers resolution_minutes
+            daily_solar_outputs = [{"date": day.strftime('%Y-%m-%d'), "production": production * resolution_minutes / 60}
+                                   for day, production in ac_power.groupby(ac_power.index.normalize()).sum().items()]
+            # Prepare appliance consumption data for response, ordered by sequence as before
+            appliance_consumption_list = sorted((row for profile in selected_profiles for row in profile.rows()),
+                                                key=lambda row: row["sequence"])
 
             return Response({
-                "solar_altitude": solar_position['apparent_elevation'].iloc[0],
-                "solar_azimuth": solar_position['azimuth'].iloc[0],
-                "daily_solar_output": ac_power.sum(),
+                "solar_altitude": result.solar_altitude,
+                "solar_azimuth": result.solar_azimuth,
+                "daily_solar_output": daily_solar_outputs[0]["production"],
+                "daily_solar_outputs": daily_solar_outputs,
+                "clear_sky_output": clear_sky_output,
                 "optimal_time": optimal_hour.strftime('%Y-%m-%d %H:%M'),
                 "optimal_power": ac_power.max(),
                 "wm_optimal_usage": wm_optimal_usage if wm_optimal_usage else None,
                 "td_optimal_usage": td_optimal_usage if td_optimal_usage else None,
+                "appliance_schedule": optimal_periods,
+                "schedule_objective": schedule.objective * number_of_solar_panels,
+                "schedule_optimal": schedule.optimal,
+                "energy_balance": asdict(balance),
                 "hourly_solar_production": hourly_solar_production,
-                "appliance_consumption": appliance_consumption_list
+                "appliance_consumption": appliance_consumption_list,
+                "weather": weather_data,
             })
 
         except Exception as e:
             # Log the exception and return a generic error response
             print(f"Error in SolarDataView: {str(e)}")
+            errors_total.inc(view='SolarDataView')
             return Response({"error": "An unexpected error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    def calculate_optimal_periods(self, ac_power_df, wm_data, td_data):
-        optimal_start_times = {}
-        # When only one appliance is selected, use the absolute optimal start based on solar production
-        unadjusted_optimal_start = ac_power_df['production'].idxmax().strftime('%H:%M')
-
-        if wm_data and not td_data:
-            optimal_start_times['washing_machine'] = unadjusted_optimal_start
-        elif td_data and not wm_data:
-            optimal_start_times['tumble_dryer'] = unadjusted_optimal_start
-
-        if wm_data and td_data:
-            wm_optimal_start = self.find_optimal_start_time(ac_power_df, wm_data)
-            td_optimal_start = self.find_optimal_start_time(ac_power_df, td_data)
-
-            # Calculate end time of the washing machine cycle
-            wm_end_time = pd.to_datetime(wm_optimal_start, utc=True) + pd.Timedelta(minutes=len(wm_data) * 10)
-
-            if wm_optimal_start == td_optimal_start:  # If initial times are the same
-                # Adjust TD start time to start after WM ends
-                adjusted_start_time = wm_end_time
-                while adjusted_start_time < ac_power_df.index[-1]:
-                    if self.is_time_available(ac_power_df, adjusted_start_time, td_data):
-                        td_optimal_start = adjusted_start_time.strftime('%H:%M')
-                        break
-                    adjusted_start_time += pd.Timedelta(minutes=10)  # Check next available slot
-                else:
-                    # Fallback to any non-overlapping time if no suitable time is found
-                    td_optimal_start = (wm_end_time + pd.Timedelta(minutes=10)).strftime('%H:%M')
+    def calculate_optimal_periods(self, ac_power_df, profiles, power_cap=None, time_format='%H:%M', schedule=None, allow_overlap=False):
+        # profiles are ApplianceProfiles; every appliance goes through the same joint schedule,
+        # ordered by the catalogue's run_after relations. Start times are keyed by slug.
+        # schedule is an already chosen ScheduleResult for this grid (e.g. a cached one) to evaluate instead.
+        step_minutes = series_step_minutes(ac_power_df.index)
+        loads = self.appliance_loads(profiles, step_minutes)
+        if schedule is None:
+            schedule = self.solve_appliance_schedule(ac_power_df, profiles, power_cap, allow_overlap)
+        optimal_start_times = {name: ac_power_df.index[start].strftime(time_format)
+                               for name, start in schedule.starts.items() if start is not None}
+        # Self-consumption, grid import and export (Wh) of the chosen schedule's appliances
+        load = scheduled_load(len(ac_power_df), loads, schedule.starts)
+        balance = energy_balance(ac_power_df['production'].to_numpy(), load, step_minutes)
+        return optimal_start_times, schedule, balance
+
+    @stage('schedule')
+    def solve_appliance_schedule(self, ac_power_df, profiles, power_cap=None, allow_overlap=False):
+        loads = self.appliance_loads(profiles, series_step_minutes(ac_power_df.index))
+        run_after = {profile.name: profile.run_after for profile in profiles if profile.run_after}
+        return solve_schedule(ac_power_df['production'].to_numpy(), loads, run_after=run_after,
+                              allow_overlap=allow_overlap, power_cap=power_cap, time_budget=settings.SCHEDULER_TIME_BUDGET)
+
+    def appliance_loads(self, profiles, step_minutes):
+        return {profile.name: profile_to_grid(profile.consumption, step_minutes) for profile in profiles if len(profile.consumption)}
 
-            optimal_start_times['washing_machine'] = wm_optimal_start
-            optimal_start_times['tumble_dryer'] = td_optimal_start
+    def find_optimal_start_time(self, ac_power_df, appliance_data):
+        consumption = [entry['consumption'] for entry in sorted(appliance_data, key=lambda entry: entry['sequence'])]
+        optimal_start = find_optimal_start(ac_power_df['production'], consumption)
+        return optimal_start.strftime('%H:%M') if optimal_start is not None else None
 
-        return optimal_start_times
+    def adjust_power_for_appliance(self, ac_power_df, appliance_data, start_time_str):
+        # Production left after running the appliance from start_time_str; the profile is resampled
+        # onto the production grid and the start snapped to the step that contains it
+        consumption = [entry['consumption'] for entry in sorted(appliance_data, key=lambda entry: entry['sequence'])]
+        load = profile_to_grid(consumption, series_step_minutes(ac_power_df.index))
+        start = grid_position(ac_power_df.index, start_time_str)
+        adjusted_power_df = ac_power_df.copy()
+        adjusted_power_df['production'] -= scheduled_load(len(ac_power_df), {'appliance': load}, {'appliance': start})
+        return adjusted_power_df
 
-    def is_time_available(self, ac_power_df, start_time, appliance_data):
-        # Check if the given start_time for the duration of appliance_data does not overlap with high consumption or is out of index bounds
-        end_time = start_time + pd.Timedelta(minutes=len(appliance_data) * 10)
-        if end_time > ac_power_df.index[-1]:
-            return False
-        return True  # Consider more conditions as necessary
 
-    def find_optimal_start_time(self, ac_power_df, appliance_data):
-        optimal_start = None
-        max_solar_alignment = -1
-        cycle_duration = pd.Timedelta(minutes=len(appliance_data) * 10) # 130 minutes
-
-        # Iterate through each possible start time in ac_power_df        
-        for i, start_time in enumerate(ac_power_df.index[:-1]):  # Exclude the last time to ensure a full window
-            # Calculate the end time for this potential start
-            end_time = start_time + cycle_duration
-            # Ensure the end time does not exceed data range
-            if end_time > ac_power_df.index[-1]:
-                continue
+async def iterate_in_thread(iterator):
+    # Yields a sync iterator's items from an async generator, running each step on the sync thread,
+    # so an ASGI response can send every item as soon as it is produced
+    done = object()
+    while (item := await sync_to_async(next, thread_sensitive=True)(iterator, done)) is not done:
+        yield item
 
-            # Calculate the sum of solar production for this time window
-            solar_sum = ac_power_df.loc[start_time:end_time]['production'].sum()
 
-            if solar_sum > max_solar_alignment:
-                max_solar_alignment = solar_sum
-                optimal_start = start_time
+class SolarBatchView(APIView):
+    # Solar forecasts for many sites and panel configurations in one call, streamed back as
+    # newline-delimited JSON. Sites are grouped by location cell and date, so each irradiance
+    # profile and solar position is fetched once and every configuration in a group is
+    # modelled in a single vectorized pass.
+    def post(self, request):
+        sites = request.data.get('sites')
+        error = self.validate_sites(sites)
+        if error:
+            return Response({"error": error}, status=400)
+        results = self.stream_results(sites)
+        if isinstance(request._request, ASGIRequest):
+            # Django buffers a sync iterator in full before sending it over ASGI
+            results = iterate_in_thread(results)
+        return StreamingHttpResponse(results, content_type='application/x-ndjson')
+
+    def validate_sites(self, sites):
+        # Why the batch cannot be run, or None
+        if not isinstance(sites, list) or not sites:
+            return "sites must be a non-empty list"
+        if not all(isinstance(site, dict) and isinstance(site.get('configurations'), list) for site in sites):
+            return "Every site needs a list of configurations"
+        if sum(len(site['configurations']) for site in sites) > settings.SOLAR_BATCH_MAX_CONFIGURATIONS:
+            return f"At most {settings.SOLAR_BATCH_MAX_CONFIGURATIONS} configurations per batch"
+        return None
+
+    def stream_results(self, sites):
+        groups = {}
+        for index, site in enumerate(sites):
+            try:
+                input_date = datetime.strptime(site['date'], '%Y-%m-%dT%H:%M').replace(hour=0, minute=0)
+                configurations = [(float(configuration['panel_tilt']), float(configuration['panel_orientation']),
+                                   int(configuration['number_of_solar_panels'])) for configuration in site['configurations']]
+            except (KeyError, TypeError, ValueError) as e:
+                yield self.line({"site": index, "error": f"Invalid site: {str(e)}"})
+                continue
+            lat, lon = get_lat_lon_from_post_code(site.get('post_code'))
+            if lat is None or lon is None:
+                yield self.line({"site": index, "error": "Failed to fetch latitude and longitude"})
+                continue
+            groups.setdefault((location_cell(lat, lon), input_date), []).append((index, site.get('post_code'), configurations))
 
-        return optimal_start.strftime('%H:%M') if optimal_start else None
+        profiles = fetch_solar_profiles({(lat, lon, input_date.month) for (lat, lon), input_date in groups})
+        for ((lat, lon), input_date), members in groups.items():
+            try:
+                profile = profiles[(lat, lon, input_date.month)]
+                if isinstance(profile, Exception):
+                    raise profile
+                ghi, dni, dhi = profile
+                times = pd.date_range(start=input_date, periods=24, freq='1h', tz='UTC')
+                weather = pd.DataFrame({'ghi': ghi, 'dni': dni, 'dhi': dhi}, index=times)
+                rows = [(index, post_code, number, configuration)
+                        for index, post_code, configurations in members
+                        for number, configuration in enumerate(configurations)]
+                ac_power = simulate_configurations(weather, get_solar_position(lat, lon, times),
+                                                   [configuration[0] for *_, configuration in rows],
+                                                   [configuration[1] for *_, configuration in rows])
+            except Exception as e:
+                print(f"Error in SolarBatchView: {str(e)}")
+                errors_total.inc(view='SolarBatchView')
+                for index, *_ in members:
+                    yield self.line({"site": index, "error": "An unexpected error occurred"})
+                continue
 
-    def adjust_power_for_appliance(self, ac_power_df, appliance_data, start_time_str):
-        adjusted_power_df = ac_power_df.copy()
-        start_time = pd.to_datetime(start_time_str, utc=True)
+            for column, (index, post_code, number, (panel_tilt, panel_orientation, number_of_solar_panels)) in enumerate(rows):
+                production = ac_power[:, column] * number_of_solar_panels
+                optimal = int(production.argmax())
+                yield self.line({
+                    "site": index,
+                    "configuration": number,
+                    "post_code": post_code,
+                    "panel_tilt": panel_tilt,
+                    "panel_orientation": panel_orientation,
+                    "number_of_solar_panels": number_of_solar_panels,
+                    "daily_solar_output": float(production.sum()),
+                    "optimal_time": times[optimal].strftime('%Y-%m-%d %H:%M'),
+                    "optimal_power": float(production[optimal]),
+                    "hourly_solar_production": [{"hour": hour.strftime('%H:%M'), "production": float(value)}
+                                                for hour, value in zip(times, production)],
+                })
+
+    def line(self, result):
+        return json.dumps(result) + '\n'
+
+
+class ForecastJobSubmitView(APIView):
+    # Queues the same body as the synchronous endpoint for the run_forecast_jobs workers and
+    # answers 202 with the job to poll at its Location
+    kind = ForecastJob.SOLARDATA
 
-        for appliance_entry in appliance_data:
-            # Find the corresponding time slot in adjusted_power_df for each entry in appliance_data
-            time_slot = start_time + pd.Timedelta(minutes=(appliance_entry['sequence'] - 1) * 10)
-            if time_slot in adjusted_power_df.index:
-                # Subtract the appliance's consumption from the solar production at this time slot
-                adjusted_power_df.loc[time_slot, 'production'] -= appliance_entry['consumption']
+    def post(self, request):
+        payload = request.data.dict() if hasattr(request.data, 'dict') else request.data
+        if self.kind == ForecastJob.BATCH:
+            error = SolarBatchView().validate_sites(payload.get('sites'))
+            if error:
+                return Response({"error": error}, status=400)
+        if pending_jobs(request.user) >= settings.FORECAST_JOB_MAX_PENDING:
+            return Response({"error": f"At most {settings.FORECAST_JOB_MAX_PENDING} jobs can be queued or running at once"},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS)
+        job = ForecastJob.objects.create(user=request.user, kind=self.kind, payload=payload)
+        response = Response(ForecastJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        response.headers['Location'] = reverse('forecast_job', args=[job.pk])
+        response.headers['Retry-After'] = str(math.ceil(settings.FORECAST_JOB_POLL_INTERVAL))
+        return response
+
+
+class ForecastJobView(APIView):
+    # GET returns a job's state straight away; until it finishes, Retry-After says when to poll
+    # again, so no request worker is held waiting for a job. DELETE cancels the job.
+    def get_job(self, request, pk):
+        return (ForecastJob.objects.filter(pk=pk, user=request.user)
+                .filter(Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())).first())
 
-        return adjusted_power_df
+    def get(self, request, pk):
+        job = self.get_job(request, pk)
+        if job is None:
+            return Response({"error": "Job not found"}, status=404)
+        response = Response(ForecastJobSerializer(job).data)
+        if not job.finished:
+            response.headers['Retry-After'] = str(math.ceil(settings.FORECAST_JOB_POLL_INTERVAL))
+        return response
+
+    def delete(self, request, pk):
+        job = self.get_job(request, pk)
+        if job is None:
+            return Response({"error": "Job not found"}, status=404)
+        if not job.finished:
+            cancel_job(job)
+            job.refresh_from_db()
+        # 202 while a running job waits to be stopped
+        return Response(ForecastJobSerializer(job).data, status=200 if job.finished else status.HTTP_202_ACCEPTED)
 
 
 class SubmissionView(generics.CreateAPIView):
@@ -289,6 +489,7 @@ class SubmissionView(generics.CreateAPIView):
         appliance_consumption = solar_data.get('appliance_consumption')
 
         serializer.save(
+            user=self.request.user if self.request.user.is_authenticated else None,
             temperature=temperature,
             cloud_cover=cloud_cover,
             wind_speed=wind_speed,
@@ -307,11 +508,55 @@ class SubmissionView(generics.CreateAPIView):
         )
 
 
+class SubmissionHistoryPagination(CursorPagination):
+    # Keyset pagination: each page seeks from the last (date, id) through submission_user_date_idx
+    # instead of counting past an offset, so deep pages cost the same as the first
+    page_size = settings.SUBMISSION_HISTORY_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.SUBMISSION_HISTORY_MAX_PAGE_SIZE
+    ordering = ('-date', '-id')
+
+
+class SubmissionHistoryView(generics.ListAPIView):
+    serializer_class = SubmissionHistorySerializer
+    pagination_class = SubmissionHistoryPagination
+
+    def get_fields(self):
+        # ?fields=date,post_code narrows the response to a subset of the summary fields
+        allowed = SubmissionHistorySerializer.Meta.fields
+        requested = [field for field in self.request.query_params.get('fields', '').split(',') if field in allowed]
+        return requested or allowed
+
+    def get_queryset(self):
+        # Load only the projected columns (plus the cursor keys), never the packed time series
+        columns = set(self.get_fields()) | {'id', 'date'}
+        return Submission.objects.filter(user=self.request.user).only(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'] = self.get_fields()
+        return super().get_serializer(*args, **kwargs)
+
+
 class SubmissionChartDataView(APIView):
     def get(self, request, pk):
-        submission = Submission.objects.get(pk=pk)
-        serializer = ChartDataSerializer(submission)
-        return Response(serializer.data)
+        # Served from the rendered-response cache when possible; a matching If-None-Match or
+        # If-Modified-Since gets a 304 without loading or serializing the submission. Entries record
+        # their owner, so other users get a 404 either way.
+        entry = get_chart_response(pk)
+        if entry is None:
+            submission = Submission.objects.filter(pk=pk, user=request.user).first()
+            if submission is None:
+                return Response({"error": "Submission not found"}, status=404)
+            serializer = ChartDataSerializer(submission)
+            entry = set_chart_response(submission, serializer.data)
+        elif entry['user_id'] != request.user.id:
+            return Response({"error": "Submission not found"}, status=404)
+
+        response = HttpResponse(entry['content'], content_type='application/json')
+        response.headers['ETag'] = entry['etag']
+        response.headers['Last-Modified'] = http_date(entry['last_modified'])
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'], response=response)
 
 
 class CreateUserView(APIView):
@@ -0,0 +1,64 @@
+import os
+from django.conf import settings
+from .cache import AsyncRefreshingCache
+from .http_client import http_client
+from .irradiance import location_cell
+from .metrics import stage
+from .providers import Provider, ProviderError, build_chain
+
+weather_cache = AsyncRefreshingCache(maxsize=settings.WEATHER_CACHE_SIZE, ttl=settings.WEATHER_CACHE_TTL,
+                                     stale_ttl=settings.WEATHER_CACHE_STALE_TTL)
+
+
+async def afetch_current_weather(lat, lon):
+    weather_api_key = os.environ.get('OPENWEATHERMAP_API_KEY')
+    weather_api_url = f"{settings.OPENWEATHERMAP_API_URL}/data/3.0/onecall?lat={lat}&lon={lon}&exclude=hourly,daily,alerts&appid={weather_api_key}"
+    weather_response = await http_client.get(weather_api_url)
+    if weather_response.status_code == 200:
+        weather_data = weather_response.json()
+        return {
+            "temperature": float(weather_data['current']['temp']) - 273.15,  # Convert from Kelvin to Celsius
+            "cloud_cover": str(weather_data['current']['clouds']),
+            "wind_speed": weather_data['current']['wind_speed'],
+            "wind_direction": weather_data['current']['wind_deg'],
+            "humidity": weather_data['current']['humidity'],
+            "precipitation": weather_data['current'].get('rain', {'1h': 0.0})['1h'] + weather_data['current'].get('snow', {'1h': 0.0})['1h'],  # Sum rain and snow
+        }
+    else:
+        return {"error": "Error fetching weather data", "status": weather_response.status_code}
+
+
+class OpenWeatherMapProvider(Provider):
+    name = 'openweathermap'
+
+    async def afetch(self, lat, lon):
+        weather_data = await afetch_current_weather(lat, lon)
+        if "error" in weather_data:
+            raise ProviderError(weather_data["error"], status=weather_data["status"])
+        return weather_data
+
+
+WEATHER_PROVIDERS = {provider.name: provider for provider in (OpenWeatherMapProvider,)}
+
+weather_providers = build_chain('weather', WEATHER_PROVIDERS, settings.WEATHER_PROVIDERS, hedge_after=settings.WEATHER_HEDGE_AFTER)
+
+
+async def afetch_provided_weather(lat, lon):
+    try:
+        return await weather_providers.afetch(lat, lon)
+    except ProviderError as e:
+        return {"error": str(e), "status": e.status}
+
+
+async def afetch_weather_data(lat, lon):
+    # Current conditions barely change across a town within a few minutes, so weather is cached
+    # per WEATHER_GRID_STEP cell and fetched for the centre of the cell
+    lat_cell, lon_cell = location_cell(lat, lon, step=settings.WEATHER_GRID_STEP)
+    weather_data = await weather_cache.get((lat_cell, lon_cell), lambda: afetch_provided_weather(lat_cell, lon_cell),
+                                           cacheable=lambda weather_data: "error" not in weather_data)
+    return dict(weather_data)
+
+
+@stage('weather')
+def fetch_weather_data(lat, lon):
+    return http_client.run(afetch_weather_data(lat, lon))